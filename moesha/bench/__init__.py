@@ -0,0 +1,4 @@
+from .connection import (FakeConnection, SaveResponder, node,
+    relationship)
+from .suite import (BENCHMARKS, BenchmarkResult, benchmark, measure, run,
+    report)
@@ -0,0 +1,24 @@
+import argparse
+
+from .suite import BENCHMARKS, run, report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m moesha.bench',
+        description='Measures the overhead of Moesha against an in-memory'
+            ' connection')
+    parser.add_argument('names', nargs='*',
+        help='the benchmarks to run, all of them by default: {}'.format(
+            ', '.join(BENCHMARKS)))
+    parser.add_argument('-n', '--iterations', type=int, default=1000)
+    options = parser.parse_args(args)
+
+    for name in options.names:
+        if name not in BENCHMARKS:
+            parser.error('There is no benchmark named {}'.format(name))
+
+    print(report(run(names=options.names, iterations=options.iterations)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import itertools
+import re
+
+try:
+    from neo4j.types.graph import Graph
+except ImportError:
+    from neo4j.v1.types.graph import Graph
+
+from ..connection import Connection
+
+
+RETURN_RE = re.compile(r'RETURN (?P<returns>.+?)(?: ORDER BY .*)?$')
+
+
+def node(id, labels=None, properties=None, graph=None):
+    """creates a driver Node so that records hydrate the same way that
+    they would coming off of the wire"""
+    graph = graph or Graph()
+
+    return graph.put_node(id, labels=labels or (), properties=properties)
+
+
+def relationship(id, start, end, type, properties=None, graph=None):
+    graph = graph or Graph()
+
+    if not hasattr(start, 'labels'):
+        start = node(start, graph=graph)
+
+    if not hasattr(end, 'labels'):
+        end = node(end, graph=graph)
+
+    return graph.put_relationship(id, start, end, type, properties=properties)
+
+
+class FakeRecord(dict):
+
+    def data(self):
+        return dict(self)
+
+
+class FakeResult(object):
+
+    def __init__(self, records, connection=None, query=None):
+        self.records = [FakeRecord(r) for r in records]
+        self.connection = connection
+        self.query = query
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def data(self):
+        if self.connection is not None:
+            self.connection.events.append(('pull', self.query))
+
+        return [r.data() for r in self.records]
+
+
+class FakeTransaction(object):
+
+    def __init__(self, session):
+        self.session = session
+        self.open = True
+
+    def run(self, query, params=None):
+        return self.session.run(query, params)
+
+    def commit(self):
+        self.open = False
+        self.session.connection.events.append(('commit', None))
+
+    def rollback(self):
+        self.open = False
+        self.session.connection.events.append(('rollback', None))
+
+
+class FakeSession(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._closed = False
+        self._transaction = None
+
+    def run(self, query, params=None):
+        return FakeResult(self.connection.respond(query, params or {}),
+            connection=self.connection, query=query)
+
+    def begin_transaction(self):
+        self._transaction = FakeTransaction(self)
+
+        return self._transaction
+
+    def has_transaction(self):
+        return bool(self._transaction and self._transaction.open)
+
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+class FakeDriver(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def session(self, **kwargs):
+        return FakeSession(self.connection)
+
+    def close(self):
+        pass
+
+
+class FakeConnection(Connection):
+    """An in-memory stand-in for a Bolt connection. It goes through the same
+    Connection, SessionPool, and ConnectionTransaction code paths as a real
+    connection, but every statement is answered without a server.
+
+    Records are either replayed from the canned records list for every
+    statement or built by a responder, a callable that is given the query
+    and params and returns a list of records. Every statement that is run,
+    every result that is pulled, and every commit is recorded in events:
+
+        connection = FakeConnection(records=[{'n': node(1, ['User'])}])
+        connection = FakeConnection(responder=SaveResponder())
+    """
+
+    def __init__(self, records=None, responder=None, **kwargs):
+        kwargs.setdefault('host', 'localhost')
+        kwargs.setdefault('port', 7687)
+        kwargs.setdefault('username', 'neo4j')
+        kwargs.setdefault('password', 'neo4j')
+
+        super(FakeConnection, self).__init__(**kwargs)
+
+        self.records = records or []
+        self.responder = responder
+        self.query_count = 0
+        self.last_query = None
+        self.events = []
+        self._driver = FakeDriver(self)
+
+    @property
+    def driver(self):
+        return self._driver
+
+    def respond(self, query, params):
+        self.query_count += 1
+        self.last_query = (query, params)
+        self.events.append(('run', query))
+
+        if self.responder:
+            return self.responder(query, params)
+
+        return self.records
+
+    def cleanup(self):
+        self.pool.clear()
+
+
+class SaveResponder(object):
+    """Answers save statements by echoing every returned variable back as a
+    new graph entity with the next id, the same way the server would after
+    a CREATE or MERGE. Variables named like relationships (r, r_0) are
+    returned as relationships. UNWIND statements get one record per row"""
+
+    def __init__(self, start_id=1):
+        self.ids = itertools.count(start_id)
+
+    def __call__(self, query, params):
+        match = RETURN_RE.search(query)
+
+        if not match:
+            return []
+
+        variables = [v.strip() for v in match.group('returns').split(',')]
+        rows = 1
+
+        if query.startswith('UNWIND'):
+            rows = len(params.get('rows', []))
+
+        records = []
+
+        for _ in range(rows):
+            graph = Graph()
+            record = {}
+
+            for var in variables:
+                if var == 'r' or var.startswith('r_'):
+                    record[var] = relationship(next(self.ids),
+                        next(self.ids), next(self.ids), 'RELATED',
+                        graph=graph)
+                else:
+                    record[var] = node(next(self.ids), graph=graph)
+
+            records.append(record)
+
+        return records
@@ -0,0 +1,332 @@
+import gc
+import time
+import tracemalloc
+
+from collections import OrderedDict
+
+from ..entity import Node, Relationship
+from ..mapper import Mapper, EntityNodeMapper, EntityRelationshipMapper
+from ..property import String, Integer, Float, Boolean, RelatedEntity
+from .connection import FakeConnection, SaveResponder, node, relationship
+
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    """registers a benchmark. The decorated function does the setup and
+    returns the callable that is timed, so setup is not measured"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+
+        return setup
+
+    return register
+
+
+class BenchUser(Node):
+    pass
+
+
+class BenchFollows(Relationship):
+    pass
+
+
+class BenchAccount(Node):
+    pass
+
+
+class BenchUserMapper(EntityNodeMapper):
+    entity = BenchUser
+    __PROPERTIES__ = {
+        'name': String(),
+        'email': String(),
+        'age': Integer(),
+        'score': Float(),
+        'active': Boolean(),
+    }
+    __RELATIONSHIPS__ = {
+        'Follows': RelatedEntity(relationship_entity=BenchFollows),
+    }
+
+
+class BenchFollowsMapper(EntityRelationshipMapper):
+    entity = BenchFollows
+    __PROPERTIES__ = {
+        'since': Integer(),
+    }
+
+
+class BenchAccountMapper(EntityNodeMapper):
+    entity = BenchAccount
+    __PROPERTIES__ = {
+        'email': String(ensure_unique=True),
+        'name': String(),
+    }
+
+
+def user_properties(i):
+    return {
+        'name': 'user {}'.format(i),
+        'email': 'user{}@example.com'.format(i),
+        'age': i % 90,
+        'score': i / 3.0,
+        'active': bool(i % 2),
+    }
+
+
+def user_records(count, var='n'):
+    return [{var: node(i, ['BenchUser'], user_properties(i))}
+        for i in range(count)]
+
+
+@benchmark('save.node')
+def bench_save_node():
+    mapper = Mapper(FakeConnection(responder=SaveResponder()))
+
+    def run():
+        user = BenchUser(properties=user_properties(1))
+        mapper.save(user).send()
+
+    return run
+
+
+@benchmark('save.nodes.bulk')
+def bench_save_nodes_bulk(count=100):
+    mapper = Mapper(FakeConnection(responder=SaveResponder()))
+
+    def run():
+        users = [BenchUser(properties=user_properties(i))
+            for i in range(count)]
+        mapper.save(*users).send(bulk=True)
+
+    return run
+
+
+@benchmark('save.relationship')
+def bench_save_relationship():
+    mapper = Mapper(FakeConnection(responder=SaveResponder()))
+
+    def run():
+        start = BenchUser(properties=user_properties(1))
+        end = BenchUser(properties=user_properties(2))
+        follows = BenchFollows(start=start, end=end,
+            properties={'since': 2019})
+        mapper.save(follows).send()
+
+    return run
+
+
+@benchmark('save.subgraph.fused')
+def bench_save_subgraph_fused():
+    mapper = Mapper(FakeConnection(responder=SaveResponder()))
+
+    def run():
+        start = BenchUser(properties=user_properties(1))
+        end = BenchUser(properties=user_properties(2))
+        follows = BenchFollows(start=start, end=end,
+            properties={'since': 2019})
+        mapper.save(start, end, follows).send(fuse=True)
+
+    return run
+
+
+@benchmark('save.relationships.many')
+def bench_save_relationships_many(count=100):
+    mapper = Mapper(FakeConnection(responder=SaveResponder()))
+    user = BenchUser(id=1, properties=user_properties(1))
+    followers = [BenchUser(id=i, properties=user_properties(i))
+        for i in range(2, count + 2)]
+
+    def run():
+        _, work = mapper(user)['Follows'].add_many(followers,
+            properties=[{'since': 2019}] * count)
+        work.send()
+
+    return run
+
+
+@benchmark('save.unique')
+def bench_save_unique():
+    mapper = Mapper(FakeConnection(responder=SaveResponder()))
+
+    def run():
+        account = BenchAccount(properties={'email': 'mark@example.com',
+            'name': 'mark'})
+        mapper.save(account, ensure_unique=True).send()
+
+    return run
+
+
+@benchmark('save.unique.upsert')
+def bench_save_unique_upsert(count=100):
+    mapper = Mapper(FakeConnection(responder=SaveResponder()))
+    rows = [{'email': 'user{}@example.com'.format(i), 'name': 'user'}
+        for i in range(count)]
+
+    def run():
+        mapper.upsert_many(BenchAccount, rows)
+
+    return run
+
+
+@benchmark('get_by_ids')
+def bench_get_by_ids(count=100):
+    records = user_records(count)
+    mapper = Mapper(FakeConnection(records=records))
+    ids = list(range(count))
+
+    def run():
+        list(mapper.get_by_ids(ids=ids, entity=BenchUser))
+
+    return run
+
+
+@benchmark('response.hydrate')
+def bench_response_hydrate(count=1000):
+    records = user_records(count)
+    mapper = Mapper(FakeConnection(records=records))
+
+    def run():
+        list(mapper.query(query='MATCH (n:BenchUser) RETURN n'))
+
+    return run
+
+
+@benchmark('response.hydrate.columns')
+def bench_response_hydrate_columns(count=1000):
+    records = user_records(count)
+    mapper = Mapper(FakeConnection(records=records))
+
+    def run():
+        list(mapper.query(query='MATCH (n:BenchUser) RETURN n').hydrate())
+
+    return run
+
+
+@benchmark('properties.data')
+def bench_property_manager_data():
+    mapper = Mapper(FakeConnection())
+    user_mapper = mapper.get_mapper(BenchUser)
+    properties = user_properties(1)
+
+    def run():
+        user_mapper.entity_data(properties, data_type='graph')
+
+    return run
+
+
+@benchmark('related.query')
+def bench_related_query(count=100):
+    records = [{'start_node_end': node(i, ['BenchUser'],
+        user_properties(i))} for i in range(count)]
+    mapper = Mapper(FakeConnection(records=records))
+    user = BenchUser(id=1, properties=user_properties(1))
+
+    def run():
+        list(mapper(user)['Follows']())
+
+    return run
+
+
+@benchmark('related.page')
+def bench_related_page(size=100):
+    records = [{'start_node_end': node(i, ['BenchUser'],
+        user_properties(i))} for i in range(size + 1)]
+    mapper = Mapper(FakeConnection(records=records))
+    user = BenchUser(id=1, properties=user_properties(1))
+
+    def run():
+        mapper(user)['Follows'].page(size=size, order_by='name')
+
+    return run
+
+
+class BenchmarkResult(object):
+
+    def __init__(self, name, iterations, seconds, peak_bytes,
+                 retained_bytes):
+        self.name = name
+        self.iterations = iterations
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+        self.retained_bytes = retained_bytes
+
+    @property
+    def ops_per_sec(self):
+        if not self.seconds:
+            return float('inf')
+
+        return self.iterations / self.seconds
+
+    def __repr__(self):
+        return ('<moesha.bench.BenchmarkResult: {} {:.1f} ops/sec'
+            ' peak={}B retained={}B>').format(self.name, self.ops_per_sec,
+                self.peak_bytes, self.retained_bytes)
+
+
+def measure(name, run, iterations=1000, allocation_iterations=None):
+    """times the callable and then runs it again under tracemalloc. The
+    peak is the most memory allocated during a single call and retained is
+    the memory still held, per call, after all of the calls"""
+    allocation_iterations = allocation_iterations or min(iterations, 100)
+
+    # warm up caches so that the first call does not skew the results
+    run()
+    gc.collect()
+
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        run()
+
+    seconds = time.perf_counter() - start
+    peak = 0
+
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        begin, _ = tracemalloc.get_traced_memory()
+
+        for _ in range(allocation_iterations):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            run()
+            _, call_peak = tracemalloc.get_traced_memory()
+            peak = max(peak, call_peak - current)
+
+        gc.collect()
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    retained = max(end - begin, 0) // allocation_iterations
+
+    return BenchmarkResult(name=name, iterations=iterations, seconds=seconds,
+        peak_bytes=peak, retained_bytes=retained)
+
+
+def run(names=None, iterations=1000):
+    names = names or list(BENCHMARKS.keys())
+    results = []
+
+    for name in names:
+        if name not in BENCHMARKS:
+            raise KeyError('There is no benchmark named {}'.format(name))
+
+        results.append(measure(name, BENCHMARKS[name](),
+            iterations=iterations))
+
+    return results
+
+
+def report(results):
+    lines = ['{:<24} {:>14} {:>14} {:>14}'.format('benchmark', 'ops/sec',
+        'peak bytes', 'retained bytes')]
+
+    for result in results:
+        lines.append('{:<24} {:>14.1f} {:>14} {:>14}'.format(result.name,
+            result.ops_per_sec, result.peak_bytes, result.retained_bytes))
+
+    return '\n'.join(lines)
@@ -0,0 +1,659 @@
+import abc
+import hashlib
+import multiprocessing
+import pickle
+import re
+import struct
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+
+WRITE_RE = re.compile(r'\b(CREATE|MERGE|SET|DELETE|REMOVE|DROP|FOREACH|CALL'
+    r'|LOAD\s+CSV)\b', re.IGNORECASE)
+LABEL_RE = re.compile(r'[:|]\s*(?:`([^`]+)`|([A-Za-z_]\w*))')
+UNLABELED_NODE_RE = re.compile(r'(?<![\w`])\(\s*\w*\s*(?:\{[^}]*\})?\s*\)')
+
+
+def is_read_query(query):
+    """a query is only cached when it does not have any clause that could
+    change the graph"""
+    return not WRITE_RE.search(query or '')
+
+
+def query_labels(query):
+    """the labels and relationship types that the query touches. None is
+    returned when the query matches a node without a label, because that
+    node could have any label, so the query has to be invalidated by every
+    write"""
+    query = query or ''
+
+    if UNLABELED_NODE_RE.search(query):
+        return None
+
+    labels = frozenset(a or b for a, b in LABEL_RE.findall(query))
+
+    return labels or None
+
+
+def freeze(value):
+    """turns the params into a hashable value so that they can be a part of
+    the cache key"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+
+    return value
+
+
+def estimate_size(value, _depth=0):
+    """a rough estimate, in bytes, of the memory held by a cached value.
+    Driver entities are measured by their properties"""
+    size = sys.getsizeof(value)
+
+    if _depth > 10:
+        return size
+
+    properties = getattr(value, '_properties', None)
+
+    if isinstance(properties, dict):
+        return size + estimate_size(properties, _depth + 1)
+
+    if isinstance(value, dict):
+        return size + sum(estimate_size(k, _depth + 1)
+            + estimate_size(v, _depth + 1) for k, v in value.items())
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(v, _depth + 1) for v in value)
+
+    return size
+
+
+def copy_response(response):
+    """the response's own copy when it can make one, see
+    moesha.connection.Response.copy"""
+    copy = getattr(response, 'copy', None)
+
+    return copy() if callable(copy) else response
+
+
+class _CacheEntry(object):
+    __slots__ = ('response', 'labels', 'size', 'expires')
+
+    def __init__(self, response, labels, size, expires):
+        self.response = response
+        self.labels = labels
+        self.size = size
+        self.expires = expires
+
+
+class QueryCache(object):
+    """A read-through cache for the responses of read queries. It is keyed
+    on the Cypher text and its params and evicts the least recently used
+    entries once max_entries or max_bytes are reached. Entries expire after
+    ttl seconds:
+
+        cache = QueryCache(max_entries=1000, max_bytes=50 * 1024 ** 2,
+            ttl=30)
+        mapper = Mapper(connection, cache=cache)
+
+    Writes sent through Work.send invalidate every entry whose query touches
+    one of the labels that were written. Queries that match nodes without a
+    label are invalidated by every write. Responses are copied when they
+    are cached and on every hit, so changing the records of a response
+    does not change the cache"""
+
+    def __init__(self, max_entries=1000, max_bytes=None, ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def key(self, query, params=None):
+        return (query, freeze(params or {}))
+
+    def get(self, query, params=None):
+        """returns the cached response for the query or None. Write queries
+        are never cached and are not counted as misses"""
+        if not is_read_query(query):
+            return None
+
+        key = self.key(query, params)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+
+                return None
+
+            if entry.expires is not None and entry.expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            response = entry.response
+
+        return copy_response(response)
+
+    def set(self, query, params, response):
+        """caches the response of a read query"""
+        if not is_read_query(query):
+            return self
+
+        key = self.key(query, params)
+        size = estimate_size(getattr(response, 'result_data', response))
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            return self
+
+        expires = None
+
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+
+        entry = _CacheEntry(response=copy_response(response),
+            labels=query_labels(query), size=size, expires=expires)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = entry
+            self.bytes += size
+            self._evict()
+
+        return self
+
+    def invalidate(self, *labels):
+        """removes every entry whose query touches one of the labels and
+        every entry that could match any label. Without labels, the whole
+        cache is cleared"""
+        if not labels:
+            return self.clear()
+
+        labels = frozenset(labels)
+
+        with self._lock:
+            keys = [k for k, e in self._entries.items()
+                if e.labels is None or e.labels & labels]
+
+            for key in keys:
+                self._remove(key)
+
+            self.invalidations += len(keys)
+
+        return self
+
+    def invalidate_query(self, query):
+        """invalidates the entries that could be changed by the write query"""
+        if is_read_query(query):
+            return self
+
+        return self.invalidate(*(query_labels(query) or ()))
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries = OrderedDict()
+            self.bytes = 0
+
+        return self
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+
+def entity_key(labels, id):
+    """the key for an entity in an EntityCache"""
+    if isinstance(labels, str):
+        labels = [labels,]
+
+    return (tuple(sorted(labels or ())), id)
+
+
+class EntityCache(abc.ABC):
+    """The interface for the second-level entity cache. Values are the
+    snapshots that the mapper stores for an entity: a dict with its id,
+    labels, entity_type, start, end, and the raw properties that came from
+    the graph. Snapshots are made of plain values so that every backend
+    can store them. A backend must implement get, set, delete and clear"""
+
+    @abc.abstractmethod
+    def get(self, key):
+        pass
+
+    def get_many(self, keys):
+        """returns a dict of key to value for the keys that are cached"""
+        values = {}
+
+        for key in keys:
+            value = self.get(key)
+
+            if value is not None:
+                values[key] = value
+
+        return values
+
+    @abc.abstractmethod
+    def set(self, key, value):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, *keys):
+        pass
+
+    def invalidate(self, *labels):
+        """evicts every entity that has one of the labels or relationship
+        types. Backends that cannot find them are cleared"""
+        return self.clear()
+
+    def delete_attached(self, *ids):
+        """evicts the relationships that start or end at one of the node
+        ids. Backends that cannot find them are cleared"""
+        return self.clear()
+
+    @abc.abstractmethod
+    def clear(self):
+        pass
+
+
+def _has_labels(labels):
+    labels = set(labels)
+
+    return lambda key, value: isinstance(key, tuple)\
+        and bool(labels.intersection(key[0]))
+
+
+def _is_attached(ids):
+    ids = set(ids)
+
+    def match(key, value):
+        if not isinstance(value, dict):
+            return False
+
+        return value.get('start') in ids or value.get('end') in ids
+
+    return match
+
+
+class PendingEntityCache(EntityCache):
+    """Buffers the writes to an EntityCache while a Work is sent. Snapshots
+    are only stored in the cache by commit, once the transaction that they
+    were read in is committed, and rollback drops them. Evictions are
+    applied to the cache right away and again by commit or rollback so
+    that a read from another worker cannot put back data from before the
+    transaction finished"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._snapshots = OrderedDict()
+        self._evictions = []
+
+    def get(self, key):
+        if key in self._snapshots:
+            return self._snapshots[key]
+
+        return self.cache.get(key)
+
+    def get_many(self, keys):
+        missing = [k for k in keys if k not in self._snapshots]
+        values = self.cache.get_many(missing) if missing else {}
+
+        for key in keys:
+            if self._snapshots.get(key) is not None:
+                values[key] = self._snapshots[key]
+
+        return values
+
+    def set(self, key, value):
+        self._snapshots[key] = value
+
+        return self
+
+    def _evict(self, match, method, *args):
+        for key in [k for k, v in self._snapshots.items() if match(k, v)]:
+            del self._snapshots[key]
+
+        getattr(self.cache, method)(*args)
+        self._evictions.append((method, args))
+
+        return self
+
+    def delete(self, *keys):
+        keys = set(keys)
+
+        return self._evict(lambda key, value: key in keys, 'delete', *keys)
+
+    def invalidate(self, *labels):
+        return self._evict(_has_labels(labels), 'invalidate', *labels)
+
+    def delete_attached(self, *ids):
+        return self._evict(_is_attached(ids), 'delete_attached', *ids)
+
+    def clear(self):
+        return self._evict(lambda key, value: True, 'clear')
+
+    def _replay(self):
+        for method, args in self._evictions:
+            getattr(self.cache, method)(*args)
+
+        self._evictions = []
+
+    def commit(self):
+        self._replay()
+
+        for key, value in self._snapshots.items():
+            self.cache.set(key, value)
+
+        self._snapshots = OrderedDict()
+
+        return self
+
+    def rollback(self):
+        self._replay()
+
+        if self._snapshots:
+            self.cache.delete(*self._snapshots.keys())
+
+        self._snapshots = OrderedDict()
+
+        return self
+
+
+class LRUEntityCache(EntityCache):
+    """An in-process entity cache that evicts the least recently used
+    entities once it holds max_entries. Entities expire after ttl seconds
+    when it is set"""
+
+    def __init__(self, max_entries=10000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+
+                return None
+
+            value, expires = entry
+
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value):
+        expires = None
+
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return self
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+        return self
+
+    def _delete_matching(self, match):
+        with self._lock:
+            for key in [k for k, (v, _) in self._entries.items()
+                if match(k, v)]:
+                del self._entries[key]
+
+        return self
+
+    def invalidate(self, *labels):
+        return self._delete_matching(_has_labels(labels))
+
+    def delete_attached(self, *ids):
+        return self._delete_matching(_is_attached(ids))
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+
+        return self
+
+
+class SharedMemoryEntityCache(EntityCache):
+    """An entity cache that lives in a block of shared memory so that it is
+    shared by worker processes. Create it in the parent process before the
+    workers are forked:
+
+        cache = SharedMemoryEntityCache(slots=65536, slot_size=1024)
+        mapper = Mapper(connection, entity_cache=cache)
+
+    The block is a table of fixed size slots and every key maps to a single
+    slot, so a new entity replaces the entity that was in its slot. Values
+    that do not fit in a slot are not cached. The owner should call
+    unlink once the workers are done with it.
+
+    A process that attaches to an existing block by name must pass the
+    lock of the cache that created it, otherwise its reads and writes are
+    not synchronized with the other processes:
+
+        other = SharedMemoryEntityCache(slots=65536, slot_size=1024,
+            name=cache.name, lock=cache.lock)
+    """
+    HEADER = struct.Struct('<QdI')
+
+    def __init__(self, slots=4096, slot_size=1024, ttl=None, name=None,
+                 lock=None):
+        if shared_memory is None:
+            raise ImportError(('SharedMemoryEntityCache requires'
+                ' multiprocessing.shared_memory'))
+
+        if name and lock is None:
+            raise ValueError(('SharedMemoryEntityCache requires the lock of'
+                ' the cache that created the block {}'.format(name)))
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self.lock = lock or multiprocessing.Lock()
+        size = slots * slot_size
+
+        if name:
+            self.memory = shared_memory.SharedMemory(name=name)
+        else:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def _hash(self, key):
+        digest = hashlib.blake2b(pickle.dumps(key), digest_size=8).digest()
+
+        # zero marks an empty slot
+        return int.from_bytes(digest, 'little') or 1
+
+    def _offset(self, key_hash):
+        return (key_hash % self.slots) * self.slot_size
+
+    def get(self, key):
+        key_hash = self._hash(key)
+        offset = self._offset(key_hash)
+        buf = self.memory.buf
+
+        with self.lock:
+            slot_hash, expires, length = self.HEADER.unpack_from(buf, offset)
+
+            if slot_hash != key_hash or not length:
+                return None
+
+            start = offset + self.HEADER.size
+            payload = bytes(buf[start:start + length])
+
+        if expires and expires <= time.time():
+            return None
+
+        slot_key, value = pickle.loads(payload)
+
+        if slot_key != key:
+            return None
+
+        return value
+
+    def set(self, key, value):
+        payload = pickle.dumps((key, value))
+
+        if len(payload) > self.slot_size - self.HEADER.size:
+            return self
+
+        key_hash = self._hash(key)
+        offset = self._offset(key_hash)
+        expires = time.time() + self.ttl if self.ttl is not None else 0.0
+        buf = self.memory.buf
+
+        with self.lock:
+            self.HEADER.pack_into(buf, offset, key_hash, expires, len(payload))
+            start = offset + self.HEADER.size
+            buf[start:start + len(payload)] = payload
+
+        return self
+
+    def delete(self, *keys):
+        buf = self.memory.buf
+
+        with self.lock:
+            for key in keys:
+                key_hash = self._hash(key)
+                offset = self._offset(key_hash)
+                slot_hash, _, _ = self.HEADER.unpack_from(buf, offset)
+
+                if slot_hash == key_hash:
+                    self.HEADER.pack_into(buf, offset, 0, 0.0, 0)
+
+        return self
+
+    def _delete_matching(self, match):
+        buf = self.memory.buf
+
+        with self.lock:
+            for slot in range(self.slots):
+                offset = slot * self.slot_size
+                slot_hash, _, length = self.HEADER.unpack_from(buf, offset)
+
+                if not slot_hash or not length:
+                    continue
+
+                start = offset + self.HEADER.size
+                slot_key, value = pickle.loads(bytes(
+                    buf[start:start + length]))
+
+                if match(slot_key, value):
+                    self.HEADER.pack_into(buf, offset, 0, 0.0, 0)
+
+        return self
+
+    def invalidate(self, *labels):
+        return self._delete_matching(_has_labels(labels))
+
+    def delete_attached(self, *ids):
+        return self._delete_matching(_is_attached(ids))
+
+    def clear(self):
+        empty = self.HEADER.pack(0, 0.0, 0)
+        buf = self.memory.buf
+
+        with self.lock:
+            for slot in range(self.slots):
+                offset = slot * self.slot_size
+                buf[offset:offset + len(empty)] = empty
+
+        return self
+
+    def close(self):
+        self.memory.close()
+
+        return self
+
+    def unlink(self):
+        self.memory.close()
+        self.memory.unlink()
+
+        return self
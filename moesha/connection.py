@@ -1,15 +1,225 @@
-from neo4j.v1 import GraphDatabase
+import itertools
+import re
+import threading
+import time
+import warnings
+import weakref
+
+import neo4j
+
+try:
+    from neo4j.v1 import GraphDatabase
+except ImportError:
+    from neo4j import GraphDatabase
+
+try:
+    from neo4j import AsyncGraphDatabase
+except ImportError:
+    AsyncGraphDatabase = None
+
+
+def driver_version(version=None):
+    """the installed neo4j driver's version as a tuple of ints"""
+    version = version or getattr(neo4j, '__version__', '') or ''
+
+    return tuple(int(v) for v in re.findall(r'\d+', version)[:3])
+
+
+# sessions only take a fetch_size from the 4.0 driver on, older drivers
+# silently ignore it
+FETCH_SIZE_SUPPORTED = driver_version() >= (4, 0)
+
+
+class _ThreadKey(object):
+    """held in a SessionPool's thread local storage, it is freed when its
+    thread ends"""
+
+    def __init__(self, key):
+        self.key = key
+
+
+class SessionPool(object):
+    """Keeps warm driver sessions per thread so that each query does not pay
+    the cost of opening a new session. Sessions are handed out with
+    `acquire` and must be given back with `release` once their results have
+    been consumed. At most `max_size` sessions are kept for each thread and
+    any session that has been idle for longer than `idle_timeout` seconds is
+    closed the next time the pool is touched. Sessions that are opened with
+    a fetch_size are pooled apart from the others and must be released
+    with the same fetch_size.
+
+    The sessions of a thread that has ended are closed the next time the
+    pool is touched. Threads are not told apart by their ident because an
+    ident can be reused by a new thread"""
+
+    def __init__(self, connection, max_size=10, idle_timeout=60):
+        self.connection = connection
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._keys = itertools.count()
+        self._ended = []
+
+    def _thread_key(self):
+        """a key that is unique to the calling thread. It is added to the
+        ended keys once the thread ends, the finalizer does not take the
+        lock because it can run while the lock is held"""
+        thread_key = getattr(self._local, 'key', None)
+
+        if thread_key is None:
+            thread_key = _ThreadKey(next(self._keys))
+            weakref.finalize(thread_key, self._ended.append, thread_key.key)
+            self._local.key = thread_key
+
+        return thread_key.key
+
+    def _evict_ended(self):
+        """closes the sessions of the threads that have ended. The caller
+        must hold the pool's lock"""
+        while self._ended:
+            ended = self._ended.pop()
+
+            for key in list(self._sessions.keys()):
+                if key == ended or (isinstance(key, tuple)
+                    and key[0] == ended):
+                    for session, _ in self._sessions.pop(key):
+                        self._close(session)
+                        self.evictions += 1
+
+        return self
+
+    def _thread_sessions(self, fetch_size=None):
+        """the caller must hold the pool's lock"""
+        self._evict_ended()
+        key = self._thread_key()
+
+        if fetch_size is not None:
+            key = (key, fetch_size)
+
+        if key not in self._sessions:
+            self._sessions[key] = []
+
+        return self._sessions[key]
+
+    def _close(self, session):
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def _evict(self, sessions, now=None):
+        now = now or time.time()
+        keep = []
+
+        for session, last_used in sessions:
+            if self.idle_timeout is not None\
+                and now - last_used > self.idle_timeout:
+                self._close(session)
+                self.evictions += 1
+            else:
+                keep.append((session, last_used))
+
+        sessions[:] = keep
+
+        return self
+
+    def acquire(self, fetch_size=None):
+        with self._lock:
+            sessions = self._thread_sessions(fetch_size=fetch_size)
+            self._evict(sessions)
+
+            while sessions:
+                session, _ = sessions.pop()
+
+                if not session.closed():
+                    self.hits += 1
+
+                    return session
+
+            self.misses += 1
+
+        if fetch_size is None:
+            return self.connection.driver.session()
+
+        return self.connection.driver.session(fetch_size=fetch_size)
+
+    def release(self, session, fetch_size=None):
+        if session.closed():
+            return self
+
+        with self._lock:
+            sessions = self._thread_sessions(fetch_size=fetch_size)
+
+            if not session.has_transaction()\
+                and len(sessions) < self.max_size:
+                sessions.append((session, time.time()))
+
+                return self
+
+        self._close(session)
+
+        return self
+
+    def evict_idle(self):
+        """closes the idle sessions held for every thread"""
+        now = time.time()
+
+        with self._lock:
+            self._evict_ended()
+
+            for key in list(self._sessions.keys()):
+                self._evict(self._sessions[key], now=now)
+
+                if not self._sessions[key]:
+                    del self._sessions[key]
+
+        return self
+
+    def clear(self):
+        with self._lock:
+            for sessions in self._sessions.values():
+                for session, _ in sessions:
+                    self._close(session)
+
+            self._sessions = {}
+
+        return self
+
+    @property
+    def size(self):
+        with self._lock:
+            self._evict_ended()
+
+            return sum(len(s) for s in self._sessions.values())
+
+    @property
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': self.size,
+        }
 
 
 class Connection(object):
+    FETCH_SIZE_SUPPORTED = FETCH_SIZE_SUPPORTED
 
-    def __init__(self, host, port, username, password, protocol='bolt'):
+    def __init__(self, host, port, username, password, protocol='bolt',
+                 session_pool_size=10, session_idle_timeout=60):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.protocol = protocol
         self._driver = None
+        self.pool = SessionPool(connection=self, max_size=session_pool_size,
+            idle_timeout=session_idle_timeout)
 
     @property
     def driver(self):
@@ -29,13 +239,49 @@ class Connection(object):
 
     def query(self, query, params=None):
         params = params or {}
+        session = self.pool.acquire()
 
-        with self.driver.session() as session:
+        try:
             result = session.run(query, params)
 
             return Response(query=query, params=params, result=result)
+        finally:
+            self.pool.release(session)
+
+    def stream(self, query, params=None, fetch_size=None):
+        """runs the query and yields each record as a dict as it is pulled
+        from the driver's cursor instead of materializing the whole result.
+        The session is taken from the pool and held until the records are
+        exhausted or the generator is closed.
+
+        fetch_size is the number of records that the driver pulls from the
+        server at a time. Only the neo4j 4.0 driver and newer support it,
+        older drivers emit a RuntimeWarning and stream with their default"""
+        params = params or {}
+
+        if fetch_size is not None and not self.FETCH_SIZE_SUPPORTED:
+            warnings.warn(('The neo4j {} driver does not support fetch_size,'
+                ' it is ignored').format(getattr(neo4j, '__version__', '')),
+                RuntimeWarning, stacklevel=2)
+            fetch_size = None
+
+        session = self.pool.acquire(fetch_size=fetch_size)
+        exhausted = False
+
+        try:
+            for record in session.run(query, params):
+                yield record.data()
+
+            exhausted = True
+        finally:
+            if exhausted:
+                self.pool.release(session, fetch_size=fetch_size)
+            else:
+                session.close()
 
     def cleanup(self):
+        self.pool.clear()
+
         if self.driver:
             self.driver.close()
             self._driver = None
@@ -48,10 +294,17 @@ class ConnectionTransaction:
         self._transaction = None
         self._session = None
 
+    @property
+    def pool(self):
+        return getattr(self.connection, 'pool', None)
+
     @property
     def session(self):
         if not self._session:
-            self._session = self.connection.driver.session()
+            if self.pool:
+                self._session = self.pool.acquire()
+            else:
+                self._session = self.connection.driver.session()
 
         return self._session
 
@@ -62,16 +315,155 @@ class ConnectionTransaction:
 
         return self._transaction
 
+    def run(self, query, params=None):
+        """runs the query without pulling its records. Inside of a driver
+        transaction the statement is only queued, so several statements can
+        be run back to back and sent to the server together when the first
+        result is consumed"""
+        return self.transaction.run(query, params)
+
     def query(self, query, params=None):
-        transaction = self.transaction
-        result = transaction.run(query, params)
+        result = self.run(query, params)
 
         return Response(query=query, params=params, result=result)
 
+    def commit(self):
+        """commits the open transaction, the next query begins a new one on
+        the same session"""
+        if self._transaction:
+            self._transaction.commit()
+            self._transaction = None
+
+        return self
+
     def cleanup(self):
-        self.transaction.commit()
+        self.commit()
+
+        if self._session and self.pool:
+            self.pool.release(self._session)
+            self._session = None
+
+
+async def async_records(result):
+    """pulls every record from an async driver result. result.data() is not
+    used because it turns nodes and relationships into plain dicts, which
+    loses their ids, labels and start and end nodes"""
+    return [dict(record.items()) async for record in result]
+
+
+class AsyncConnection(object):
+    """The asyncio version of Connection. It requires a neo4j driver that
+    ships with asyncio support (neo4j>=5), which is installed with the
+    moesha[async] extra. Records are pulled from the driver's async result
+    before the Response is built"""
+
+    def __init__(self, host, port, username, password, protocol='bolt'):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.protocol = protocol
+        self._driver = None
+
+    @property
+    def driver(self):
+        if not self._driver:
+            if AsyncGraphDatabase is None:
+                raise ConnectionException(('AsyncConnection requires a neo4j'
+                    ' driver with asyncio support, install moesha[async]'))
+
+            self._driver = AsyncGraphDatabase.driver(self.uri,
+                auth=self.auth)
+
+        return self._driver
+
+    @property
+    def uri(self):
+        return '{}://{}:{}'.format(self.protocol, self.host, self.port)
+
+    @property
+    def auth(self):
+        return (self.username, self.password)
+
+    async def query(self, query, params=None):
+        params = params or {}
+
+        async with self.driver.session() as session:
+            result = await session.run(query, params)
+            records = await async_records(result)
+
+            return Response(query=query, params=params,
+                result=RecordResult(records=records))
+
+    async def cleanup(self):
+        if self._driver:
+            await self._driver.close()
+            self._driver = None
+
+
+class AsyncConnectionTransaction(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._transaction = None
+        self._session = None
+
+    async def transaction(self):
+        if not self._session:
+            self._session = self.connection.driver.session()
+
+        if not self._transaction:
+            self._transaction = await self._session.begin_transaction()
+
+        return self._transaction
+
+    async def query(self, query, params=None):
+        params = params or {}
+        transaction = await self.transaction()
+        result = await transaction.run(query, params)
+        records = await async_records(result)
+
+        return Response(query=query, params=params,
+            result=RecordResult(records=records))
+
+    async def _close(self):
         self._transaction = None
 
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def commit(self):
+        """commits the open transaction, the next query begins a new one on
+        the same session"""
+        if self._transaction:
+            await self._transaction.commit()
+            self._transaction = None
+
+        return self
+
+    async def rollback(self):
+        if self._transaction:
+            await self._transaction.rollback()
+
+        await self._close()
+
+    async def cleanup(self):
+        await self.commit()
+        await self._close()
+
+
+class RecordResult(object):
+    """A stand-in for a driver result whose records have already been
+    pulled. It is used when a single statement's records are split up and
+    handed to multiple Response objects"""
+
+    def __init__(self, records=None):
+        self.records = records or []
+
+    def data(self):
+        return self.records
+
 
 class Response(object):
 
@@ -92,3 +484,39 @@ class Response(object):
                 self._data.append(ent)
 
         return self._data
+
+    def copy(self):
+        """a copy with its own list of records. The QueryCache hands out
+        copies so that a caller that sorts or extends the records of a hit
+        does not change them for the next reader"""
+        records = [dict(r) for r in self.result_data]
+
+        return Response(query=self.query, params=self.params,
+            result=RecordResult(records=records))
+
+    @property
+    def server_time(self):
+        """the time, in seconds, that the server reported for making the
+        result available and consuming it. None when the result does not
+        have a summary"""
+        summary = getattr(self.result, 'summary', None)
+
+        if not callable(summary):
+            return None
+
+        try:
+            summary = summary()
+        except Exception:
+            return None
+
+        available = getattr(summary, 'result_available_after', None)
+        consumed = getattr(summary, 'result_consumed_after', None)
+
+        if available is None and consumed is None:
+            return None
+
+        return ((available or 0) + (consumed or 0)) / 1000.0
+
+
+class ConnectionException(Exception):
+    pass
@@ -4,15 +4,26 @@ from .util import entity_to_labels, MOESHA_ENTITY_TYPE
 
 
 class Entity(object):
+    """Entities are slotted to keep large result sets small in memory.
+    The changes and deleted dicts are only allocated once a property is
+    changed or removed and the initial values share the data dict until
+    the first write. Subclasses that do not define __slots__ get a __dict__
+    like any other class; define an empty __slots__ to keep them compact:
+
+        class User(Node):
+            __slots__ = ()
+    """
+    __slots__ = ('query_variable', 'id', '_data', '_initial', '_changes',
+        '_deleted', '_labels', '__weakref__')
 
     def __init__(self, id=None, labels=None, properties=None):
         properties = properties or {}
         self.query_variable = ''
         self.id = id
         self._data = {}
-        self._initial = {}
-        self._changes = {}
-        self._deleted = {}
+        self._initial = self._data
+        self._changes = None
+        self._deleted = None
 
         # call the method directly, seems to be an issue with properties
         # and subclasses
@@ -29,6 +40,12 @@ class Entity(object):
     def pluck(self, *args):
         return {a: self[a] for a in args}
 
+    def _own_initial(self):
+        """copy-on-write for the initial values, they share the data dict
+        until it is about to be modified"""
+        if self._initial is self._data:
+            self._initial = copy.copy(self._data)
+
     def purge(self, *args):
         data = self.data
 
@@ -45,6 +62,9 @@ class Entity(object):
 
     @property
     def data(self):
+        # the dict is exposed and can be modified by the caller
+        self._own_initial()
+
         if isinstance(self, Relationship):
             self._data[MOESHA_ENTITY_TYPE] = 'relationship'
         elif isinstance(self, Node):
@@ -55,11 +75,25 @@ class Entity(object):
 
     @property
     def changes(self):
-        return self._changes
+        return self._changes or {}
 
     @property
     def deleted(self):
-        return self._deleted
+        return self._deleted or {}
+
+    @property
+    def dirty(self):
+        """whether a property was added, changed or removed since the
+        entity was hydrated"""
+        if self._initial is self._data:
+            return False
+
+        ignore = ('id', MOESHA_ENTITY_TYPE)
+
+        def properties(data):
+            return {k: v for k, v in data.items() if k not in ignore}
+
+        return properties(self._data) != properties(self._initial)
 
     def _get_labels(self):
         if self._labels and not isinstance(self._labels, (list, set, tuple)):
@@ -103,8 +137,8 @@ class Entity(object):
 
         if reset:
             self._data = copy.copy(properties)
-            self._initial = copy.copy(properties)
-            self._deleted = {}
+            self._initial = self._data
+            self._deleted = None
         else:
             for k, v in properties.items():
                 self[k] = v
@@ -129,8 +163,13 @@ class Entity(object):
         return self._data.get(name, None)
 
     def __setitem__(self, name, value):
+        self._own_initial()
+
         if name in self._initial:
             if value != self._initial[name] and self.id:
+                if self._changes is None:
+                    self._changes = {}
+
                 self._changes[name] = {
                     'from': self._initial[name],
                     'to': value,
@@ -147,6 +186,11 @@ class Entity(object):
 
     def __delitem__(self, name):
         if name in self._data:
+            self._own_initial()
+
+            if self._deleted is None:
+                self._deleted = {}
+
             self._deleted[name] = self._data[name]
             del self._data[name]
 
@@ -156,10 +200,11 @@ class Entity(object):
 
 
 class Node(Entity):
-    pass
+    __slots__ = ()
 
 
 class Relationship(Entity):
+    __slots__ = ('start', 'end')
 
     def __init__(self, id=None, start=None, end=None, properties=None,
                  labels=None):
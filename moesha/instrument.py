@@ -0,0 +1,142 @@
+import hashlib
+import threading
+
+from operator import attrgetter
+
+
+def query_hash(query):
+    """the hash of the query text. Since values are sent as params, queries
+    with the same hash have the same shape"""
+    return hashlib.md5((query or '').encode('utf-8')).hexdigest()
+
+
+class UnitTiming(object):
+    """The timings collected for a single unit of work sent by Work.send.
+    All times are in seconds:
+
+    * prepare_time: building the unit's Cypher statement
+    * query_time: sending the statement and pulling its records
+    * server_time: the time that the server reported for the statement,
+        None if the driver does not provide a result summary
+    * hydration_time: running the unit's after events, which refresh the
+        entities with the returned records
+    """
+
+    def __init__(self, unit, query, params=None, prepare_time=0.0,
+                 query_time=0.0, server_time=None, hydration_time=0.0,
+                 rows=0):
+        self.unit = unit
+        self.query = query
+        self.params = params
+        self.query_hash = query_hash(query)
+        self.prepare_time = prepare_time
+        self.query_time = query_time
+        self.server_time = server_time
+        self.hydration_time = hydration_time
+        self.rows = rows
+
+    def __repr__(self):
+        return ('<moesha.instrument.UnitTiming: {} {} {:.6f}s rows={}>'
+            ).format(self.mapper, self.query_hash, self.total_time, self.rows)
+
+    @property
+    def mapper(self):
+        return self.unit.mapper.__class__.__name__
+
+    @property
+    def total_time(self):
+        return self.prepare_time + self.query_time + self.hydration_time
+
+
+class QueryShape(object):
+
+    def __init__(self, query_hash, query, mapper):
+        self.query_hash = query_hash
+        self.query = query
+        self.mapper = mapper
+        self.count = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.prepare_time = 0.0
+        self.query_time = 0.0
+        self.server_time = 0.0
+        self.hydration_time = 0.0
+
+    def __repr__(self):
+        return ('<moesha.instrument.QueryShape: {} {} count={}'
+            ' total={:.6f}s>').format(self.mapper, self.query_hash,
+                self.count, self.total_time)
+
+    @property
+    def avg_time(self):
+        if not self.count:
+            return 0.0
+
+        return self.total_time / self.count
+
+    def add(self, timing):
+        self.count += 1
+        self.rows += timing.rows
+        self.total_time += timing.total_time
+        self.max_time = max(self.max_time, timing.total_time)
+        self.prepare_time += timing.prepare_time
+        self.query_time += timing.query_time
+        self.server_time += timing.server_time or 0.0
+        self.hydration_time += timing.hydration_time
+
+        return self
+
+
+class QueryStats(object):
+    """A listener that aggregates unit timings by query shape so that the
+    slowest shapes can be found:
+
+        stats = QueryStats()
+        mapper.add_listener(stats)
+
+        ...
+
+        print(stats.report(10))
+    """
+
+    def __init__(self):
+        self.shapes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, timing):
+        with self._lock:
+            shape = self.shapes.get(timing.query_hash)
+
+            if shape is None:
+                shape = QueryShape(query_hash=timing.query_hash,
+                    query=timing.query, mapper=timing.mapper)
+                self.shapes[timing.query_hash] = shape
+
+            shape.add(timing)
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def top(self, n=10, key='total_time'):
+        with self._lock:
+            shapes = list(self.shapes.values())
+
+        return sorted(shapes, key=attrgetter(key), reverse=True)[:n]
+
+    def report(self, n=10, key='total_time'):
+        lines = ['{:>8} {:>12} {:>12} {:>12} {:>8}  {:<24} {}'.format('count',
+            'total (s)', 'avg (s)', 'max (s)', 'rows', 'mapper', 'query')]
+
+        for shape in self.top(n=n, key=key):
+            lines.append(('{:>8} {:>12.6f} {:>12.6f} {:>12.6f} {:>8}  {:<24}'
+                ' {}').format(shape.count, shape.total_time, shape.avg_time,
+                    shape.max_time, shape.rows, shape.mapper, shape.query))
+
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.shapes = {}
+
+        return self
@@ -1,8 +1,14 @@
+import contextvars
 import copy
 import inspect
 import functools
 import logging
+import re
+import threading
+import time
 
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import partial
 
 from six import with_metaclass
@@ -10,15 +16,30 @@ from six import with_metaclass
 from pypher.builder import Pypher, Params
 from pypher.partial import Partial
 
-from neo4j.v1 import types
+try:
+    from neo4j.v1 import types
+except ImportError:
+    from neo4j import graph as types
 
-from neobolt.exceptions import ConstraintError
+try:
+    from neobolt.exceptions import ConstraintError
+except ImportError:
+    from neo4j.exceptions import ConstraintError
 
-from .entity import Node, Relationship, Collection
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .entity import Entity, Node, Relationship, Collection
 from .property import PropertyManager, RelatedManager, RelatedEntity
-from .query import Builder, Query, Helpers
+from .query import (Builder, Query, BulkQuery, Helpers, naming_state,
+    naming_context, encode_cursor)
+from .cache import (is_read_query, query_labels, entity_key, estimate_size,
+    PendingEntityCache)
+from .instrument import UnitTiming
 from .util import (normalize_labels, entity_name, entity_to_labels, timeit,
-    MOESHA_ENTITY_TYPE)
+    await_all, MOESHA_ENTITY_TYPE)
 
 
 LOG = logging.getLogger(__name__)
@@ -28,6 +49,9 @@ GENERIC_MAPPER = 'generic.mapper'
 ENTITY_MAPPER_MAP = {}
 _MEMO = {}
 ENTITY_MAP = {}
+_SESSIONS = contextvars.ContextVar('moesha_sessions', default=None)
+_ENTITY_CACHES = contextvars.ContextVar('moesha_entity_caches', default=None)
+DETACH_DELETE_RE = re.compile(r'\bDETACH\s+DELETE\b', re.IGNORECASE)
 
 
 def get_entity(label=None):
@@ -44,62 +68,135 @@ def get_entity(label=None):
     return Node
 
 
-def get_mapper(entity, mapper):
-    name = entity_name(entity)
+class MapperRegistry(object):
+    """Hands out the EntityMapper instance for an entity. The mapper classes
+    are the compiled, shared, definitions and each instance carries the
+    state that changes while it is used: the entity context, the events,
+    and its own copies of the properties and relationships.
+
+    By default one instance is shared per entity class. With per_thread
+    enabled each thread gets its own instances so that a thread pool can
+    save entities of the same class in parallel:
+
+        MAPPER_REGISTRY.per_thread = True
+    """
+
+    def __init__(self, per_thread=False):
+        self.per_thread = per_thread
+        self._shared = _MEMO
+        self._local = threading.local()
+
+    @property
+    def memo(self):
+        if not self.per_thread:
+            return self._shared
 
-    if name in ENTITY_MAPPER_MAP:
-        if name in _MEMO:
+        memo = getattr(self._local, 'memo', None)
+
+        if memo is None:
+            memo = self._local.memo = {}
+
+        return memo
+
+    def get(self, entity, mapper=None):
+        name = entity_name(entity)
+        memo = self.memo
+
+        if name not in ENTITY_MAPPER_MAP:
+            name = GENERIC_MAPPER
+
+        if name in memo:
             if mapper:
-                _MEMO[name].mapper = mapper
+                memo[name].mapper = mapper
 
-            return _MEMO[name]
+            return memo[name]
 
-        mapper = ENTITY_MAPPER_MAP[name](mapper=mapper)
-        _MEMO[name] = mapper
+        instance = ENTITY_MAPPER_MAP[name](mapper=mapper)
+        memo[name] = instance
 
-        return mapper
+        return instance
 
-    if GENERIC_MAPPER in _MEMO:
-        if mapper:
-            _MEMO[GENERIC_MAPPER].mapper = mapper
+    def clear(self):
+        self._shared.clear()
+        self._local = threading.local()
 
-        return _MEMO[GENERIC_MAPPER]
+        return self
 
-    mapper = ENTITY_MAPPER_MAP[GENERIC_MAPPER](mapper=mapper)
-    _MEMO[GENERIC_MAPPER] = mapper
 
-    return mapper
+MAPPER_REGISTRY = MapperRegistry()
 
 
-class EntityQueryVariable(object):
-    counts = {
-        'n': 0,
-        'r': 0,
+def get_mapper(entity, mapper):
+    return MAPPER_REGISTRY.get(entity=entity, mapper=mapper)
+
+
+def entity_snapshot(record):
+    """the plain values of a driver node or relationship that are stored in
+    an EntityCache"""
+    if isinstance(record, types.Relationship):
+        return {
+            'id': record.id,
+            'labels': [record.type,],
+            'entity_type': RELATIONSHIP,
+            'properties': dict(record._properties),
+            'start': record.start_node.id,
+            'end': record.end_node.id,
+        }
+
+    return {
+        'id': record.id,
+        'labels': sorted(record.labels),
+        'entity_type': NODE,
+        'properties': dict(record._properties),
+        'start': None,
+        'end': None,
     }
 
+
+def cache_record(cache, record, labels=None):
+    """stores the driver node or relationship in the EntityCache. The labels
+    are used when the record does not have any"""
+    if cache is None or record.id is None:
+        return
+
+    snapshot = entity_snapshot(record)
+
+    if labels and not snapshot['labels']:
+        snapshot['labels'] = sorted(labels)
+
+    if snapshot['labels']:
+        cache.set(entity_key(snapshot['labels'], snapshot['id']), snapshot)
+
+
+class EntityQueryVariable(object):
+    """names entities in queries. The counters live in the current
+    naming_state, not on the class, so each thread or task has its own"""
+
     @classmethod
     def define(cls, entity):
+        counts = naming_state().counts
+
         if hasattr(entity, 'query_variable') and entity.query_variable:
             try:
                 var, count = entity.query_variable.split('_')
 
-                if cls.counts[var] <= int(count):
-                    cls.counts[var] = int(count) + 1
+                if counts[var] <= int(count):
+                    counts[var] = int(count) + 1
             except:
                 pass
 
             return entity.query_variable
 
         t_var = 'n' if isinstance(entity, Node) else 'r'
-        var = '{}_{}'.format(t_var, cls.counts[t_var])
-        cls.counts[t_var] += 1
+        var = '{}_{}'.format(t_var, counts[t_var])
+        counts[t_var] += 1
         entity.query_variable = var
 
         return var
 
     @classmethod
     def reset(cls):
-        cls.counts = {
+        naming_state().counts = {
             'n': 0,
             'r': 0,
         }
@@ -108,6 +205,60 @@ class EntityQueryVariable(object):
 EQV = EntityQueryVariable
 
 
+class IdentityMap(object):
+    """This object ensures that an entity loaded from the graph is only
+    represented by a single Python object within a Work or Mapper session.
+    Entities are keyed by their type (node or relationship) and their id.
+    Entities that have not been saved do not have an id and are never
+    stored"""
+
+    def __init__(self):
+        self._entities = {}
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __contains__(self, entity):
+        key = self.key(entity)
+
+        return key is not None and self._entities.get(key) is entity
+
+    @classmethod
+    def key(cls, entity, entity_type=None):
+        if entity.id is None:
+            return None
+
+        if not entity_type:
+            entity_type = RELATIONSHIP if isinstance(entity, Relationship)\
+                else NODE
+
+        return (entity_type, entity.id)
+
+    def get(self, entity_type, id):
+        return self._entities.get((entity_type, id))
+
+    def add(self, entity):
+        key = self.key(entity)
+
+        if key is not None:
+            self._entities[key] = entity
+
+        return self
+
+    def remove(self, entity):
+        key = self.key(entity)
+
+        if key is not None and self._entities.get(key) is entity:
+            del self._entities[key]
+
+        return self
+
+    def clear(self):
+        self._entities = {}
+
+        return self
+
+
 class _Unit(object):
 
     def __init__(self, entity, action, mapper, event_map=None, event=None,
@@ -123,6 +274,7 @@ class _Unit(object):
         self.kwargs = kwargs
         self.query = None
         self.params = None
+        self.pending = []
 
     def __repr__(self):
         return ('<moesha.mapper._Unit at {} for entity: {}>').format(
@@ -146,21 +298,45 @@ class _Unit(object):
 
         self.query, self.params = self.action(**kwargs)
 
+    def run_event(self, event, *args, **kwargs):
+        """runs the event and holds on to its result if it is awaitable.
+        Coroutine events are only supported when the unit is sent with an
+        AsyncWork, which will await them once the current step is done"""
+        result = event(*args, **kwargs)
+
+        if inspect.isawaitable(result):
+            self.pending.append(result)
+
+        return result
+
+    async def wait_pending(self):
+        pending, self.pending = self.pending, []
+
+        try:
+            for awaitable in pending:
+                await awaitable
+        except Exception:
+            for awaitable in pending:
+                if inspect.iscoroutine(awaitable):
+                    awaitable.close()
+
+            raise
+
     def execute_before_events(self):
         for event in self.before_events:
-            event(self.entity)
+            self.run_event(event, self.entity)
 
     def execute_after_events(self, *args, **kwargs):
         kwargs.update(self.kwargs)
 
         for event in self.after_events:
-            event(self.entity, *args, **kwargs)
+            self.run_event(event, self.entity, *args, **kwargs)
 
     def execute_final_events(self, **kwargs):
         kwargs.update(**self.kwargs)
 
         for event in self.final_events:
-            event(**kwargs)
+            self.run_event(event, **kwargs)
 
     def describe(self):
 
@@ -228,12 +404,236 @@ class _QueryUnit(_Unit):
         }
 
 
+class _BulkUnit(_Unit):
+    """This unit groups consecutive _Unit objects that save entities of the
+    same type, labels, and action. The entities are sent as a single UNWIND
+    statement and each returned record is handed back to the _Unit that it
+    belongs to so that its after and final events are run as if it had been
+    sent on its own. Relationships are only grouped when their start and
+    end nodes already exist, the nodes themselves are not saved. The events
+    of the nodes in exclude are not run, they are saved by their own units"""
+
+    def __init__(self, units, event):
+        super(_BulkUnit, self).__init__(entity=None, action=None,
+            mapper=units[0].mapper)
+
+        self.units = units
+        self.bulk_event = event
+        self.final_events = []
+        self.exclude = set()
+
+    def __repr__(self):
+        return ('<moesha.mapper._BulkUnit at {} for {} entities>').format(
+            id(self), len(self.units))
+
+    @property
+    def entities(self):
+        return [u.entity for u in self.units]
+
+    def prepare(self):
+        if isinstance(self.units[0].entity, Relationship):
+            return self.prepare_relationships()
+
+        query = BulkQuery(entities=self.entities,
+            params=self.mapper.mapper.params)
+        unique = self.mapper.unique_properties()
+
+        if self.bulk_event == EntityMapper.UPDATE:
+            self.query, self.params = query.update_nodes()
+        elif unique:
+            self.query, self.params = query.merge_nodes(
+                unique=sorted(unique.keys()))
+        else:
+            self.query, self.params = query.create_nodes()
+
+    def prepare_relationships(self):
+        ensure_unique = False
+
+        for unit in self.units:
+            kwargs = dict(unit.kwargs)
+            ensure_unique = kwargs.pop('ensure_unique', False)
+
+            unit.mapper._bind_relationship_events(unit,
+                exclude=self.exclude, **kwargs)
+
+        query = BulkQuery(entities=self.entities,
+            params=self.mapper.mapper.params, query_variable='r')
+        self.query, self.params = query.create_relationships(
+            ensure_unique=ensure_unique)
+
+    def execute_before_events(self):
+        for unit in self.units:
+            unit.execute_before_events()
+
+    def execute_after_events(self, response=None, **kwargs):
+        from .connection import RecordResult, Response as ConnectionResponse
+
+
+        result_data = response.response.result_data if response else []
+
+        for i, unit in enumerate(self.units):
+            try:
+                record = result_data[i]
+                records = [{unit.entity.query_variable: v}
+                    for v in record.values()]
+            except IndexError:
+                records = []
+
+            result = RecordResult(records=records)
+            res = ConnectionResponse(query=self.query, params=self.params,
+                result=result)
+            unit_response = Response(mapper=self.mapper.mapper, response=res)
+
+            unit.execute_after_events(response=unit_response, **kwargs)
+
+    def execute_final_events(self, **kwargs):
+        for unit in self.units:
+            unit.execute_final_events(**kwargs)
+
+    async def wait_pending(self):
+        await super(_BulkUnit, self).wait_pending()
+
+        for unit in self.units:
+            await unit.wait_pending()
+
+    def describe(self):
+        self.prepare()
+
+        return {
+            'BulkUnit': self,
+            'query': self.query,
+            'params': self.params,
+            'units': [u.describe() for u in self.units],
+        }
+
+    def reset(self):
+        for unit in self.units:
+            unit.reset()
+
+        return self
+
+
+class _FusedUnit(_Unit):
+    """This unit groups _Unit objects that save a connected subgraph, new
+    relationships along with the nodes that they connect, into a single
+    statement. Each node is created or matched once and every relationship
+    reuses its query variable instead of matching it by id again. The
+    response is handed to every _Unit so that its after and final events
+    are run as if it had been sent on its own. The events of a node that is
+    saved by its own unit in the statement are only run by that unit"""
+
+    def __init__(self, units, ensure_unique=False):
+        super(_FusedUnit, self).__init__(entity=None, action=None,
+            mapper=units[0].mapper)
+
+        self.units = units
+        self.ensure_unique = ensure_unique
+        self.final_events = []
+
+    def __repr__(self):
+        return ('<moesha.mapper._FusedUnit at {} for {} entities>').format(
+            id(self), len(self.units))
+
+    @property
+    def entities(self):
+        return [u.entity for u in self.units]
+
+    def prepare(self):
+        in_statement = {id(e) for e in self.entities}
+
+        for unit in self.units:
+            if isinstance(unit.entity, Relationship):
+                kwargs = dict(unit.kwargs)
+                kwargs.pop('ensure_unique', None)
+
+                unit.mapper._bind_relationship_events(unit,
+                    exclude=in_statement, **kwargs)
+
+        query = Query(entities=self.entities,
+            params=self.mapper.mapper.params)
+        self.query, self.params = query.save(
+            ensure_unique=self.ensure_unique)
+
+    def execute_before_events(self):
+        for unit in self.units:
+            unit.execute_before_events()
+
+    def execute_after_events(self, response=None, **kwargs):
+        for unit in self.units:
+            unit.execute_after_events(response=response, **kwargs)
+
+    def execute_final_events(self, **kwargs):
+        for unit in self.units:
+            unit.execute_final_events(**kwargs)
+
+    async def wait_pending(self):
+        await super(_FusedUnit, self).wait_pending()
+
+        for unit in self.units:
+            await unit.wait_pending()
+
+    def describe(self):
+        self.prepare()
+
+        return {
+            'FusedUnit': self,
+            'query': self.query,
+            'params': self.params,
+            'units': [u.describe() for u in self.units],
+        }
+
+    def reset(self):
+        for unit in self.units:
+            unit.reset()
+
+        return self
+
+
+class _CommitPolicy(object):
+    """counts the units and the approximate size of their params since the
+    last commit and says when the next commit is due"""
+
+    def __init__(self, commit_every=None, commit_bytes=None):
+        self.commit_every = commit_every
+        self.commit_bytes = commit_bytes
+        self.units = 0
+        self.bytes = 0
+
+    def add(self, unit):
+        if not self.commit_every and not self.commit_bytes:
+            return False
+
+        self.units += 1
+
+        if self.commit_bytes:
+            self.bytes += estimate_size(unit.params or {})
+
+        if (self.commit_every and self.units >= self.commit_every)\
+            or (self.commit_bytes and self.bytes >= self.commit_bytes):
+            self.units = 0
+            self.bytes = 0
+
+            return True
+
+        return False
+
+
 class Work(object):
+    BULK_SIZE = 1000
+    FUSE_SIZE = 100
 
-    def __init__(self, mapper):
+    def __init__(self, mapper, identity_map=None):
         self.mapper = mapper
         self.units = []
 
+        if identity_map is None:
+            identity_map = getattr(mapper, 'identity_map', None)
+
+        if identity_map is None:
+            identity_map = IdentityMap()
+
+        self.identity_map = identity_map
+
     def remove_entity_unit(self, entity):
         """This method will ensure that an entity only has one unit of work
         registered with the Mapper. It will also reset any matched
@@ -274,47 +674,604 @@ class Work(object):
 
         return self.add_unit(unit)
 
-    def send(self):
+    def add_relationship_units(self, units):
+        """adds units that save relationships. The units that create
+        relationships between nodes that already exist are grouped into
+        _BulkUnit objects so that each group is sent as a single UNWIND
+        statement no matter how the work is sent. The UNWIND statement does
+        not write the nodes, so the ones with unsaved changes are saved by
+        their own units before it"""
+        saved = set()
+
+        for unit in self.bulk_units(units=units,
+                                    key=self._relationship_bulk_key):
+            if isinstance(unit, _BulkUnit):
+                for entity in unit.entities:
+                    for node in (entity.start, entity.end):
+                        if id(node) not in saved and node.dirty:
+                            saved.add(id(node))
+                            self.mapper.save(node, work=self)
+
+                unit.exclude = saved
+
+            self.add_unit(unit)
+
+        return self
+
+    def _bulk_key(self, unit):
+        """returns the key used to group units that can be sent in a single
+        UNWIND statement, or None if the unit must be sent on its own"""
+        entity = unit.entity
+        mapper = unit.mapper
+
+        if type(unit) is not _Unit or not isinstance(entity, Node):
+            return None
+
+        if not isinstance(mapper, EntityMapper)\
+            or unit.action != mapper._save_entity:
+            return None
+
+        event = EntityMapper.UPDATE if bool(entity.id) else EntityMapper.CREATE
+        unique = ()
+
+        # new nodes with unique properties are MERGEd on those properties
+        if event == EntityMapper.CREATE:
+            unique = tuple(sorted(mapper.unique_properties().keys()))
+
+        return (event, entity.__class__, tuple(entity.labels), unique)
+
+    def _relationship_bulk_key(self, unit):
+        """returns the key used to group units that create relationships
+        between nodes that already exist. Unique relationships are MERGEd on
+        their properties, so they are only grouped with relationships that
+        have the same property names"""
+        entity = unit.entity
+        mapper = unit.mapper
+
+        if type(unit) is not _Unit or not isinstance(entity, Relationship)\
+            or bool(entity.id):
+            return None
+
+        if not isinstance(mapper, EntityMapper)\
+            or unit.action != mapper._save_entity:
+            return None
+
+        if getattr(entity.start, 'id', None) is None\
+            or getattr(entity.end, 'id', None) is None:
+            return None
+
+        ensure_unique = bool(unit.kwargs.get('ensure_unique'))
+        fields = ()
+
+        if ensure_unique:
+            fields = tuple(sorted(mapper.entity_data(entity.data,
+                data_type='graph')))
+
+        return (EntityMapper.CREATE, entity.__class__, tuple(entity.labels),
+            ensure_unique, fields)
+
+    def bulk_units(self, units=None, key=None, size=None):
+        """This method will coalesce consecutive units that save entities of
+        the same type, labels, and action into _BulkUnit objects. Only
+        consecutive units are grouped so that the order in which the queries
+        are run does not change. The units, the function that builds the
+        grouping key, and the most units in a group default to this work's
+        units, _bulk_key, and BULK_SIZE"""
+        key_function = key or self._bulk_key
+        size = size or self.BULK_SIZE
+        units_in = self.units if units is None else units
+        units = []
+        group = []
+        group_key = None
+
+        def flush():
+            if len(group) > 1:
+                units.append(_BulkUnit(units=list(group),
+                    event=group_key[0]))
+            else:
+                units.extend(group)
+
+            del group[:]
+
+        for unit in units_in:
+            key = key_function(unit)
+
+            if key is None or key != group_key\
+                or len(group) >= size:
+                flush()
+
+            if key is None:
+                units.append(unit)
+            else:
+                group.append(unit)
+
+            group_key = key
+
+        flush()
+
+        return units
+
+    def _fuse_entities(self, unit):
+        """returns the entities that tie the unit to the other units in a
+        fused statement, or None if the unit must be sent on its own. New
+        nodes with unique properties are MERGEd after the CREATE clause, so
+        relationships could not use them, and existing relationships are
+        matched by id"""
+        entity = unit.entity
+        mapper = unit.mapper
+
+        if type(unit) is not _Unit or not isinstance(mapper, EntityMapper)\
+            or unit.action != mapper._save_entity:
+            return None
+
+        if isinstance(entity, Node):
+            if entity.id is None and mapper.unique_properties():
+                return None
+
+            return [entity,]
+
+        if isinstance(entity, Relationship) and entity.id is None\
+            and isinstance(entity.start, Node)\
+            and isinstance(entity.end, Node):
+            return [entity, entity.start, entity.end]
+
+        return None
+
+    def fuse_units(self, units=None, size=None):
+        """This method will fuse the consecutive units that save a connected
+        subgraph into _FusedUnit objects: a relationship is fused with the
+        units that save its start or end node and with the other
+        relationships that share one of them. Units that are not connected
+        to another unit are left as they are. Inside a subgraph the node
+        units come before the relationship units. A subgraph is split after
+        size units, the later statements match the nodes by the ids that the
+        earlier ones returned"""
+        units_in = self.units if units is None else units
+        size = size or self.FUSE_SIZE
+        units = []
+        run = []
+        run_unique = None
+
+        def flush():
+            # group the run into connected components, keyed by the first
+            # unit of each component, while keeping the units' order
+            owner = {}
+            groups = OrderedDict()
+
+            for unit in run:
+                entities = self._fuse_entities(unit)
+                keys = [owner[id(e)] for e in entities if id(e) in owner]
+                key = keys[0] if keys else id(unit)
+                group = groups.setdefault(key, [])
+
+                for other in keys[1:]:
+                    if other != key and other in groups:
+                        for moved in groups.pop(other):
+                            group.append(moved)
+
+                            for e in self._fuse_entities(moved):
+                                owner[id(e)] = key
+
+                group.append(unit)
+
+                for e in entities:
+                    owner[id(e)] = key
+
+            position = {id(u): i for i, u in enumerate(run)}
+
+            # the nodes are created before the relationships that connect
+            # them so that each relationship reuses their query variables
+            for group in groups.values():
+                group.sort(key=lambda u: (isinstance(u.entity, Relationship),
+                    position[id(u)]))
+
+                for start in range(0, len(group), size):
+                    chunk = group[start:start + size]
+
+                    if len(chunk) > 1:
+                        units.append(_FusedUnit(units=chunk,
+                            ensure_unique=run_unique))
+                    else:
+                        units.extend(chunk)
+
+            del run[:]
+
+        for unit in units_in:
+            entities = self._fuse_entities(unit)
+            unique = bool(unit.kwargs.get('ensure_unique'))
+
+            if entities is None or unique != run_unique:
+                flush()
+
+            if entities is None:
+                units.append(unit)
+                run_unique = None
+            else:
+                run.append(unit)
+                run_unique = unique
+
+        flush()
+
+        return units
+
+    def send_units(self, bulk=False, fuse=False):
+        """the units that will be sent, after they are fused and grouped
+        into bulk statements when those are asked for"""
+        units = self.fuse_units() if fuse else self.units
+
+        if bulk:
+            units = self.bulk_units(units=units)
+
+        return units
+
+    def pipeline_batches(self, units, max_size=None):
+        """groups consecutive units that do not depend on each other. A unit
+        depends on an earlier unit when it uses one of that unit's entities:
+        a relationship needs the ids of its start and end nodes, which are
+        only known once the units that create them have been refreshed.
+        Batches are split after max_size units"""
+        batches = []
+        batch = []
+        pending = set()
+
+        for unit in units:
+            entities = self.written_entities(unit)
+            uses = {id(e) for e in entities}
+
+            if batch and (uses & pending
+                or (max_size and len(batch) >= max_size)):
+                batches.append(batch)
+                batch = []
+                pending = set()
+
+            batch.append(unit)
+            pending.update(id(e) for e in entities)
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+    def send(self, bulk=False, pipeline=False, commit_every=None,
+             commit_bytes=None, callback=None, fuse=False):
         from .connection import ConnectionTransaction
 
 
-        response = Response(mapper=self.mapper)
+        if pipeline:
+            return self.send_pipelined(bulk=bulk, commit_every=commit_every,
+                commit_bytes=commit_bytes, callback=callback, fuse=fuse)
+
+        response = Response(mapper=self.mapper,
+            identity_map=self.identity_map)
 
         """each unit will be processed, its before events executed, then the
         actual query will be run, and the after and final events will be run.
         If the unit's entity is a relationship, the start and end entities
         will have their before events run instantly and their after and final
-        events appended to the unit's"""
+        events appended to the unit's.
+        When bulk is True, consecutive units that save the same type of node
+        are sent as a single UNWIND statement.
+        When fuse is True, units that save a connected subgraph, like two
+        new nodes and the relationship between them, are sent as a single
+        statement, see fuse_units.
+        When pipeline is True, the work is sent with send_pipelined.
+        Every entity hydrated while the work is sent is resolved through the
+        work's identity_map.
+        By default the whole work is sent in one transaction. commit_every
+        commits and begins a new transaction every commit_every units and
+        commit_bytes does the same once the units' params reach about
+        commit_bytes. When a callback is given, it is called with each
+        unit's Response instead of the responses being collected, and an
+        empty Response is returned, so large loads run in constant memory"""
         transaction = ConnectionTransaction(self.mapper.connection)
+        units = self.send_units(bulk=bulk, fuse=fuse)
+        written = set()
+        commit = _CommitPolicy(commit_every=commit_every,
+            commit_bytes=commit_bytes)
+        pending = None
+        sent = False
 
         try:
-            for unit in self.units:
-                unit.execute_before_events()
-                unit.prepare()
+            with self.mapper.session(identity_map=self.identity_map),\
+                naming_context(),\
+                self.mapper.entity_cache_buffer() as pending:
+                for unit in units:
+                    unit.execute_before_events()
+                    start = time.perf_counter()
+                    unit.prepare()
+                    prepared = time.perf_counter()
+
+                    resp, _ = self.mapper.transaction(query=unit.query,
+                        params=unit.params, transaction=transaction,
+                        invalidate=False)
+
+                    queried = time.perf_counter()
+                    written = self.invalidate(unit, written)
+                    unit.execute_after_events(response=resp)
+                    hydrated = time.perf_counter()
+                    unit.execute_final_events()
+
+                    self.notify(unit=unit, response=resp,
+                        prepare_time=prepared - start,
+                        query_time=queried - prepared,
+                        hydration_time=hydrated - queried)
+
+                    if callback:
+                        callback(resp)
+                    else:
+                        response += resp.data
+
+                    if commit.add(unit):
+                        written = self.commit(transaction, written, pending)
+
+            sent = True
+        except Exception as e:
+            raise e
+        else:
+            return response
+        finally:
+            # TODO: rollback all units if exception is thrown
+            transaction.cleanup()
+            self.invalidate(written=written)
+            self.flush_entity_cache(pending, committed=sent)
+            self.reset()
 
-                resp, _ = self.mapper.transaction(query=unit.query,
-                    params=unit.params, transaction=transaction)
+    def commit(self, transaction, written=None, pending=None):
+        """commits the transaction while the work is being sent, the next
+        unit begins a new one. The written labels are invalidated now that
+        they are committed and the buffered EntityCache snapshots are
+        stored"""
+        transaction.commit()
+        self.invalidate(written=written)
+        self.flush_entity_cache(pending)
+
+        return set()
+
+    def flush_entity_cache(self, pending, committed=True):
+        """stores the snapshots that were buffered while the work was sent
+        in the EntityCache, or drops them when the work failed"""
+        if pending is None:
+            return self
+
+        if committed:
+            pending.commit()
+        else:
+            pending.rollback()
 
-                unit.execute_after_events(response=resp)
-                unit.execute_final_events()
+        return self
 
-                response += resp.data
+    def send_pipelined(self, bulk=False, commit_every=None,
+                       commit_bytes=None, callback=None, fuse=False):
+        """sends the work with independent units pipelined. Each batch from
+        pipeline_batches is prepared and run back to back without waiting
+        for the results, the driver queues the statements in the open
+        transaction and sends them together, then the results are pulled
+        and the after and final events are run in the units' order. This
+        saves a round trip per unit in a batch.
+        bulk, fuse, commit_every, commit_bytes and callback work like they
+        do for send, but the transaction is only committed between batches
+        and batches are split after commit_every units"""
+        from .connection import ConnectionTransaction, Response as \
+            ConnectionResponse
+
+
+        response = Response(mapper=self.mapper,
+            identity_map=self.identity_map)
+        transaction = ConnectionTransaction(self.mapper.connection)
+        units = self.send_units(bulk=bulk, fuse=fuse)
+        written = set()
+        commit = _CommitPolicy(commit_every=commit_every,
+            commit_bytes=commit_bytes)
+        pending = None
+        sent = False
+
+        try:
+            with self.mapper.session(identity_map=self.identity_map),\
+                naming_context(),\
+                self.mapper.entity_cache_buffer() as pending:
+                for batch in self.pipeline_batches(units,
+                    max_size=commit_every):
+                    in_flight = []
+
+                    for unit in batch:
+                        unit.execute_before_events()
+                        start = time.perf_counter()
+                        unit.prepare()
+                        prepared = time.perf_counter()
+                        query, params = self.mapper._prepare_query(
+                            query=unit.query, params=unit.params)
+                        result = transaction.run(query, params)
+                        in_flight.append((unit, query, params, result,
+                            prepared - start, time.perf_counter() - prepared))
+
+                    for unit, query, params, result, prepare_time,\
+                        run_time in in_flight:
+                        pulled = time.perf_counter()
+
+                        try:
+                            res = ConnectionResponse(query=query,
+                                params=params, result=result)
+                        except ConstraintError as ce:
+                            raise MapperConstraintError(ce.message)
+
+                        resp = Response(mapper=self.mapper, response=res)
+                        queried = time.perf_counter()
+                        written = self.invalidate(unit, written)
+                        unit.execute_after_events(response=resp)
+                        hydrated = time.perf_counter()
+                        unit.execute_final_events()
+
+                        self.notify(unit=unit, response=resp,
+                            prepare_time=prepare_time,
+                            query_time=run_time + queried - pulled,
+                            hydration_time=hydrated - queried)
+
+                        if callback:
+                            callback(resp)
+                        else:
+                            response += resp.data
+
+                    if any([commit.add(unit) for unit in batch]):
+                        written = self.commit(transaction, written, pending)
+
+            sent = True
         except Exception as e:
             raise e
         else:
             return response
         finally:
-            # TODO: rollback all units if exception is thrown
             transaction.cleanup()
+            self.invalidate(written=written)
+            self.flush_entity_cache(pending, committed=sent)
             self.reset()
 
+    def written_labels(self, unit):
+        """the labels and relationship types that the unit writes. Units
+        that only read return an empty set and None is returned when the
+        unit could write any label"""
+        labels = set()
+
+        if is_read_query(unit.query):
+            return labels
+
+        for u in getattr(unit, 'units', None) or [unit,]:
+            entity = u.entity
+
+            if entity is None:
+                found = query_labels(unit.query)
+
+                if found is None:
+                    return None
+
+                labels.update(found)
+                continue
+
+            # a relationship has a single type instead of a list of labels
+            if isinstance(entity.labels, str):
+                labels.add(entity.labels)
+            else:
+                labels.update(entity.labels)
+
+            if isinstance(entity, Relationship):
+                for node in (entity.start, entity.end):
+                    labels.update(getattr(node, 'labels', None) or ())
+
+        return labels
+
+    def written_entities(self, unit):
+        entities = []
+
+        for u in getattr(unit, 'units', None) or [unit,]:
+            entity = u.entity
+
+            if entity is None:
+                continue
+
+            entities.append(entity)
+
+            if isinstance(entity, Relationship):
+                entities.extend(n for n in (entity.start, entity.end)
+                    if isinstance(n, Node))
+
+        return entities
+
+    def invalidate(self, unit=None, written=None):
+        """evicts the cached queries that could have been changed by the
+        unit from the mapper's QueryCache. The written labels are collected
+        so that they can be evicted again after the transaction is finished,
+        otherwise a read from another thread could cache data from before
+        the commit. None means that any label could have been written.
+
+        The unit's entities are also evicted from the mapper's EntityCache,
+        saved entities are put back when they are refreshed. See
+        invalidate_entities"""
+        cache = getattr(self.mapper, 'cache', None)
+        entity_cache = getattr(self.mapper, 'entity_cache', None)
+
+        if unit is not None and entity_cache is not None\
+            and not is_read_query(unit.query):
+            self.invalidate_entities(unit, entity_cache)
+
+        if unit is not None:
+            labels = self.written_labels(unit)
+
+            if labels is None:
+                written = None
+            elif written is not None:
+                written.update(labels)
+        else:
+            labels = written
+
+        if cache is None or labels == set():
+            return written
+
+        if labels is None:
+            cache.clear()
+        else:
+            cache.invalidate(*labels)
+
+        return written
+
+    def invalidate_entities(self, unit, entity_cache):
+        """evicts what the unit could have changed from the EntityCache. A
+        statement without an entity, like the ones that RelatedEntity.delete
+        adds, evicts every entity with the labels and relationship types in
+        its query, or the whole cache when any label could be written. A
+        DETACH DELETE also evicts the relationships of the deleted nodes"""
+        entities = self.written_entities(unit)
+
+        entity_cache.delete(*[entity_key(e.labels, e.id) for e in entities
+            if e.id is not None])
+
+        for u in getattr(unit, 'units', None) or [unit,]:
+            if u.entity is None:
+                labels = query_labels(unit.query)
+
+                if labels is None:
+                    entity_cache.clear()
+                else:
+                    entity_cache.invalidate(*labels)
+
+                break
+
+        if DETACH_DELETE_RE.search(unit.query or ''):
+            ids = [e.id for e in entities
+                if isinstance(e, Node) and e.id is not None]
+
+            if ids:
+                entity_cache.delete_attached(*ids)
+
+        return self
+
+    def notify(self, unit, response, prepare_time=0.0, query_time=0.0,
+               hydration_time=0.0):
+        """builds a UnitTiming for the unit and passes it to each of the
+        mapper's listeners"""
+        listeners = getattr(self.mapper, 'listeners', None)
+
+        if not listeners:
+            return self
+
+        result = response.response
+        timing = UnitTiming(unit=unit, query=unit.query, params=unit.params,
+            prepare_time=prepare_time, query_time=query_time,
+            server_time=getattr(result, 'server_time', None),
+            hydration_time=hydration_time,
+            rows=len(result.result_data) if result else 0)
+
+        for listener in listeners:
+            listener(timing)
+
+        return self
+
     def describe(self):
         return [u.describe() for u in self.units]
 
-    def queries(self):
+    def queries(self, bulk=False, fuse=False):
         queries = []
+        units = self.send_units(bulk=bulk, fuse=fuse)
 
-        for unit in self.units:
+        for unit in units:
             unit.prepare()
             queries.append((unit.query, unit.params,))
 
@@ -329,6 +1286,96 @@ class Work(object):
         return self
 
 
+class AsyncWork(Work):
+    """The asyncio version of Work. send must be awaited and any event that
+    returns an awaitable will be awaited before the unit moves on to its
+    next step"""
+
+    async def send(self, bulk=False, pipeline=False, commit_every=None,
+                   commit_bytes=None, callback=None, fuse=False):
+        """sends the units one after the other, see Work.send for bulk,
+        fuse, commit_every, commit_bytes and callback. A callback that
+        returns an awaitable is awaited. pipeline is not supported, the
+        units are not pipelined on the async driver and a TypeError is
+        raised"""
+        from .connection import AsyncConnectionTransaction
+
+
+        if pipeline:
+            raise TypeError('AsyncWork.send does not support pipeline')
+
+        response = Response(mapper=self.mapper,
+            identity_map=self.identity_map)
+        transaction = AsyncConnectionTransaction(self.mapper.connection)
+        units = self.send_units(bulk=bulk, fuse=fuse)
+        written = set()
+        commit = _CommitPolicy(commit_every=commit_every,
+            commit_bytes=commit_bytes)
+        pending = None
+        committed = False
+
+        try:
+            with self.mapper.session(identity_map=self.identity_map),\
+                naming_context(),\
+                self.mapper.entity_cache_buffer() as pending:
+                for unit in units:
+                    unit.execute_before_events()
+                    await unit.wait_pending()
+                    start = time.perf_counter()
+                    unit.prepare()
+                    await unit.wait_pending()
+                    prepared = time.perf_counter()
+
+                    resp, _ = await self.mapper.transaction(query=unit.query,
+                        params=unit.params, transaction=transaction,
+                        invalidate=False)
+
+                    queried = time.perf_counter()
+                    written = self.invalidate(unit, written)
+                    unit.execute_after_events(response=resp)
+                    await unit.wait_pending()
+                    hydrated = time.perf_counter()
+                    unit.execute_final_events()
+                    await unit.wait_pending()
+
+                    self.notify(unit=unit, response=resp,
+                        prepare_time=prepared - start,
+                        query_time=queried - prepared,
+                        hydration_time=hydrated - queried)
+
+                    if callback:
+                        result = callback(resp)
+
+                        if inspect.isawaitable(result):
+                            await result
+                    else:
+                        response += resp.data
+
+                    if commit.add(unit):
+                        written = await self.commit(transaction, written,
+                            pending)
+        except Exception as e:
+            await transaction.rollback()
+            raise e
+        else:
+            await transaction.cleanup()
+            committed = True
+
+            return response
+        finally:
+            self.invalidate(written=written)
+            self.flush_entity_cache(pending, committed=committed)
+            self.reset()
+
+    async def commit(self, transaction, written=None, pending=None):
+        """the asyncio version of Work.commit"""
+        await transaction.commit()
+        self.invalidate(written=written)
+        self.flush_entity_cache(pending)
+
+        return set()
+
+
 class _RootMapper(type):
 
     def __new__(cls, name, bases, attrs):
@@ -370,11 +1417,17 @@ class _RootMapper(type):
         get_props(attrs)
 
         def __build__(self):
-            self.properties = PropertyManager(properties=properties,
+            # every instance gets its own copies of the properties and
+            # relationships because their values and contexts are changed
+            # while the mapper is used
+            self.properties = PropertyManager(
+                properties={n: copy.copy(p) for n, p in properties.items()},
                 allow_undefined=bool(glob['undefined_props']),
                 data_type='python')
+            self.compile_properties()
             self.relationships = RelatedManager(mapper=self,
-                relationships=relationships,
+                relationships={n: r.clone()
+                    for n, r in relationships.items()},
                 allow_undefined=bool(glob['undefined_rels']))
 
         cls = super(_RootMapper, cls).__new__(cls, name, bases, attrs)
@@ -414,6 +1467,7 @@ class EntityMapper(with_metaclass(_RootMapper)):
     __ALLOW_UNDEFINED_PROPERTIES__ = True
     __ALLOW_UNDEFINED_RELATIONSHIPS__ = True
     __PROPERTY_MAPPINGS__ = {}
+    GET_BY_IDS_CHUNK_SIZE = 10000
 
     def __init__(self, mapper=None):
         self.mapper = mapper
@@ -493,6 +1547,7 @@ class EntityMapper(with_metaclass(_RootMapper)):
     def _set_allow_undefiend_properties(self, allow):
         self.__ALLOW_UNDEFINED_PROPERTIES__ = allow
         self.properties.allow_undefined = allow
+        self.compile_properties()
 
     allow_undefined_properties = property(_get_allow_undefined_properties,
         _set_allow_undefiend_properties)
@@ -520,8 +1575,18 @@ class EntityMapper(with_metaclass(_RootMapper)):
         _delete_entity_context)
 
     def get_work(self):
+        if self.mapper:
+            return self.mapper.get_work()
+
         return Work(mapper=self.mapper)
 
+    @property
+    def identity_map(self):
+        if self.mapper:
+            return self.mapper.identity_map
+
+        return None
+
     def get_mapper(self, entity):
         return get_mapper(entity=entity, mapper=self.mapper)
 
@@ -531,23 +1596,55 @@ class EntityMapper(with_metaclass(_RootMapper)):
 
         return entity.data
 
+    def compile_properties(self):
+        """compiles the mapper's properties into the converters used by
+        entity_data, one for each data type. This is called when the mapper
+        is built and whenever allow_undefined_properties changes"""
+        self._converters = {
+            'python': self.properties.compile(data_type='python'),
+            'graph': self.properties.compile(data_type='graph'),
+        }
+        self._row_converters = {
+            'python': self.properties.compile_rows(data_type='python'),
+            'graph': self.properties.compile_rows(data_type='graph'),
+        }
+
+        return self
+
     def entity_data(self, entity_data=None, data_type='python',
                     unique_only=False):
-        self.properties.data_type = data_type or self.data_type
-        self.properties.reset(clear_undefined=self.has_undefined_fields)
+        convert = self._converters[data_type or self.data_type]
+        data = convert(entity_data)
+
+        if not unique_only:
+            return data
+
+        unique = self.properties.unique_properties
 
-        return self.properties.data(entity_data, unique_only=unique_only)
+        return {k: v for k, v in data.items() if k in unique}
+
+    def entity_data_many(self, rows, data_type='python', use_numpy=False):
+        """the entity_data for each of the rows, converted a column at a
+        time"""
+        convert = self._row_converters[data_type or self.data_type]
+
+        return convert(rows, use_numpy=use_numpy)
 
     def unique_properties(self):
         return self.properties.unique_properties
 
+    def indexed_properties(self):
+        return self.properties.indexed_properties
+
     def create(self, id=None, entity=None, properties=None, labels=None,
-               start=None, end=None, entity_type=NODE, data_type='python'):
+               start=None, end=None, entity_type=NODE, data_type='python',
+               identity_map=None, convert=True):
         if not id and properties and 'id' in properties:
             id = properties['id']
             del properties['id']
 
-        properties = self.entity_data(properties or {}, data_type=data_type)
+        if identity_map is None:
+            identity_map = self.identity_map
 
         if labels and not entity:
             entity = get_entity(labels)
@@ -555,6 +1652,25 @@ class EntityMapper(with_metaclass(_RootMapper)):
         if not entity:
             entity = self.entity
 
+        # relationship types without a registered entity would otherwise be
+        # created as a generic Node
+        if entity_type == RELATIONSHIP and inspect.isclass(entity)\
+            and not issubclass(entity, Relationship):
+            entity = Relationship
+
+        if id is not None and identity_map is not None:
+            if inspect.isclass(entity) and issubclass(entity, Relationship):
+                entity_type = RELATIONSHIP
+
+            existing = identity_map.get(entity_type, id)
+
+            if existing is not None:
+                return existing
+
+        if convert:
+            properties = self.entity_data(properties or {},
+                data_type=data_type)
+
         try:
             entity = entity(id=id, properties=properties, labels=labels)
         except:
@@ -570,11 +1686,14 @@ class EntityMapper(with_metaclass(_RootMapper)):
         if end:
             entity.end = end
 
+        if identity_map is not None:
+            identity_map.add(entity)
+
         return entity
 
     def save(self, entity, ensure_unique=False, work=None, **kwargs):
         if not work:
-            work = Work(mapper=self.mapper)
+            work = self.get_work()
 
         EQV.define(entity)
 
@@ -588,7 +1707,7 @@ class EntityMapper(with_metaclass(_RootMapper)):
 
     def delete(self, entity, detach=True, work=None):
         if not work:
-            work = Work(mapper=self.mapper)
+            work = self.get_work()
 
         unit = _Unit(entity=entity, action=self._delete_entity, mapper=self,
             detach=detach, event_map=self._event_map, event=self.DELETE)
@@ -613,87 +1732,111 @@ class EntityMapper(with_metaclass(_RootMapper)):
                 unit.event = self.UPDATE
                 return self._update_node(entity)
             else:
-                """Tricky logic in this block. Since the main Mapper loops
-                over _Unit objects and executes their before and after events
-                in place and this code block is currently executing inside of
-                _Unit, this needs to register before and after events for the
-                start and end nodes. The before events will be executed
-                immediately because the before events for the relationship
-                entity have already been executed. The after events will be
-                added to the _Unit's after_events"""
                 unit.event = self.CREATE
-                start = entity.start
-                end = entity.end
+                self._bind_relationship_events(unit, **kwargs)
 
-                if not isinstance(start, Node):
-                    message = ('There must be a start node for the'
-                        ' relationship: {}'.format(entity))
-                    raise MapperException(message)
+                return self._create_relationship(entity=entity,
+                    ensure_unique=ensure_unique)
+        else:
+            error = ('The entity {} is not allowed to be saved as a '
+                'relationship'.format(entity))
 
-                if not isinstance(end, Node):
-                    message = ('There must be an end node for the'
-                        ' relationship: {}'.format(entity))
-                    raise MapperException(message)
+            raise MapperException(error)
 
-                EQV.define(start)
-                EQV.define(end)
+    def _bind_relationship_events(self, unit, exclude=None, **kwargs):
+        """Tricky logic in this method. Since the main Mapper loops
+        over _Unit objects and executes their before and after events
+        in place and this method is called while preparing a
+        _Unit, this needs to register before and after events for the
+        start and end nodes. The before events will be executed
+        immediately because the before events for the relationship
+        entity have already been executed. The after events will be
+        added to the _Unit's after_events. The events are not bound for
+        the start or end node when its id() is in exclude, which is used
+        when the node is saved by its own unit in the same statement"""
+        entity = unit.entity
+        start = entity.start
+        end = entity.end
 
-                start_mapper = get_mapper(entity=start, mapper=self.mapper)
-                end_mapper = get_mapper(entity=end, mapper=self.mapper)
+        if not isinstance(start, Node):
+            message = ('There must be a start node for the'
+                ' relationship: {}'.format(entity))
+            raise MapperException(message)
 
-                if start.id is not None:
-                    start_events = start_mapper._event_map[EntityMapper.UPDATE]
-                else:
-                    start_events = start_mapper._event_map[EntityMapper.CREATE]
+        if not isinstance(end, Node):
+            message = ('There must be an end node for the'
+                ' relationship: {}'.format(entity))
+            raise MapperException(message)
 
-                if end.id is not None:
-                    end_events = end_mapper._event_map[EntityMapper.UPDATE]
-                else:
-                    end_events = end_mapper._event_map[EntityMapper.CREATE]
+        EQV.define(start)
+        EQV.define(end)
 
-                # run all of the before events for the start and end nodes
-                for event in start_events['before']:
-                    event(start)
+        start_mapper = get_mapper(entity=start, mapper=self.mapper)
+        end_mapper = get_mapper(entity=end, mapper=self.mapper)
 
-                for event in end_events['before']:
-                    event(end)
+        exclude = exclude or set()
+        no_events = {'before': [], 'after': []}
 
-                # build all of the after events for both start and end
-                afters = []
+        if id(start) in exclude:
+            start_events = no_events
+        elif start.id is not None:
+            start_events = start_mapper._event_map[EntityMapper.UPDATE]
+        else:
+            start_events = start_mapper._event_map[EntityMapper.CREATE]
 
-                for event in start_events['after']:
-                    def bind_event(start_event):
-                        def after_event(entity, response=None, **ev_kwargs):
-                            ev_kwargs.update(**kwargs)
-                            start_event(start, response, **ev_kwargs)
+        if id(end) in exclude:
+            end_events = no_events
+        elif end.id is not None:
+            end_events = end_mapper._event_map[EntityMapper.UPDATE]
+        else:
+            end_events = end_mapper._event_map[EntityMapper.CREATE]
 
-                        afters.append(after_event)
+        # run all of the before events for the start and end nodes
+        for event in start_events['before']:
+            unit.run_event(event, start)
 
-                    bind_event(event)
+        for event in end_events['before']:
+            unit.run_event(event, end)
 
-                for event in end_events['after']:
-                    def bind_after_event(end_event):
-                        def after_event(entity, response=None, **ev_kwargs):
-                            ev_kwargs.update(**kwargs)
-                            end_event(end, response, **ev_kwargs)
+        # build all of the after events for both start and end
+        afters = []
 
-                        afters.append(after_event)
+        for event in start_events['after']:
+            def bind_event(start_event):
+                def after_event(entity, response=None, **ev_kwargs):
+                    ev_kwargs.update(**kwargs)
 
-                    bind_after_event(event)
+                    return start_event(start, response, **ev_kwargs)
 
-                unit.after_events = afters + unit.after_events
+                afters.append(after_event)
 
-                # add the finals
-                unit.final_events = start_mapper._event_map['final'] \
-                    + end_mapper._event_map['final'] + unit.final_events
+            bind_event(event)
 
-                return self._create_relationship(entity=entity,
-                    ensure_unique=ensure_unique)
-        else:
-            error = ('The entity {} is not allowed to be saved as a '
-                'relationship'.format(entity))
+        for event in end_events['after']:
+            def bind_after_event(end_event):
+                def after_event(entity, response=None, **ev_kwargs):
+                    ev_kwargs.update(**kwargs)
 
-            raise MapperException(error)
+                    return end_event(end, response, **ev_kwargs)
+
+                afters.append(after_event)
+
+            bind_after_event(event)
+
+        unit.after_events = afters + unit.after_events
+
+        # add the finals
+        finals = []
+
+        if id(start) not in exclude:
+            finals += start_mapper._event_map['final']
+
+        if id(end) not in exclude:
+            finals += end_mapper._event_map['final']
+
+        unit.final_events = finals + unit.final_events
+
+        return self
 
     def _create_node(self, entity):
         query = Query(entities=[entity,], params=self.mapper.params)
@@ -730,8 +1873,14 @@ class EntityMapper(with_metaclass(_RootMapper)):
                     entity.id = node.id
                     properties = {k:v for k,v  in node.items()}
 
+                    cache_record(self.entity_cache, node,
+                        labels=entity.labels)
+
                     entity.hydrate(properties=properties, reset=True)
 
+                    if self.identity_map is not None:
+                        self.identity_map.add(entity)
+
     def on_before_create(self, entity):
         pass
 
@@ -761,6 +1910,7 @@ class EntityMapper(with_metaclass(_RootMapper)):
         property name and the value is the name of the method that will handle
         it"""
         changes = entity.changes
+        results = []
 
         for field, values in changes.items():
             method = self._property_change_handlers.get(field, None)
@@ -772,8 +1922,10 @@ class EntityMapper(with_metaclass(_RootMapper)):
                     method = getattr(self, method_name)
 
             if method:
-                method(entity=entity, field=field,
-                    value_from=values['from'], value_to=values['to'])
+                results.append(method(entity=entity, field=field,
+                    value_from=values['from'], value_to=values['to']))
+
+        return await_all(results)
 
     def on_relationship_added(self, entity, response=None,
                               relationship_name=None, relationship_entity=None,
@@ -794,84 +1946,224 @@ class EntityMapper(with_metaclass(_RootMapper)):
         name, ie., {'on_relationship_has children_added`: self.some_method}
         These method have the same signature as defined above
         """
+        results = []
+
         if isinstance(entity, Relationship):
 
-            def trigger_relationship_event(other_entity, rel_end):
-                # if the other_entity is a Node object, we want to call this
-                # method again for its mapper, but also passing in the original
-                # Relationship entity
-                if isinstance(other_entity, Node):
-                    mapper = self.get_mapper(other_entity)
-                    mapper.on_relationship_added(entity=other_entity,
-                        response=response, relationship_name=relationship_name,
-                        relationship_entity=entity, relationship_end=rel_end,
-                        **kwargs)
+            def trigger_relationship_event(other_entity, rel_end):
+                # if the other_entity is a Node object, we want to call this
+                # method again for its mapper, but also passing in the original
+                # Relationship entity
+                if isinstance(other_entity, Node):
+                    mapper = self.get_mapper(other_entity)
+                    results.append(mapper.on_relationship_added(
+                        entity=other_entity, response=response,
+                        relationship_name=relationship_name,
+                        relationship_entity=entity, relationship_end=rel_end,
+                        **kwargs))
+
+            trigger_relationship_event(other_entity=entity.start,
+                rel_end='start')
+            trigger_relationship_event(other_entity=entity.end,
+                rel_end='end')
+
+            relationship_entity = entity
+
+        # call the custom methods
+        name = 'on_relationship_{}_added'.format(relationship_name).lower()
+        events = []
+
+        if name in self._relationship_added_handlers:
+            events.append(self.__relationship_added_handlers[name])
+
+        method = getattr(self, name, None)
+
+        if method:
+            events.append(method)
+
+        for event in events:
+            results.append(event(entity=entity, response=response,
+                relationship_entity=relationship_entity,
+                relationship_end=relationship_end, **kwargs))
+
+        return await_all(results)
+
+    def on_relationship_updated(self, entity, response=None, **kwargs):
+        pass
+
+    def on_relationship_removed(self, entity, response=None, **kwargs):
+        pass
+
+    # Utility methods
+    def get_by_id_unit(self, id_val=None):
+        def _get_by_id(unit, id_val=None):
+            helpers = Helpers()
+
+            return helpers.get_by_id(entity=unit.entity, id_val=id_val)
+
+        return _Unit(entity=self.entity(), action=_get_by_id, mapper=self,
+            id_val=id_val, event_map=self._event_map)
+
+    def get_by_ids_unit(self, ids):
+        def _get_by_ids(unit, ids=None):
+            helpers = Helpers()
+
+            return helpers.get_by_ids(entity=unit.entity, ids=ids)
+
+        return _Unit(entity=self.entity(), action=_get_by_ids, mapper=self,
+            ids=ids, event_map=self._event_map)
+
+    def get_by_ids_units(self, ids, chunk_size=None):
+        """splits the ids into chunks of chunk_size and returns a unit for
+        each chunk"""
+        chunk_size = chunk_size or self.GET_BY_IDS_CHUNK_SIZE
+        ids = list(ids)
+
+        return [self.get_by_ids_unit(ids=ids[i:i + chunk_size])
+            for i in range(0, len(ids), chunk_size)]
+
+    def order_by_ids(self, response, ids):
+        """orders the response's records in the same order as the ids. This
+        is done on the raw records so that entities are still hydrated
+        lazily"""
+        position = {}
+
+        for i, id_val in enumerate(ids):
+            position.setdefault(id_val, i)
+
+        def key(data):
+            if isinstance(data, dict):
+                id_val = data.get('id')
+            else:
+                id_val = getattr(data, 'id', None)
+
+            return position.get(id_val, len(position))
+
+        response.data.sort(key=key)
+
+        return response
+
+    def single_result(self, result, id_val=None):
+        if len(result) > 1:
+            err = ('There was more than one result for id: {}'.format(id_val))
+            raise MapperException(err)
+
+        return result[0] if len(result) else None
+
+    @property
+    def entity_cache(self):
+        return getattr(self.mapper, 'entity_cache', None)
+
+    def entity_cache_key(self, id_val):
+        labels = self.entity.lbl() if self.entity else []
 
-            trigger_relationship_event(other_entity=entity.start,
-                rel_end='start')
-            trigger_relationship_event(other_entity=entity.end,
-                rel_end='end')
+        if not labels or id_val is None:
+            return None
 
-            relationship_entity = entity
+        return entity_key(labels, id_val)
 
-        # call the custom methods
-        name = 'on_relationship_{}_added'.format(relationship_name).lower()
-        events = []
+    def from_snapshot(self, snapshot):
+        """creates the entity from an EntityCache snapshot"""
+        creator = self.mapper or self
 
-        if name in self._relationship_added_handlers:
-            events.append(self.__relationship_added_handlers[name])
+        return creator.create(id=snapshot['id'], labels=snapshot['labels'],
+            properties=dict(snapshot['properties']),
+            entity_type=snapshot['entity_type'], start=snapshot['start'],
+            end=snapshot['end'])
 
-        method = getattr(self, name, None)
+    def get_cached(self, ids):
+        """returns a dict of id to entity for the ids that are in the
+        mapper's EntityCache"""
+        cache = self.entity_cache
 
-        if method:
-            events.append(method)
+        if cache is None:
+            return {}
 
-        for event in events:
-            event(entity=entity, response=response,
-                relationship_entity=relationship_entity,
-                relationship_end=relationship_end, **kwargs)
+        keys = {}
 
-    def on_relationship_updated(self, entity, response=None, **kwargs):
-        pass
+        for id_val in ids:
+            key = self.entity_cache_key(id_val)
 
-    def on_relationship_removed(self, entity, response=None, **kwargs):
-        pass
+            if key is not None:
+                keys[key] = id_val
+
+        snapshots = cache.get_many(list(keys.keys()))
+
+        return {keys[k]: self.from_snapshot(s) for k, s in snapshots.items()}
 
-    # Utility methods
     def get_by_id(self, id_val=None, work=None):
-        def _get_by_id(unit, id_val=None):
-            helpers = Helpers()
+        cached = self.get_cached([id_val,])
 
-            return helpers.get_by_id(entity=unit.entity, id_val=id_val)
+        if id_val in cached:
+            return cached[id_val]
 
         if not work:
             work = Work(mapper=self.mapper)
 
-        unit = _Unit(entity=self.entity(), action=_get_by_id, mapper=self,
-            id_val=id_val, event_map=self._event_map)
-        work.add_unit(unit)
+        work.add_unit(self.get_by_id_unit(id_val=id_val))
         result = work.send()
 
-        if len(result) > 1:
-            err = ('There was more than one result for id: {}'.format(id_val))
-            raise MapperException(err)
+        return self.single_result(result, id_val=id_val)
 
-        return result[0] if len(result) else None
+    def get_by_ids(self, ids, work=None, chunk_size=None):
+        """loads the entities for the ids. Entities that are in the mapper's
+        EntityCache are not queried"""
+        ids = list(ids)
+        cached = self.get_cached(ids)
+        missing = [i for i in ids if i not in cached]
 
-    def get_by_ids(self, ids, work=None):
-        def _get_by_ids(unit, ids=None):
-            helpers = Helpers()
+        if missing:
+            if not work:
+                work = Work(mapper=self.mapper)
 
-            return helpers.get_by_ids(entity=unit.entity, ids=ids)
+            for unit in self.get_by_ids_units(ids=missing,
+                chunk_size=chunk_size):
+                work.add_unit(unit)
 
-        if not work:
-            work = Work(mapper=self.mapper)
+            response = work.send()
+        else:
+            response = Response(mapper=self.mapper or self)
 
-        unit = _Unit(entity=self.entity(), action=_get_by_ids, mapper=self,
-            ids=ids, event_map=self._event_map)
-        work.add_unit(unit)
+        response.data.extend(cached.values())
+
+        return self.order_by_ids(response, ids)
+
+    def get_prefetch_relationship(self, relationship_name):
+        if relationship_name not in self.relationships:
+            msg = ('The relationship {} is not defined on {} and cannot'
+                ' be prefetched'.format(relationship_name,
+                    self.__class__.__name__))
+            raise MapperException(msg)
 
-        return work.send()
+        return self.relationships[relationship_name]
+
+    def prefetch(self, entities, *relationship_names,
+                 return_relationship=False):
+        """eager loads the named relationships for many entities with one
+        query per relationship instead of one query per entity. Calling the
+        relationship for any of the entities afterwards will return the
+        prefetched results:
+
+            mapper.prefetch(users, 'Follows', 'Tweets')
+
+            for user in users:
+                follows = mapper(user)['Follows']()
+        """
+        entities = [e for e in entities if e.id is not None]
+
+        if not entities:
+            return entities
+
+        for name in relationship_names:
+            related = self.get_prefetch_relationship(name)
+            query, params = related.prefetch_query(entities,
+                return_relationship=return_relationship)
+            response = self.mapper.query(query=query, params=params)
+
+            related.set_prefetched(entities, response,
+                return_relationship=return_relationship)
+
+        return entities
 
     def builder(self, entity=None, query_variable=None):
         entity = entity or self.entity()
@@ -940,11 +2232,44 @@ class StructuredRelationshipMapper(EntityRelationshipMapper):
 class Mapper(object):
     PARAM_PREFIX = '$NM'
 
-    def __init__(self, connection=None):
+    def __init__(self, connection=None, cache=None, entity_cache=None):
         self.connection = connection
         self.params = Params(self.PARAM_PREFIX)
         self.params = None
         self.units = []
+        self.listeners = []
+        self.cache = cache
+        self.entity_cache = entity_cache
+
+    def _get_entity_cache(self):
+        """the EntityCache, or the PendingEntityCache of the work that is
+        being sent in the current context"""
+        return (_ENTITY_CACHES.get() or {}).get(id(self), self._entity_cache)
+
+    def _set_entity_cache(self, entity_cache):
+        self._entity_cache = entity_cache
+
+    entity_cache = property(_get_entity_cache, _set_entity_cache)
+
+    @contextmanager
+    def entity_cache_buffer(self):
+        """While the buffer is active, the snapshots that the mapper writes
+        to its EntityCache are held in a PendingEntityCache. The work that
+        is being sent commits it once its transaction is committed. None is
+        yielded when the mapper does not have an EntityCache"""
+        if self._entity_cache is None:
+            yield None
+            return
+
+        pending = PendingEntityCache(self.entity_cache)
+        caches = dict(_ENTITY_CACHES.get() or {})
+        caches[id(self)] = pending
+        token = _ENTITY_CACHES.set(caches)
+
+        try:
+            yield pending
+        finally:
+            _ENTITY_CACHES.reset(token)
 
     def __call__(self, entity):
         mapper = self.get_mapper(entity)
@@ -972,7 +2297,54 @@ class Mapper(object):
         return self
 
     def get_work(self):
-        return Work(mapper=self)
+        return Work(mapper=self, identity_map=self.identity_map)
+
+    def add_listener(self, listener):
+        """adds a callable that is given a moesha.instrument.UnitTiming for
+        every unit that is sent by a Work created by this mapper"""
+        self.listeners.append(listener)
+
+        return self
+
+    def remove_listener(self, listener):
+        try:
+            self.listeners.remove(listener)
+        except ValueError:
+            pass
+
+        return self
+
+    @contextmanager
+    def session(self, identity_map=None):
+        """While the session is active, every entity hydrated by the mapper
+        with an id is resolved through a single IdentityMap, so loading the
+        same node twice returns the same object:
+
+            with mapper.session():
+                a = mapper.get_by_id(User, id_val=1)
+                b = mapper.get_by_id(User, id_val=1)
+
+                assert a is b
+
+        Sessions can be nested, the previous identity map is restored when
+        the session exits"""
+        if identity_map is None:
+            identity_map = IdentityMap()
+
+        sessions = dict(_SESSIONS.get() or {})
+        sessions[id(self)] = identity_map
+        token = _SESSIONS.set(sessions)
+
+        try:
+            yield identity_map
+        finally:
+            _SESSIONS.reset(token)
+
+    @property
+    def identity_map(self):
+        """the IdentityMap of the active session in the current context,
+        sessions are not shared between threads"""
+        return (_SESSIONS.get() or {}).get(id(self))
 
     def get_mapper(self, entity):
         return get_mapper(entity=entity, mapper=self)
@@ -987,7 +2359,7 @@ class Mapper(object):
 
     def save(self, *entities, ensure_unique=False, work=None, **kwargs):
         if not work:
-            work = Work(mapper=self)
+            work = self.get_work()
 
         for entity in entities:
             work.remove_entity_unit(entity)
@@ -998,9 +2370,49 @@ class Mapper(object):
 
         return work
 
+    def upsert_work(self, entity, rows, work=None, chunk_size=None):
+        """adds the units that upsert the rows to the work. Each row is a
+        dict of properties or an entity. Returns the entities and the
+        work"""
+        work = work or self.get_work()
+        batch = self.get_work()
+        mapper = self.get_mapper(entity=entity)
+        entities = []
+
+        for row in rows:
+            if not isinstance(row, Entity):
+                row = self.create(entity=entity, properties=row)
+
+            entities.append(row)
+            mapper.save(entity=row, ensure_unique=True, work=batch)
+
+        for unit in batch.bulk_units(size=chunk_size):
+            work.add_unit(unit)
+
+        return entities, work
+
+    def upsert_many(self, entity, rows, work=None, chunk_size=None,
+                    **kwargs):
+        """saves the rows with a single UNWIND statement per chunk. When the
+        entity's mapper has unique properties, the nodes are MERGEd on them
+        and the rest of the properties are added to the matched or created
+        node, otherwise the nodes are created:
+
+            users = mapper.upsert_many(User, [{'email': 'mark@example.com',
+                'name': 'mark'}], commit_every=10)
+
+        kwargs are passed to Work.send. Returns the entities with their
+        ids"""
+        entities, work = self.upsert_work(entity=entity, rows=rows,
+            work=work, chunk_size=chunk_size)
+
+        work.send(**kwargs)
+
+        return entities
+
     def delete(self, entity, detach=True, work=None):
         if not work:
-            work = Work(mapper=self)
+            work = self.get_work()
 
         mapper = self.get_mapper(entity=entity)
 
@@ -1009,15 +2421,19 @@ class Mapper(object):
         return work
 
     def create(self, id=None, entity=None, properties=None, labels=None,
-               entity_type=NODE, start=None, end=None, data_type='python'):
+               entity_type=NODE, start=None, end=None, data_type='python',
+               identity_map=None, convert=True):
         if labels and not entity:
             entity = get_entity(labels)
 
         mapper = self.get_mapper(entity=entity)
 
+        if identity_map is None:
+            identity_map = self.identity_map
+
         return mapper.create(id=id, entity=entity, properties=properties,
             labels=labels, entity_type=entity_type, start=start, end=end,
-            data_type=data_type)
+            data_type=data_type, identity_map=identity_map, convert=convert)
 
     def get_by_id(self, entity=None, id_val=None, work=None):
         entity = entity or Node
@@ -1026,14 +2442,13 @@ class Mapper(object):
 
         return mapper.get_by_id(id_val=id_val)
 
-    def get_by_ids(self, ids, entity=None, work=None):
+    def get_by_ids(self, ids, entity=None, work=None, chunk_size=None):
         entity = entity or Node
         mapper = self.get_mapper(entity)
 
-        return mapper.get_by_ids(ids=ids, work=work)
+        return mapper.get_by_ids(ids=ids, work=work, chunk_size=chunk_size)
 
-    #@timeit
-    def query(self, pypher=None, query=None, params=None):
+    def _prepare_query(self, pypher=None, query=None, params=None):
         if pypher:
             if isinstance(pypher, Partial):
                 pypher.build()
@@ -1050,9 +2465,46 @@ class Mapper(object):
         LOG.debug(query, params)
         LOG.debug(_query_debug(query, params))
 
+        return query, params or {}
+
+    def _cached(self, query, params, run, invalidate=True, cache=True):
+        """runs the query through the mapper's QueryCache. Read queries are
+        answered from the cache when possible and write queries invalidate
+        the entries for the labels they touch when invalidate is set"""
+        query_cache = self.cache if cache else None
+
+        if query_cache is None:
+            return run()
+
+        res = query_cache.get(query, params)
+
+        if res is not None:
+            return res
+
+        res = run()
+
+        query_cache.set(query, params, res)
+
+        if invalidate:
+            query_cache.invalidate_query(query)
+
+        return res
+
+    #@timeit
+    def query(self, pypher=None, query=None, params=None, stream=False,
+              fetch_size=None, cache=True):
+        query, params = self._prepare_query(pypher=pypher, query=query,
+            params=params)
+
+        if stream:
+            records = self.connection.stream(query=query, params=params,
+                fetch_size=fetch_size)
+
+            return StreamResponse(mapper=self, records=records)
+
         try:
-            params = params or {}
-            res = self.connection.query(query=query, params=params)
+            res = self._cached(query, params, cache=cache,
+                run=lambda: self.connection.query(query=query, params=params))
             response = Response(mapper=self, response=res)
 
             return response
@@ -1065,29 +2517,16 @@ class Mapper(object):
 
     #@timeit
     def transaction(self, pypher=None, query=None, params=None,
-                    transaction=None):
+                    transaction=None, invalidate=True):
         if not transaction:
             transaction = self.connection.driver
 
-        if pypher:
-            if isinstance(pypher, Partial):
-                pypher.build()
-                pypher = pypher.pypher
-
-            query = str(pypher)
-            params = pypher.bound_params
-
-        from .util import _query_debug
-        # print('*'*80)
-        # print(_query_debug(query, params), ";")
-        # print(params)
-        # print('-'*80)
-        LOG.debug(query, params)
-        LOG.debug(_query_debug(query, params))
+        query, params = self._prepare_query(pypher=pypher, query=query,
+            params=params)
 
         try:
-            params = params or {}
-            res = transaction.query(query=query, params=params)
+            res = self._cached(query, params, invalidate=invalidate,
+                run=lambda: transaction.query(query=query, params=params))
             response = Response(mapper=self, response=res)
 
             return response, transaction
@@ -1106,18 +2545,177 @@ class Mapper(object):
 
         return mapper.refresh(entity)
 
+    def prefetch(self, entities, *relationship_names,
+                 return_relationship=False):
+        entities = list(entities)
+
+        if not entities:
+            return entities
+
+        mapper = self.get_mapper(entities[0])
+
+        return mapper.prefetch(entities, *relationship_names,
+            return_relationship=return_relationship)
+
     def unique_properties(self, entity):
         mapper = self.get_mapper(entity)
 
         return mapper.unique_properties()
 
 
+class AsyncMapper(Mapper):
+    """This is the asyncio version of the Mapper. It must be used with an
+    AsyncConnection. Saving and deleting entities still queue units on a
+    Work object, but the work returned is an AsyncWork whose send method
+    must be awaited. Every method that talks to the graph is a coroutine:
+
+        work = mapper.save(user)
+        await work.send()
+
+        user = await mapper.get_by_id(User, id_val=1)
+        response = await mapper.query(query='MATCH (n) RETURN n LIMIT 1')
+
+    Event methods, like on_after_create, may be coroutines when used with
+    this mapper"""
+
+    def get_work(self):
+        return AsyncWork(mapper=self, identity_map=self.identity_map)
+
+    async def get_by_id(self, entity=None, id_val=None, work=None):
+        entity = entity or Node
+        mapper = self.get_mapper(entity=entity)
+        cached = mapper.get_cached([id_val,])
+
+        if id_val in cached:
+            return cached[id_val]
+
+        work = work or self.get_work()
+        result = await work.add_unit(mapper.get_by_id_unit(
+            id_val=id_val)).send()
+
+        return mapper.single_result(result, id_val=id_val)
+
+    async def get_by_ids(self, ids, entity=None, work=None, chunk_size=None):
+        entity = entity or Node
+        mapper = self.get_mapper(entity)
+        ids = list(ids)
+        cached = mapper.get_cached(ids)
+        missing = [i for i in ids if i not in cached]
+
+        if missing:
+            work = work or self.get_work()
+
+            for unit in mapper.get_by_ids_units(ids=missing,
+                chunk_size=chunk_size):
+                work.add_unit(unit)
+
+            response = await work.send()
+        else:
+            response = Response(mapper=self)
+
+        response.data.extend(cached.values())
+
+        return mapper.order_by_ids(response, ids)
+
+    async def upsert_many(self, entity, rows, work=None, chunk_size=None):
+        entities, work = self.upsert_work(entity=entity, rows=rows,
+            work=work, chunk_size=chunk_size)
+
+        await work.send()
+
+        return entities
+
+    async def query(self, pypher=None, query=None, params=None, cache=True):
+        query, params = self._prepare_query(pypher=pypher, query=query,
+            params=params)
+
+        try:
+            res = await self._async_cached(query, params, cache=cache,
+                run=lambda: self.connection.query(query=query, params=params))
+
+            return Response(mapper=self, response=res)
+        except ConstraintError as ce:
+            raise MapperConstraintError(ce.message)
+
+    async def _async_cached(self, query, params, run, invalidate=True,
+                            cache=True):
+        query_cache = self.cache if cache else None
+
+        if query_cache is None:
+            return await run()
+
+        res = query_cache.get(query, params)
+
+        if res is not None:
+            return res
+
+        res = await run()
+
+        query_cache.set(query, params, res)
+
+        if invalidate:
+            query_cache.invalidate_query(query)
+
+        return res
+
+    async def transaction(self, pypher=None, query=None, params=None,
+                          transaction=None, invalidate=True):
+        if not transaction:
+            transaction = self.connection
+
+        query, params = self._prepare_query(pypher=pypher, query=query,
+            params=params)
+
+        try:
+            res = await self._async_cached(query, params,
+                invalidate=invalidate,
+                run=lambda: transaction.query(query=query, params=params))
+            response = Response(mapper=self, response=res)
+
+            return response, transaction
+        except ConstraintError as ce:
+            raise MapperConstraintError(ce.message)
+
+    async def prefetch(self, entities, *relationship_names,
+                       return_relationship=False):
+        entities = [e for e in entities if e.id is not None]
+
+        if not entities:
+            return entities
+
+        mapper = self.get_mapper(entities[0])
+
+        for name in relationship_names:
+            related = mapper.get_prefetch_relationship(name)
+            query, params = related.prefetch_query(entities,
+                return_relationship=return_relationship)
+            response = await self.query(query=query, params=params)
+
+            related.set_prefetched(entities, response,
+                return_relationship=return_relationship)
+
+        return entities
+
+    async def refresh(self, entity):
+        if entity.id:
+            new = await self.get_by_id(entity=entity.__class__,
+                id_val=entity.id)
+            entity.hydrate(properties=new.data, reset=True)
+
+        return entity
+
+
 class Response(Collection):
 
-    def __init__(self, mapper, response=None):
+    def __init__(self, mapper, response=None, identity_map=None):
         self.mapper = mapper
         self.response = response
 
+        if identity_map is None:
+            identity_map = getattr(mapper, 'identity_map', None)
+
+        self.identity_map = identity_map
+
         # response.data and response.result_data serve different purposes,
         # .data is a list of all results while .result_data represents logical
         # coupling. This is illustrated by the query
@@ -1182,6 +2780,71 @@ class Response(Collection):
                 self.index = 0
                 raise StopIteration(e)
 
+    def hydrate(self, use_numpy=False):
+        """hydrates all of the entities that have not been hydrated yet in
+        one pass. Node and relationship records are grouped by their mapper
+        and each group's properties are converted a column at a time with
+        EntityMapper.entity_data_many instead of row by row. Other records
+        are hydrated the same way that indexing the response does"""
+        records = self.data[len(self.entities):]
+        entities = [None] * len(records)
+        identity_map = self.identity_map
+        groups = {}
+        entity_mappers = {}
+
+        if identity_map is None:
+            identity_map = self.mapper.identity_map
+
+        entity_cache = getattr(self.mapper, 'entity_cache', None)
+
+        for index, record in enumerate(records):
+            if isinstance(record, types.Relationship):
+                labels = (record.type,)
+            elif isinstance(record, types.Node):
+                labels = tuple(record.labels)
+            else:
+                entities[index] = self._get_entity(record)
+                continue
+
+            cache_record(entity_cache, record)
+
+            if labels not in entity_mappers:
+                entity = get_entity(labels) if labels else None
+
+                if isinstance(self.mapper, EntityMapper):
+                    mapper = self.mapper
+                else:
+                    mapper = self.mapper.get_mapper(entity=entity)
+
+                entity_mappers[labels] = (entity, mapper)
+
+            entity, mapper = entity_mappers[labels]
+            groups.setdefault(id(mapper), (mapper, []))[1].append(
+                (index, record, entity, labels))
+
+        for mapper, group in groups.values():
+            rows = mapper.entity_data_many([g[1]._properties for g in group],
+                use_numpy=use_numpy)
+
+            for (index, record, entity, labels), properties in zip(group,
+                rows):
+                start_id = end_id = None
+                entity_type = NODE
+
+                if isinstance(record, types.Relationship):
+                    entity_type = RELATIONSHIP
+                    start_id = record.start_node.id
+                    end_id = record.end_node.id
+
+                entities[index] = mapper.create(id=record.id, entity=entity,
+                    labels=list(labels) or None, properties=properties,
+                    entity_type=entity_type, start=start_id, end=end_id,
+                    identity_map=identity_map, convert=False)
+
+        self.entities.extend(entities)
+
+        return self
+
     def _get_entity(self, data):
         try:
             mapper = self.mapper
@@ -1192,7 +2855,12 @@ class Response(Collection):
             properties = {}
             _id = None
 
+            if isinstance(data, (Node, Relationship)):
+                # entities that were loaded from the EntityCache
+                return data
+
             if isinstance(data, types.Relationship):
+                cache_record(getattr(mapper, 'entity_cache', None), data)
                 entity_type = RELATIONSHIP
                 start = data.start_node.id
                 end = data.end_node.id
@@ -1200,6 +2868,7 @@ class Response(Collection):
                 properties = data._properties
                 _id = data.id
             elif isinstance(data, types.Node):
+                cache_record(getattr(mapper, 'entity_cache', None), data)
                 labels = data.labels
                 properties = data._properties
                 _id = data.id
@@ -1249,10 +2918,78 @@ class Response(Collection):
 
             return mapper.create(id=_id, labels=labels,
                 properties=properties, entity_type=entity_type,
-                start=start, end=end)
+                start=start, end=end, identity_map=self.identity_map)
         except Exception as e:
             raise e
 
+    def to_columns(self, entity=None, use_numpy=True):
+        """builds a dict of column name to column directly from the driver
+        records, without hydrating any entities. Node and relationship
+        records get an id column (and start and end columns for
+        relationships) and a column for each property, converted with the
+        mapper for the entity or the first record's labels. Other records
+        get a column for each of their fields.
+
+        When NumPy is installed and use_numpy is set, every column is a NumPy
+        array; numeric, boolean and timestamp properties are typed arrays
+        and the rest are object arrays. Otherwise the columns are lists"""
+        records = self.data
+        entity_records = [r for r in records
+            if isinstance(r, (types.Node, types.Relationship))]
+        use_numpy = use_numpy and numpy is not None
+        columns = OrderedDict()
+
+        if entity_records:
+            first = entity_records[0]
+
+            if isinstance(self.mapper, EntityMapper):
+                mapper = self.mapper
+            else:
+                if entity is None:
+                    if isinstance(first, types.Relationship):
+                        labels = (first.type,)
+                    else:
+                        labels = tuple(first.labels)
+
+                    entity = get_entity(labels) if labels else None
+
+                mapper = self.mapper.get_mapper(entity=entity)
+
+            columns['id'] = [r.id for r in entity_records]
+
+            if isinstance(first, types.Relationship):
+                columns['start'] = [r.start_node.id for r in entity_records]
+                columns['end'] = [r.end_node.id for r in entity_records]
+
+            convert = mapper.properties.compile_columns(data_type='python')
+            columns.update(convert([r._properties for r in entity_records],
+                use_numpy=use_numpy))
+        elif records and isinstance(records[0], dict):
+            for record in records:
+                for name in record:
+                    columns[name] = None
+
+            for name in columns:
+                columns[name] = [r.get(name) for r in records]
+        elif records:
+            columns['result'] = list(records)
+
+        if use_numpy:
+            for name, column in columns.items():
+                if not isinstance(column, numpy.ndarray):
+                    array = numpy.empty(len(column), dtype=object)
+                    array[:] = column
+                    columns[name] = array
+
+        return columns
+
+    def to_pandas(self, entity=None):
+        """the columns from to_columns as a pandas DataFrame. pandas is
+        only imported when this is called"""
+        import pandas
+
+        return pandas.DataFrame(self.to_columns(entity=entity))
+
     def __iadd__(self, other):
         if isinstance(other, Response):
             self.data.extend(other.data)
@@ -1262,6 +2999,141 @@ class Response(Collection):
         return self
 
 
+class StreamResponse(Response):
+    """This response hydrates entities lazily as records are pulled from the
+    connection. Only the current record is held in memory, so it can only
+    be iterated over once and does not support len() or indexing.
+
+    Records with a single field are hydrated from that field's value and
+    records with multiple fields are hydrated as a generic entity whose
+    properties are the fields, the same way Response handles them"""
+
+    def __init__(self, mapper, records):
+        super(StreamResponse, self).__init__(mapper=mapper)
+
+        self.records = records
+
+    def __iter__(self):
+        try:
+            for record in self.records:
+                if len(record) == 1:
+                    record = next(iter(record.values()))
+
+                yield self._get_entity(record)
+        except ConstraintError as ce:
+            raise MapperConstraintError(ce.message)
+
+    def __len__(self):
+        raise TypeError('StreamResponse does not have a length')
+
+    def __getitem__(self, key):
+        raise TypeError('StreamResponse does not support indexing')
+
+    def first(self):
+        for entity in self:
+            self.close()
+
+            return entity
+
+        return None
+
+    def close(self):
+        close = getattr(self.records, 'close', None)
+
+        if close:
+            close()
+
+        return self
+
+
+class Page(Collection):
+    """A page of entities from a keyset paginated query. cursor is the
+    opaque cursor that is passed as after to get the next page, it is None
+    when this is the last page:
+
+        page = mapper(user)['Follows'].page(size=20, order_by='name')
+
+        while page.cursor:
+            page = mapper(user)['Follows'].page(after=page.cursor, size=20,
+                order_by='name')
+    """
+
+    def __init__(self, entities=None, cursor=None, size=None):
+        super(Page, self).__init__(entities=list(entities or []))
+
+        self.cursor = cursor
+        self.size = size
+
+    def __repr__(self):
+        return '<moesha.mapper.Page: {} entities has_more={}>'.format(
+            len(self), self.has_more)
+
+    @property
+    def has_more(self):
+        return self.cursor is not None
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __getitem__(self, key):
+        try:
+            return self.entities[key]
+        except IndexError as e:
+            self.index = 0
+            raise StopIteration(e)
+
+    @classmethod
+    def from_results(cls, results, size, order_by=None):
+        """builds the page from the results of a query that asked for one
+        more row than size. The cursor is made from the last entity's
+        order_by property, in its graph form, and its id. The value is read
+        from the raw record when there is one because hydrating replaces a
+        missing property with its default, and the cursor must keep it as
+        None so that the next page starts inside the null rows"""
+        entities = list(results)
+        cursor = None
+
+        if len(entities) > size:
+            entities = entities[:size]
+            last = entities[-1]
+            value = None
+
+            if order_by:
+                records = getattr(results, 'data', None)
+                record = None
+
+                if isinstance(records, (list, tuple))\
+                    and len(records) >= size:
+                    record = cls._graph_record(records[size - 1], last)
+
+                if record is not None:
+                    value = record.get(order_by)
+                elif last._data.get(order_by) is not None:
+                    mapper = get_mapper(last, None)
+                    data = mapper.entity_data(last.data, data_type='graph')
+                    value = data.get(order_by)
+
+            cursor = encode_cursor(value, last.id)
+
+        return cls(entities=entities, cursor=cursor, size=size)
+
+    @staticmethod
+    def _graph_record(record, entity):
+        """the driver Node or Relationship that the entity was hydrated
+        from, its properties are already in their graph form"""
+        if isinstance(record, dict):
+            values = record.values()
+        else:
+            values = [record]
+
+        for value in values:
+            if isinstance(value, (types.Node, types.Relationship))\
+                and value.id == entity.id:
+                return value
+
+        return None
+
+
 class MapperException(Exception):
 
     def __init__(self, message):
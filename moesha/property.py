@@ -1,5 +1,6 @@
 import copy
 import json
+import weakref
 
 from collections import OrderedDict
 from datetime import datetime
@@ -7,6 +8,11 @@ from dateutil.parser import parse
 
 from .query import RelatedEntityQuery
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class PropertyManager(object):
 
@@ -66,6 +72,14 @@ class PropertyManager(object):
 
         return OrderedDict(sorted(props.items()))
 
+    @property
+    def indexed_properties(self):
+        """this will return a list of properties that have indexed=True
+        """
+        props = {k:p for k, p in self.properties.items() if p.indexed}
+
+        return OrderedDict(sorted(props.items()))
+
     @property
     def default_data(self):
         data = {n: f.value for n, f in self.properties.items()}
@@ -98,6 +112,143 @@ class PropertyManager(object):
 
         return unique_data
 
+    def compile(self, data_type='python'):
+        """compiles the defined properties into a function that converts a
+        dict of raw values into the data for the data_type. The function
+        only closes over the properties' settings, it never sets their
+        values, so it can be shared between threads and entities"""
+        fields = tuple((n, p.initial_value, p.default, p.immutable,
+            tuple(p.options), p.converter(data_type))
+            for n, p in sorted(self.properties.items()) if not p.undefined)
+        defined = frozenset(n for n, *_ in fields)
+        allow_undefined = self.allow_undefined
+        undefined_converters = {obj: obj().converter(data_type)
+            for obj in (Boolean, String, Integer, Float, DateTime, Property)}
+
+        def convert(properties=None):
+            properties = properties or {}
+            data = {}
+
+            for name, initial, default, immutable, options, converter\
+                in fields:
+                value = initial
+
+                if name in properties and not immutable:
+                    given = properties[name]
+
+                    if not options or given in options:
+                        value = given
+
+                if callable(value):
+                    value = value()
+
+                if value is None and default:
+                    value = default() if callable(default) else default
+
+                data[name] = converter(value)
+
+            if allow_undefined:
+                for name, value in properties.items():
+                    if name not in defined:
+                        obj = undefined_property_type(value)
+                        data[name] = undefined_converters[obj](value)
+
+            return data
+
+        return convert
+
+    def compile_columns(self, data_type='python', undefined=True):
+        """compiles the defined properties into a function that converts a
+        list of rows of raw values a column at a time. It returns an
+        OrderedDict of property name to converted column. Each column is
+        converted in a single call to the property's convert_column, which
+        returns a NumPy array for numeric columns when use_numpy is set.
+
+        Undefined properties get a column when they are allowed and
+        undefined is set, rows without the property have None in that
+        column"""
+        fields = tuple((n, p.initial_value, p.default, p.immutable,
+            tuple(p.options), p)
+            for n, p in sorted(self.properties.items()) if not p.undefined)
+        defined = frozenset(n for n, *_ in fields)
+        allow_undefined = self.allow_undefined and undefined
+        undefined_converters = {obj: obj().converter(data_type)
+            for obj in (Boolean, String, Integer, Float, DateTime, Property)}
+
+        def convert(rows, use_numpy=False):
+            columns = OrderedDict()
+
+            for name, initial, default, immutable, options, prop in fields:
+                if immutable:
+                    values = [initial] * len(rows)
+                elif options:
+                    values = [row[name] if name in row\
+                        and row[name] in options else initial
+                        for row in rows]
+                else:
+                    values = [row.get(name, initial) for row in rows]
+
+                if any(map(callable, values)):
+                    values = [v() if callable(v) else v for v in values]
+
+                if default:
+                    values = [(default() if callable(default) else default)
+                        if v is None else v for v in values]
+
+                columns[name] = prop.convert_column(values,
+                    data_type=data_type, use_numpy=use_numpy)
+
+            if allow_undefined:
+                undefined = OrderedDict()
+
+                for row in rows:
+                    for name in row:
+                        if name not in defined:
+                            undefined[name] = None
+
+                for name in undefined:
+                    values = [row.get(name) for row in rows]
+                    columns[name] = [
+                        undefined_converters[undefined_property_type(v)](v)
+                        for v in values]
+
+            return columns
+
+        return convert
+
+    def compile_rows(self, data_type='python'):
+        """compiles the properties into a function that converts a list of
+        rows into a list of data dicts, the same data that the function
+        returned by compile would produce for each row, but the defined
+        properties are converted a column at a time"""
+        columns = self.compile_columns(data_type=data_type, undefined=False)
+        allow_undefined = self.allow_undefined
+        defined = frozenset(n for n, p in self.properties.items()
+            if not p.undefined)
+        undefined_converters = {obj: obj().converter(data_type)
+            for obj in (Boolean, String, Integer, Float, DateTime, Property)}
+
+        def convert(rows, use_numpy=False):
+            converted = columns(rows, use_numpy=use_numpy)
+            names = list(converted.keys())
+            values = [c.tolist() if hasattr(c, 'tolist') else c
+                for c in converted.values()]
+            data = [dict(zip(names, row)) for row in zip(*values)]
+
+            if not names:
+                data = [{} for _ in rows]
+
+            if allow_undefined:
+                for row, row_data in zip(rows, data):
+                    for name, value in row.items():
+                        if name not in defined:
+                            obj = undefined_property_type(value)
+                            row_data[name] = undefined_converters[obj](value)
+
+            return data
+
+        return convert
+
     def __getitem__(self, field):
         if not field in self.properties:
             return None
@@ -119,19 +270,7 @@ class PropertyManager(object):
             return self.properties[field]
 
         if self.allow_undefined:
-            if isinstance(value, bool):
-                obj = Boolean
-            elif isinstance(value, str):
-                obj = String
-            elif isinstance(value, int):
-                obj = Integer
-            elif isinstance(value, float):
-                obj = Float
-            elif isinstance(value, datetime):
-                obj = DateTime
-            else:
-                obj = Property
-
+            obj = undefined_property_type(value)
             prop = obj(value=value, data_type=self.data_type, name=field,
                 undefined=True)
 
@@ -143,12 +282,43 @@ class PropertyManager(object):
         return None
 
 
+def float_array(values):
+    """converts the values to a NumPy float64 array in one call. None is
+    returned when a value cannot be converted or is not finite, because the
+    properties handle those values one at a time"""
+    try:
+        floats = numpy.array(values, dtype=numpy.float64)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+    if floats.ndim != 1 or not numpy.isfinite(floats).all():
+        return None
+
+    return floats
+
+
+def undefined_property_type(value):
+    """the Property class used for an undefined property with the value"""
+    if isinstance(value, bool):
+        return Boolean
+    elif isinstance(value, str):
+        return String
+    elif isinstance(value, int):
+        return Integer
+    elif isinstance(value, float):
+        return Float
+    elif isinstance(value, datetime):
+        return DateTime
+
+    return Property
+
+
 class Property(object):
     default = None
 
     def __init__(self, value=None, data_type='python', default=None,
                  immutable=False, name=None, options=None,
-                 ensure_unique=False, undefined=False):
+                 ensure_unique=False, undefined=False, indexed=False):
         self.immutable = False
         self.name = name
         self._value = value
@@ -160,12 +330,10 @@ class Property(object):
         self.options = options or []
         self.ensure_unique = ensure_unique
         self.undefined = undefined
+        self.indexed = indexed
 
     def reset(self):
-        if self._original_value is not None:
-            self._value = self._original_value
-        else:
-            self._value = self.default
+        self._value = self.initial_value
 
         return self
 
@@ -205,6 +373,29 @@ class Property(object):
 
     value = property(_get_value, _set_value)
 
+    @property
+    def initial_value(self):
+        """the value that the property is reset to"""
+        if self._original_value is not None:
+            return self._original_value
+
+        return self.default
+
+    def converter(self, data_type='python'):
+        """returns the function that converts a raw value for the data_type.
+        It must not change the property's value"""
+        if data_type == 'python':
+            return self.to_python
+
+        return self.to_graph
+
+    def convert_column(self, values, data_type='python', use_numpy=False):
+        """converts a list of raw values for the data_type in one call.
+        Subclasses override this to convert the whole column at once"""
+        convert = self.converter(data_type)
+
+        return [convert(v) for v in values]
+
     def to_python(self, value):
         return value
 
@@ -230,6 +421,25 @@ class Integer(Property):
         except:
             return self.default
 
+    def convert_column(self, values, data_type='python', use_numpy=False):
+        if data_type != 'python' or not use_numpy or numpy is None:
+            return super().convert_column(values, data_type=data_type,
+                use_numpy=use_numpy)
+
+        floats = float_array(values)
+
+        # values that cannot be converted or that do not fit an int64 get
+        # the default, so they are converted one at a time
+        if floats is not None and (numpy.abs(floats) < 2 ** 63).all():
+            return floats.astype(numpy.int64)
+
+        values = [self.to_python(v) for v in values]
+
+        try:
+            return numpy.array(values, dtype=numpy.int64)
+        except OverflowError:
+            return numpy.array(values, dtype=object)
+
 
 class Increment(Integer):
 
@@ -239,6 +449,15 @@ class Increment(Integer):
 
         return self._value
 
+    def converter(self, data_type='python'):
+        if data_type == 'python':
+            return self.to_python
+
+        def to_graph(value):
+            return self.to_python(value) + 1
+
+        return to_graph
+
 
 class Float(Property):
     default = 0.0
@@ -249,6 +468,24 @@ class Float(Property):
         except:
             return self.default
 
+    def convert_column(self, values, data_type='python', use_numpy=False):
+        if data_type != 'python':
+            return super().convert_column(values, data_type=data_type,
+                use_numpy=use_numpy)
+
+        if use_numpy and numpy is not None:
+            floats = float_array(values)
+
+            if floats is not None:
+                return floats
+
+            return numpy.array([self.to_python(v) for v in values],
+                dtype=numpy.float64)
+
+        convert = self.to_python
+
+        return [v if type(v) is float else convert(v) for v in values]
+
 
 class Boolean(Property):
     default = False
@@ -267,6 +504,20 @@ class Boolean(Property):
         except:
             return self.default
 
+    def convert_column(self, values, data_type='python', use_numpy=False):
+        if data_type != 'python':
+            return super().convert_column(values, data_type=data_type,
+                use_numpy=use_numpy)
+
+        convert = self.to_python
+        values = [v if v is True or v is False else convert(v)
+            for v in values]
+
+        if use_numpy and numpy is not None:
+            return numpy.array(values, dtype=numpy.bool_)
+
+        return values
+
 
 class JsonProperty(String):
 
@@ -279,6 +530,16 @@ class JsonProperty(String):
 
         return value
 
+    def convert_column(self, values, data_type='python', use_numpy=False):
+        if data_type != 'python':
+            return super().convert_column(values, data_type=data_type,
+                use_numpy=use_numpy)
+
+        loads = json.loads
+
+        return [loads(v) if v and isinstance(v, str) else
+            self.to_python(v) for v in values]
+
     def to_graph(self, value):
         if isinstance(value, (bytes, bytearray, str)):
             return value
@@ -297,6 +558,18 @@ class DateTime(Float):
 
         return super().to_python(value=value)
 
+    def convert_column(self, values, data_type='python', use_numpy=False):
+        if data_type != 'python':
+            return super().convert_column(values, data_type=data_type,
+                use_numpy=use_numpy)
+
+        values = [parse(v).timestamp() if isinstance(v, str)
+            else v.timestamp() if isinstance(v, datetime) else v
+            for v in values]
+
+        return super().convert_column(values, data_type=data_type,
+            use_numpy=use_numpy)
+
 
 class TimeStamp(DateTime):
 
@@ -305,7 +578,8 @@ class TimeStamp(DateTime):
         def default():
             return datetime.now()
 
-        super().__init__(value=value, default=default, immutable=True)
+        super().__init__(value=value, default=default, immutable=True,
+            indexed=kwargs.get('indexed', False))
 
 
 class RelatedManager(object):
@@ -400,10 +674,20 @@ class RelatedEntity(object):
         self._orders = []
         self._returns = []
         self._end_entity = end_entity
+        self._prefetched = {}
         self.relationship_query = RelatedEntityQuery(
             relationship_entity=None, direction=direction,
             relationship_type=relationship_type, end_entity=end_entity)
 
+    def clone(self):
+        """returns a new RelatedEntity with the same definition but none of
+        this one's query state"""
+        return self.__class__(relationship_entity=self.relationship_entity,
+            relationship_type=self.relationship_type,
+            direction=self.direction, ensure_unique=self.ensure_unique,
+            relationship_name=self.relationship_name,
+            end_entity=self._end_entity)
+
     def reset(self):
         self._skip = None
         self._limit = None
@@ -426,15 +710,71 @@ class RelatedEntity(object):
     def set_context(self, return_relationship=False, limit=None, skip=None,
                     matches=None, wheres=None, orders=None, returns=None,
                     **kwargs):
-        from .mapper import _Unit, Work
+        from .mapper import _Unit, AsyncWork
+
+        work = self.mapper.get_work()
+        filtered = any((limit, skip, matches, wheres, orders, returns,
+            self._limit, self._skip, self._matches, self._wheres,
+            self._orders, self._returns))
+
+        if not filtered:
+            prefetched = self.get_prefetched(self.mapper.entity_context,
+                return_relationship=return_relationship)
+
+            if prefetched is not None:
+                if isinstance(work, AsyncWork):
+                    async def _prefetched():
+                        return prefetched
+
+                    return _prefetched()
+
+                return prefetched
 
-        work = Work(mapper=self.mapper.mapper)
         unit = _Unit(entity=self.mapper.entity_context, action=self.query,
             mapper=self, limit=limit, skip=skip, wheres=wheres, orders=orders,
             return_relationship=return_relationship)
 
         return work.add_unit(unit).send()
 
+    def page(self, after=None, size=20, order_by=None, descending=False,
+             return_relationship=False, matches=None, wheres=None):
+        """returns a moesha.mapper.Page of the related entities ordered by
+        the order_by property and their id. after is the cursor of the
+        previous page. Unlike skip, the query uses a WHERE predicate on the
+        sort key so that deep pages are as fast as the first one"""
+        from .mapper import _Unit, AsyncWork, Page
+
+
+        work = self.mapper.get_work()
+        unit = _Unit(entity=self.mapper.entity_context,
+            action=self.page_query, mapper=self, after=after, size=size,
+            order_by=order_by, descending=descending,
+            return_relationship=return_relationship, matches=matches,
+            wheres=wheres)
+        response = work.add_unit(unit).send()
+
+        if isinstance(work, AsyncWork):
+            async def _page():
+                return Page.from_results(await response, size=size,
+                    order_by=order_by)
+
+            return _page()
+
+        return Page.from_results(response, size=size, order_by=order_by)
+
+    def page_query(self, after=None, size=20, order_by=None,
+                   descending=False, return_relationship=False, matches=None,
+                   wheres=None, **kwargs):
+        self.prepare(matches=matches, wheres=wheres)
+
+        response = self.relationship_query.page(after=after, size=size,
+            order_by=order_by, descending=descending,
+            return_relationship=return_relationship)
+
+        self.reset()
+
+        return response
+
     def _get_mapper(self):
         return self._mapper
 
@@ -443,8 +783,11 @@ class RelatedEntity(object):
             return self
 
         self._mapper = mapper
-        relationship = mapper.mapper.create(entity=self.relationship_entity)
-        self.relationship_query.relationship_entity = relationship
+
+        if self.relationship_entity:
+            relationship = mapper.mapper.create(
+                entity=self.relationship_entity)
+            self.relationship_query.relationship_entity = relationship
 
         return self
 
@@ -531,8 +874,78 @@ class RelatedEntity(object):
 
         return self
 
+    def prefetch_query(self, entities, return_relationship=False):
+        ids = []
+
+        for entity in entities:
+            if entity.id is not None and entity.id not in ids:
+                ids.append(entity.id)
+
+        return self.relationship_query.prefetch(ids=ids,
+            return_relationship=return_relationship)
+
+    def set_prefetched(self, entities, response, return_relationship=False):
+        """distributes the response of the prefetch_query onto each of the
+        start entities. Every entity gets a result, even if it is empty, so
+        that calling the relationship for it will not query the graph. The
+        results are kept for as long as the start entity exists or until
+        the relationship is changed through this object"""
+        from .mapper import Response
+
+
+        related = {}
+
+        for row in response.response.result_data:
+            row = dict(row)
+            start_id = row.pop('start_id')
+
+            for _, value in row.items():
+                entity = response._get_entity(value)
+                related.setdefault(start_id, []).append(entity)
+
+        for entity in entities:
+            if entity.id is None:
+                continue
+
+            results = related.get(entity.id, [])
+            result = Response(mapper=response.mapper,
+                identity_map=response.identity_map)
+            result.data = list(results)
+            result.entities = list(results)
+            key = (id(entity), return_relationship)
+
+            def forget(ref, key=key):
+                self._prefetched.pop(key, None)
+
+            self._prefetched[key] = (weakref.ref(entity, forget), result)
+
+        return self
+
+    def get_prefetched(self, entity, return_relationship=False):
+        if entity is None:
+            return None
+
+        prefetched = self._prefetched.get((id(entity), return_relationship))
+
+        if prefetched and prefetched[0]() is entity:
+            return prefetched[1]
+
+        return None
+
+    def forget_prefetched(self, entity):
+        for return_relationship in (True, False):
+            self._prefetched.pop((id(entity), return_relationship), None)
+
+        return self
+
+    def clear_prefetched(self):
+        self._prefetched = {}
+
+        return self
+
     def add(self, entity, properties=None, work=None):
         properties = properties or {}
+        self.forget_prefetched(self.start_entity)
         relationship = self.relationship_query.connect(entity=entity,
                 properties=properties)
         work = self.mapper.mapper.save(relationship,
@@ -541,11 +954,42 @@ class RelatedEntity(object):
 
         return relationship, work
 
-    def replace(self, entities, properties=None, work=None):
+    def add_many(self, entities, properties=None, work=None):
+        """adds a relationship for each of the entities. When the start
+        entity and the entities have already been saved, the relationships
+        are created with a single UNWIND statement, otherwise each one is
+        saved on its own. properties is a list that lines up with the
+        entities. Returns the relationships and the work"""
         from moesha.entity import Collection
 
 
         properties = properties or []
+        work = work or self.mapper.get_work()
+        batch = self.mapper.get_work()
+        relationships = []
+
+        if not isinstance(entities, (Collection, list, set, tuple)):
+            entities = [entities,]
+
+        for i, entity in enumerate(entities):
+            try:
+                props = properties[i]
+            except:
+                props = {}
+
+            relationship, _ = self.add(entity=entity, work=batch,
+                properties=props)
+            relationships.append(relationship)
+
+        work.add_relationship_units(batch.units)
+
+        return relationships, work
+
+    def replace(self, entities, properties=None, work=None):
+        from moesha.entity import Collection
+        from moesha.query import BulkQuery
+
+
         work = work or self.mapper.get_work()
 
         if not isinstance(entities, (Collection, list, set, tuple)):
@@ -558,23 +1002,22 @@ class RelatedEntity(object):
         self.prepare()
 
         existing = self(return_relationship=True)
+        existing = [e for e in existing if e.id is not None]
 
         if len(existing) and self.start_entity.id:
-            for entity in existing:
-                self.delete(entity=entity, work=work)
+            self.forget_prefetched(self.start_entity)
+            query, params = BulkQuery(entities=existing,
+                query_variable='r').delete_relationships()
 
-        for i, entity in enumerate(entities):
-            try:
-                props = properties[i]
-            except:
-                props = {}
+            work.add_query(query=query, params=params)
 
-            self.add(entity=entity, work=work, properties=props)
+        self.add_many(entities=entities, properties=properties, work=work)
 
         return work
 
     def delete(self, entity, work=None):
         work = work or self.mapper.get_work()
+        self.forget_prefetched(self.start_entity)
         query, params = self.relationship_query.delete(entity=entity)
 
         work.add_query(query=query, params=params)
@@ -1,6 +1,15 @@
+import base64
+import binascii
+import contextvars
+import json
+import threading
 import uuid
 
-from pypher.builder import (Pypher, Param, Params, __)
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from pypher.builder import (ConditionalAND, Match, OptionalMatch, Pypher,
+    Param, Params, Where, WITH, __)
 
 from .entity import (Entity, Node, Relationship, Collection)
 from .util import normalize
@@ -12,12 +21,153 @@ def get_mapper(entity):
     return gm(entity, None)
 
 
+def encode_cursor(value, id):
+    """builds the opaque cursor for keyset pagination from the sort key
+    value and the internal id of the last entity of a page"""
+    data = json.dumps([value, id], separators=(',', ':'))
+
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        value, id = json.loads(data.decode('utf-8'))
+    except (AttributeError, TypeError, ValueError, binascii.Error):
+        raise QueryException('The cursor {} is not valid'.format(cursor))
+
+    return value, id
+
+
+def keyset(variable, order_by=None, after=None, descending=False,
+           param_prefix='page'):
+    """builds the WHERE predicate and the ORDER BY terms used for keyset
+    pagination. Rows are ordered by the order_by property of the variable
+    and then by its id so that the order is total. after is the cursor of
+    the last entity of the previous page and the predicate only matches the
+    rows that come after it:
+
+        n.`name` > $page_value
+        OR (n.`name` = $page_value AND id(n) > $page_id)
+        OR n.`name` IS NULL
+
+    When the cursor value is null the previous page ended inside the null
+    rows, so only the null rows with a larger id are left:
+
+        n.`name` IS NULL AND id(n) > $page_id
+
+    The predicate is None when there is no cursor. Null values are sorted
+    after every other value when ascending and before them when
+    descending, the same way that ORDER BY sorts them"""
+
+    def key():
+        return getattr(__, variable).property(order_by)
+
+    def _id():
+        return __.ID(variable)
+
+    def after_key(left, right):
+        return left < right if descending else left > right
+
+    if order_by:
+        orders = [key(), _id()]
+    else:
+        orders = [_id()]
+
+    if descending:
+        orders = [o.DESC for o in orders]
+
+    if after is None:
+        return None, orders
+
+    value, id = decode_cursor(after)
+    id_param = Param('{}_id'.format(param_prefix), id)
+
+    if not order_by:
+        return after_key(_id(), id_param), orders
+
+    if value is None:
+        predicate = __.CAND(key().IS_NULL, after_key(_id(), id_param))
+
+        if descending:
+            predicate = __.COR(predicate, key().IS_NOT_NULL)
+
+        return predicate, orders
+
+    value_param = Param('{}_value'.format(param_prefix), value)
+    predicates = [after_key(key(), value_param),
+        __.CAND(key() == value_param, after_key(_id(), id_param))]
+
+    if not descending:
+        predicates.append(key().IS_NULL)
+
+    return __.COR(*predicates), orders
+
+
+class _NamingState(object):
+    """The counters used to name query variables (n_0, r_0) and params. A
+    state belongs to a single thread, see naming_state"""
+
+    def __init__(self, parent=None):
+        self.thread = threading.get_ident()
+
+        if parent is not None:
+            self.counts = dict(parent.counts)
+            self.values = dict(parent.values)
+        else:
+            self.counts = {
+                'n': 0,
+                'r': 0,
+            }
+            self.values = {}
+
+    def reset(self):
+        self.counts = {
+            'n': 0,
+            'r': 0,
+        }
+        self.values = {}
+
+        return self
+
+
+_NAMING_STATE = contextvars.ContextVar('moesha_naming_state', default=None)
+
+
+def naming_state():
+    """returns the naming state for the current context. Every thread and
+    every asyncio task that activates a naming_context gets its own state,
+    so that work can be built and sent concurrently. A state that was copied
+    into another thread, via contextvars.copy_context, is copied again
+    before it is used so that threads never share counters"""
+    state = _NAMING_STATE.get()
+
+    if state is None or state.thread != threading.get_ident():
+        state = _NamingState(parent=state)
+        _NAMING_STATE.set(state)
+
+    return state
+
+
+@contextmanager
+def naming_context():
+    """activates a copy of the current naming state for the duration of the
+    block. The copy starts where the current state is, so variables that
+    were already handed out are not reused, and changes made inside the
+    block do not leak into the enclosing context"""
+    token = _NAMING_STATE.set(_NamingState(parent=naming_state()))
+
+    try:
+        yield _NAMING_STATE.get()
+    finally:
+        _NAMING_STATE.reset(token)
+
+
 class _ValueManager(object):
-    values = {}
 
     @classmethod
     def reset(cls):
-        cls.values = {}
+        naming_state().values = {}
 
     @classmethod
     def set_query_var(cls, entity):
@@ -30,17 +180,72 @@ class _ValueManager(object):
         entity_name = entity.__class__.__name__
         name = cls.set_query_var(entity)
         field = normalize(field)
+        values = naming_state().values
 
-        if entity_name not in _ValueManager.values:
-            _ValueManager.values[entity_name] = 0
+        if entity_name not in values:
+            values[entity_name] = 0
 
-        return '${}_{}_{}'.format(name, field,
-            _ValueManager.values[entity_name]).lower()
+        return '${}_{}_{}'.format(name, field, values[entity_name]).lower()
 
 
 VM = _ValueManager
 
 
+class StatementCache(object):
+    """This is a least recently used cache of the Cypher strings generated by
+    Query.save. The key is the shape of the entities being saved --their
+    types, labels, query variables, property names, and unique properties--
+    and the value is the Cypher string along with the names of the params
+    that it expects. Saves of the same shape only need to rebind the
+    values of those params instead of rebuilding the Pypher tree"""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._statements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._statements)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                statement = self._statements.pop(key)
+            except KeyError:
+                self.misses += 1
+
+                return None
+
+            self._statements[key] = statement
+            self.hits += 1
+
+            return statement
+
+    def set(self, key, query, names):
+        with self._lock:
+            self._statements.pop(key, None)
+            self._statements[key] = (query, tuple(names))
+
+            while len(self._statements) > self.max_size:
+                self._statements.popitem(last=False)
+
+        return self
+
+    def clear(self):
+        with self._lock:
+            self._statements = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+        return self
+
+
+STATEMENT_CACHE = StatementCache()
+
+
 class _BaseQuery(object):
 
     def __init__(self, params=None):
@@ -52,7 +257,7 @@ class _BaseQuery(object):
         self.on_create_sets = []
         self.on_match_sets = []
         self.deletes = []
-        self.matched_entities = []
+        self.matched_entities = {}
         self.sets = []
         self.wheres = []
         self.orders = []
@@ -67,7 +272,7 @@ class _BaseQuery(object):
         self.on_create_sets = []
         self.on_match_sets = []
         self.deletes = []
-        self.matched_entities = []
+        self.matched_entities = {}
         self.sets = []
         self.wheres = []
         self.orders = []
@@ -80,7 +285,7 @@ class _BaseQuery(object):
         self.on_create_sets += other.on_create_sets
         self.on_match_sets += other.on_match_sets
         self.deletes += other.deletes
-        self.matched_entities += other.matched_entities
+        self.matched_entities.update(other.matched_entities)
         self.sets += other.sets
         self.wheres += other.wheres
         self.orders += other.orders
@@ -88,6 +293,26 @@ class _BaseQuery(object):
 
         return self
 
+    def _matched_key(self, entity):
+        if entity.id is not None:
+            return (entity.__class__, entity.id)
+
+        return id(entity)
+
+    def is_matched(self, entity):
+        """checks if the entity has already been matched in the query. Entities
+        are keyed by their id, or by the object itself when they have not
+        been saved, so the check does not have to compare every matched
+        entity's data"""
+        matched = self.matched_entities.get(self._matched_key(entity))
+
+        return matched is not None and (matched is entity or matched == entity)
+
+    def add_matched(self, entity):
+        self.matched_entities[self._matched_key(entity)] = entity
+
+        return self
+
     def _node_by_id(self, entity):
         qv = entity.query_variable
 
@@ -128,13 +353,17 @@ class _BaseQuery(object):
 
 class Query(_BaseQuery):
 
-    def __init__(self, entities, params=None):
+    def __init__(self, entities, params=None, statement_cache=None):
         super(Query, self).__init__(params=params)
 
         if not isinstance(entities, (Collection, list, set, tuple)):
             entities = [entities,]
 
         self.entities = entities
+        self.statement_cache = statement_cache
+
+        if statement_cache is None:
+            self.statement_cache = STATEMENT_CACHE
 
     def build_save_pypher(self, ensure_unique=False):
         for entity in self.entities:
@@ -177,9 +406,117 @@ class Query(_BaseQuery):
         return pypher
 
     def save(self, ensure_unique=False):
+        cache = self.statement_cache
+        key = None
+
+        if cache.enabled:
+            key, values = self._statement_key(ensure_unique=ensure_unique)
+
+        if key is not None:
+            cached = cache.get(key)
+
+            if cached is not None:
+                query, names = cached
+                params = OrderedDict((n, values[n]) for n in sorted(names))
+
+                return query, params
+
         pypher = self.build_save_pypher(ensure_unique=ensure_unique)
+        query = str(pypher)
+        params = pypher.bound_params
 
-        return str(pypher), pypher.bound_params
+        # the statement is only cached when every value was bound to its own
+        # param. Pypher will reuse a param for equal values and that would
+        # not hold for the next save with the same shape
+        if key is not None and set(params.keys()) == set(values.keys()):
+            cache.set(key, query, params.keys())
+
+        return query, params
+
+    def _statement_key(self, ensure_unique=False):
+        """builds the key used by the StatementCache along with a dict of the
+        param names and values that the statement will need. If the query
+        cannot be cached, the key will be None"""
+        values = {}
+
+        if len(self.entities) != 1:
+            return None, values
+
+        entity = self.entities[0]
+
+        if isinstance(entity, Node):
+            action = 'update' if entity.id is not None else 'create'
+            shape = self._entity_shape(entity, values)
+
+            if shape is None:
+                return None, values
+
+            return (action, shape), values
+
+        if not isinstance(entity, Relationship):
+            return None, values
+
+        start = entity.start
+        end = entity.end
+
+        if not isinstance(start, Node) or not isinstance(end, Node)\
+            or start == end:
+            return None, values
+
+        shapes = []
+
+        for ent in (entity, start, end):
+            shape = self._entity_shape(ent, values)
+
+            if shape is None:
+                return None, values
+
+            shapes.append(shape)
+
+        return ('relationship', bool(ensure_unique), tuple(shapes)), values
+
+    def _entity_shape(self, entity, values):
+        if not entity.query_variable:
+            return None
+
+        mapper = get_mapper(entity)
+        properties = mapper.entity_data(entity.data, data_type='graph')
+        fields = []
+
+        def bind(name, value):
+            name = Param(name, value).name
+
+            if name in values and values[name] != value:
+                return False
+
+            values[name] = value
+
+            return True
+
+        for field, value in sorted(properties.items()):
+            if not bind(VM.get_next(entity, field), value):
+                return None
+
+            # True, False, and None are written into the Cypher string
+            # instead of a param placeholder, so they are part of the shape
+            if value is True or value is False or value is None:
+                fields.append((field, value))
+            else:
+                fields.append((field,))
+
+        if entity.id is not None:
+            if not bind(VM.get_next(entity, 'id'), entity.id):
+                return None
+
+        labels = entity.labels
+
+        if isinstance(labels, list):
+            labels = tuple(labels)
+
+        unique = tuple(mapper.unique_properties().keys())
+
+        return (entity.__class__, labels, entity.query_variable,
+            entity.id is None, tuple(fields), unique)
 
     def create_node(self, entity):
         mapper = get_mapper(entity)
@@ -214,6 +551,7 @@ class Query(_BaseQuery):
         else:
             self.creates.append(node)
 
+        self.add_matched(entity)
         self.returns.append(entity.query_variable)
 
         return self
@@ -228,6 +566,7 @@ class Query(_BaseQuery):
             self.sets.append(stmt)
 
         self.matches.append(self._node_by_id(entity))
+        self.add_matched(entity)
         self.returns.append(qv)
 
         return self
@@ -281,28 +620,33 @@ class Query(_BaseQuery):
 
         rel = Pypher()
 
-        if start not in self.matched_entities:
+        # nodes that are already part of this query, because they were saved
+        # by it or used by another relationship, are only referenced
+        start_in_query = self.is_matched(start)
+        end_in_query = self.is_matched(end)
+
+        if not start_in_query:
             if start.id is not None:
                 self._update_properties(start)
                 self.matches.append(self._node_by_id(start))
             else:
                 start_properties = self._properties(start)
 
-            self.matched_entities.append(start)
+            self.add_matched(start)
             self.returns.append(start.query_variable)
 
-        if end not in self.matched_entities:
+        if not end_in_query:
             if end.id is not None:
                 self._update_properties(end)
                 self.matches.append(self._node_by_id(end))
             else:
                 end_properties = self._properties(end)
 
-            self.matched_entities.append(end)
+            self.add_matched(end)
             self.returns.append(end.query_variable)
 
         if entity.id is None:
-            if start.id is not None:
+            if start.id is not None or start_in_query:
                 rel = rel.node(start.query_variable)
             else:
                 start_query = Query(start, self.params)
@@ -327,7 +671,7 @@ class Query(_BaseQuery):
             rel.rel(entity.query_variable, labels=entity.labels,
                 direction='out', **props)
 
-            if end.id is not None:
+            if end.id is not None or end_in_query:
                 rel.node(end.query_variable)
             else:
                 end_query = Query(end, self.params)
@@ -491,6 +835,203 @@ class Query(_BaseQuery):
         return self
 
 
+class BulkQuery(_BaseQuery):
+    """This class is used to build a single statement that saves many
+    entities that share the same type and labels. Each entity is sent as a
+    row in a list parameter that is UNWINDed on the server. For new nodes it
+    will create a query that looks like:
+
+        UNWIND $rows AS row CREATE (n:`Labels`) SET n = row.`properties`
+        RETURN n ORDER BY row.`index`
+
+    new nodes whose mapper has unique properties are MERGEd on them
+
+        UNWIND $rows AS row MERGE (n:`Labels` {`key`: row.`properties`.`key`})
+        SET n += row.`properties` RETURN n ORDER BY row.`index`
+
+    and for existing nodes
+
+        UNWIND $rows AS row MATCH (n) WHERE id(n) = row.`id`
+        SET n += row.`properties` RETURN n ORDER BY row.`index`
+
+    Relationships between nodes that already exist are created with
+
+        UNWIND $rows AS row MATCH (start_node), (end_node)
+        WHERE id(start_node) = row.`start` AND id(end_node) = row.`end`
+        CREATE (start_node)-[r:`TYPE`]->(end_node) SET r = row.`properties`
+        RETURN r ORDER BY row.`index`
+
+    The results are ordered the same way as the entities passed in, this
+    allows the caller to map each returned record back to its entity.
+    """
+
+    def __init__(self, entities, params=None, rows_param='rows',
+                 row_variable='row', query_variable='n'):
+        super(BulkQuery, self).__init__(params=params)
+
+        if not isinstance(entities, (Collection, list, set, tuple)):
+            entities = [entities,]
+
+        self.entities = list(entities)
+        self.rows_param = rows_param
+        self.row_variable = row_variable
+        self.query_variable = query_variable
+
+    @property
+    def row(self):
+        return getattr(__, self.row_variable)
+
+    @property
+    def entity(self):
+        return getattr(__, self.query_variable)
+
+    def _rows(self, include_id=False, include_ends=False):
+        rows = []
+
+        for index, entity in enumerate(self.entities):
+            mapper = get_mapper(entity)
+            row = {
+                'index': index,
+                'properties': mapper.entity_data(entity.data,
+                    data_type='graph'),
+            }
+
+            if include_id:
+                row['id'] = entity.id
+
+            if include_ends:
+                row['start'] = entity.start.id
+                row['end'] = entity.end.id
+
+            rows.append(row)
+
+        return rows
+
+    def _unwind(self):
+        placeholder = '${}'.format(self.rows_param)
+
+        self.pypher.UNWIND(placeholder).AS(self.row_variable)
+
+        return self
+
+    def _returns(self):
+        self.pypher.RETURN(self.query_variable)
+        self.pypher.ORDER.BY(self.row.property('index'))
+
+        return self
+
+    def create_nodes(self):
+        if not self.entities:
+            raise QueryException('There must be entities to save')
+
+        rows = self._rows()
+        labels = self.entities[0].labels
+
+        self._unwind()
+        self.pypher.CREATE.node(self.query_variable, labels=labels)
+        self.pypher.SET(self.entity == self.row.property('properties'))
+        self._returns()
+
+        return str(self.pypher), {self.rows_param: rows}
+
+    def merge_nodes(self, unique):
+        """unique is the list of property names that identify a node. The
+        rest of the properties are added to the node whether it was matched
+        or created"""
+        if not self.entities:
+            raise QueryException('There must be entities to save')
+
+        if not unique:
+            raise QueryException('There must be unique properties to merge')
+
+        rows = self._rows()
+        labels = self.entities[0].labels
+        properties = {k: self.row.property('properties').property(k)
+            for k in unique}
+
+        self._unwind()
+        self.pypher.MERGE.node(self.query_variable, labels=labels,
+            **properties)
+        self.pypher.SET(self.entity.operator('+=',
+            self.row.property('properties')))
+        self._returns()
+
+        return str(self.pypher), {self.rows_param: rows}
+
+    def update_nodes(self):
+        if not self.entities:
+            raise QueryException('There must be entities to save')
+
+        rows = self._rows(include_id=True)
+
+        self._unwind()
+        self.pypher.MATCH.node(self.query_variable)
+        self.pypher.WHERE(__.ID(self.query_variable) ==
+            self.row.property('id'))
+        self.pypher.SET(self.entity.operator('+=',
+            self.row.property('properties')))
+        self._returns()
+
+        return str(self.pypher), {self.rows_param: rows}
+
+    def create_relationships(self, ensure_unique=False,
+                             start_query_variable='start_node',
+                             end_query_variable='end_node'):
+        """creates a relationship for every row. The start and end nodes
+        must already exist. When ensure_unique is set the relationships are
+        MERGEd on their type and properties, the same way that a single
+        relationship is saved, so every entity must have the same property
+        names"""
+        if not self.entities:
+            raise QueryException('There must be entities to save')
+
+        for entity in self.entities:
+            if getattr(entity.start, 'id', None) is None\
+                or getattr(entity.end, 'id', None) is None:
+                message = ('The start and end nodes must be saved before'
+                    ' the relationship {} can be bulk saved'.format(entity))
+                raise QueryException(message)
+
+        rows = self._rows(include_ends=True)
+        labels = self.entities[0].labels
+        start = start_query_variable
+        end = end_query_variable
+
+        self._unwind()
+        self.pypher.MATCH(__.node(start), __.node(end))
+        self.pypher.WHERE(__.ID(start) == self.row.property('start'))
+        self.pypher.AND(__.ID(end) == self.row.property('end'))
+
+        if ensure_unique:
+            properties = {k: self.row.property('properties').property(k)
+                for k in rows[0]['properties']}
+
+            self.pypher.MERGE.node(start).rel_out(self.query_variable,
+                labels=labels, **properties).node(end)
+        else:
+            self.pypher.CREATE.node(start).rel_out(self.query_variable,
+                labels=labels).node(end)
+            self.pypher.SET(self.entity == self.row.property('properties'))
+
+        self._returns()
+
+        return str(self.pypher), {self.rows_param: rows}
+
+    def delete_relationships(self):
+        if not self.entities:
+            raise QueryException('There must be entities to delete')
+
+        rows = [{'id': entity.id} for entity in self.entities]
+
+        self._unwind()
+        self.pypher.MATCH.node().rel_out(self.query_variable).node()
+        self.pypher.WHERE(__.ID(self.query_variable) ==
+            self.row.property('id'))
+        self.pypher.DELETE(self.query_variable)
+
+        return str(self.pypher), {self.rows_param: rows}
+
+
 class RelatedEntityQuery(_BaseQuery):
 
     def __init__(self, direction='out', relationship_entity=None,
@@ -605,7 +1146,10 @@ class RelatedEntityQuery(_BaseQuery):
 
         return pypher
 
-    def _build_relationship(self):
+    def _build_relationship(self, named=False):
+        """named will add the relationship_query_variable to the pattern
+        when there is only a relationship_type so that it can be returned
+        or deleted"""
         pypher = Pypher()
 
         if self.relationship_entity:
@@ -618,6 +1162,9 @@ class RelatedEntityQuery(_BaseQuery):
                 direction=self.direction,
                 labels=self.relationship_entity.labels,
                 **self.relationship_properties)
+        elif named:
+            pypher.relationship(self.relationship_query_variable,
+                direction=self.direction, labels=self.relationship_type)
         else:
             pypher.relationship(direction=self.direction,
                 labels=self.relationship_type)
@@ -665,6 +1212,75 @@ class RelatedEntityQuery(_BaseQuery):
 
         return str(pypher), pypher.bound_params
 
+    def page(self, after=None, size=20, order_by=None, descending=False,
+             return_relationship=False, returns=None):
+        """builds the query for a page of related entities with keyset
+        pagination instead of SKIP, see keyset. One more row than size is
+        asked for so that the caller can tell if there is another page"""
+        if return_relationship:
+            variable = self.relationship_query_variable
+        elif self.end_entity:
+            variable = self.end_entity.query_variable
+        else:
+            variable = self.end_query_variable
+
+        predicate, orders = keyset(variable, order_by=order_by, after=after,
+            descending=descending)
+
+        if predicate is not None:
+            self.wheres.append(predicate)
+
+        self.orders = orders
+        self.skip = None
+        self.limit = size + 1
+
+        return self.query(return_relationship=return_relationship,
+            returns=returns)
+
+    def prefetch(self, ids, return_relationship=False, ids_param='ids',
+                 start_id_alias='start_id'):
+        """builds a single query that matches the related entities for many
+        start entities at once:
+
+            MATCH (start_node)-[relt:`Type`]->(end_node)
+            WHERE id(start_node) IN $ids
+            RETURN id(start_node) AS start_id, end_node
+
+        each record has the id of the start node so that the results can be
+        distributed back to the entity that they belong to"""
+        if not ids:
+            raise RelatedQueryException(('There must be start entity ids to'
+                ' prefetch'))
+
+        self.pypher = Pypher()
+        start = Pypher()
+        start.NODE(self.start_query_variable)
+        end = self._build_end()
+
+        if return_relationship:
+            ret = self.relationship_query_variable
+        else:
+            ret = self.returns[-1]
+
+        rel = self._build_relationship(named=return_relationship)
+
+        self.pypher.MATCH
+        self.pypher.append(start)
+        self.pypher.append(rel)
+        self.pypher.append(end)
+        self.pypher.WHERE(__.ID(self.start_query_variable))
+        self.pypher.raw('IN ${}'.format(ids_param))
+        self.pypher.RETURN(
+            __.ID(self.start_query_variable).alias(start_id_alias), ret)
+
+        self.reset()
+
+        query = str(self.pypher)
+        params = self.pypher.bound_params
+        params[ids_param] = list(ids)
+
+        return query, params
+
     def connect(self, entity, properties=None):
         if not self.start_entity:
             message = ('The relationship {} does not have a start'
@@ -718,7 +1334,7 @@ class RelatedEntityQuery(_BaseQuery):
 
                 return str(self.pypher), self.pypher.bound_params
 
-    def delete_by_entity_id(self, *ids):
+    def delete_by_entity_id(self, *ids, ids_param='end_ids'):
         if not ids:
             msg = 'There must be ids passed in to the delete method'
             raise AttributeError(msg)
@@ -741,7 +1357,7 @@ class RelatedEntityQuery(_BaseQuery):
 
         self.pypher = Pypher()
         self.matches.insert(0, self._build_end())
-        self.matches.insert(0, self._build_relationship())
+        self.matches.insert(0, self._build_relationship(named=True))
         self.matches.insert(0, _build_start())
 
         self.pypher.MATCH
@@ -749,13 +1365,8 @@ class RelatedEntityQuery(_BaseQuery):
         for match in self.matches:
             self.pypher.append(match)
 
-        id_params = []
-
-        for i in ids:
-            key = 'end_id_{}'.format(i)
-            id_params.append(Param(key, i))
-
-        self.wheres.append(__.ID(self.end_query_variable).IN(*id_params))
+        self.wheres.append(__.ID(self.end_query_variable).raw(
+            'IN ${}'.format(ids_param)))
         _id = __.ID(self.start_query_variable)
 
         if self.start_entity.id is not None:
@@ -767,7 +1378,11 @@ class RelatedEntityQuery(_BaseQuery):
         self.pypher.DELETE(self.relationship_query_variable)
         self.reset()
 
-        return str(self.pypher), self.pypher.bound_params
+        query = str(self.pypher)
+        params = self.pypher.bound_params
+        params[ids_param] = list(ids)
+
+        return query, params
 
 
 class QueryException(Exception):
@@ -814,6 +1429,67 @@ class Builder(Pypher):
 
         return super(Builder, self).bind_param(value=Param, name=name)
 
+    def page(self, after=None, size=20, order_by=None, descending=False):
+        """finishes the query with keyset pagination, see keyset. The entity
+        is returned along with one more row than size so that
+        moesha.mapper.Page.from_results can tell if there is another page:
+
+            builder = Builder(User()).page(after=cursor, order_by='name')
+            users = mapper.query(pypher=builder)
+            page = Page.from_results(users, size=20, order_by='name')
+        """
+        predicate, orders = keyset(self.__entity__.query_variable,
+            order_by=order_by, after=after, descending=descending)
+
+        if predicate is not None:
+            where = self._last_where()
+
+            if where is None:
+                self.WHERE(predicate)
+            else:
+                self._and_where(where, predicate)
+
+        self.RETURN(self.entity)
+        self.ORDER.BY(*orders)
+        self.LIMIT(size + 1)
+
+        return self
+
+    def _last_where(self):
+        """the WHERE link of the last MATCH or WITH clause, or None"""
+        where = None
+        token = self.next
+
+        while token:
+            if isinstance(token, (Match, OptionalMatch, WITH)):
+                where = None
+            elif isinstance(token, Where):
+                where = token
+
+            token = token.next
+
+        return where
+
+    def _and_where(self, where, condition):
+        """adds the condition to an existing WHERE. The existing conditions
+        are grouped so that an OR in them does not take the condition in"""
+        existing = Pypher()
+
+        for arg in where.args:
+            if isinstance(arg, Pypher):
+                existing.append(arg)
+            else:
+                existing.raw(arg)
+
+        if where.next is not None:
+            existing.add_link(where.next)
+
+        where.args = (ConditionalAND(existing),)
+        where.next = None
+        self._bottom = where
+
+        return self.AND(condition)
+
     @property
     def start(self):
         return getattr(__, 'start_node')
@@ -847,27 +1523,32 @@ class Helpers(object):
 
         return str(b), b.bound_params
 
-    def get_by_ids(self, entity, ids):
+    def get_by_ids(self, entity, ids, ids_param='ids'):
+        """This method is used to build a query that will return many
+        entities by their ids. The ids are bound as a single list param so
+        that the query text is the same no matter how many ids are passed
+        in:
+
+            MATCH (node:`Labels`) WHERE id(node) IN $ids RETURN node
+        """
         p = Pypher()
         p.MATCH
 
         if isinstance(entity, Relationship):
             var = 'rel'
-            p.node().rel(var, labels=entity.labels).node()
+            p.node().rel_out(var, labels=entity.labels).node()
         else:
             var = 'node'
             p.node(var, labels=entity.labels)
 
-        id_params = []
-
-        for i in ids:
-            key = 'entity_id_{}'.format(i)
-            id_params.append(Param(key, i))
-
-        p.WHERE.COR(__.ID(var).IN(*id_params))
+        p.WHERE(__.ID(var)).raw('IN ${}'.format(ids_param))
         p.RETURN(var)
 
-        return str(p), p.bound_params
+        query = str(p)
+        params = p.bound_params
+        params[ids_param] = list(ids)
+
+        return query, params
 
     def get_start(self, entity):
         b = Builder(entity)
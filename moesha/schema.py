@@ -0,0 +1,322 @@
+import re
+
+from collections import namedtuple
+
+from .entity import Node
+from .mapper import ENTITY_MAPPER_MAP, GENERIC_MAPPER, get_mapper
+
+
+CONSTRAINT = 'constraint'
+INDEX = 'index'
+CONSTRAINT_RE = re.compile(r'CONSTRAINT ON \(\s*\w+:`?(?P<label>[^`\s)]+)`?'
+    r'\s*\) ASSERT \w+\.`?(?P<property>[^`\s]+)`? IS UNIQUE')
+INDEX_RE = re.compile(r'INDEX ON :`?(?P<label>[^`(]+)`?\('
+    r'`?(?P<property>[^`)]+)`?\)')
+
+# the index types that CREATE INDEX makes by default
+RANGE_INDEX_TYPES = ('BTREE', 'RANGE')
+
+# 3.x servers use the legacy schema syntax and procedures, SHOW and the
+# FOR ... REQUIRE syntax are used from 4.4 on
+LEGACY_VERSION = (4,)
+SHOW_VERSION = (4, 4)
+
+
+def quote(name):
+    return '`{}`'.format(name.replace('`', '``'))
+
+
+def parse_version(version):
+    return tuple(int(v) for v in re.findall(r'\d+', version or '')[:3])
+
+
+class SchemaItem(namedtuple('SchemaItem', ['kind', 'label', 'property'])):
+    """A uniqueness constraint or an index on a single label and property.
+    legacy selects the Neo4j 3.x syntax, otherwise the 4.4 and newer syntax
+    is used. Dropping with the newer syntax needs the name of the index or
+    constraint"""
+
+    def create_statement(self, legacy=True):
+        label = quote(self.label)
+        field = quote(self.property)
+
+        if self.kind == CONSTRAINT:
+            if legacy:
+                return 'CREATE CONSTRAINT ON (n:{}) ASSERT n.{}'\
+                    ' IS UNIQUE'.format(label, field)
+
+            return 'CREATE CONSTRAINT IF NOT EXISTS FOR (n:{}) REQUIRE'\
+                ' n.{} IS UNIQUE'.format(label, field)
+
+        if legacy:
+            return 'CREATE INDEX ON :{}({})'.format(label, field)
+
+        return 'CREATE INDEX IF NOT EXISTS FOR (n:{}) ON (n.{})'.format(
+            label, field)
+
+    def drop_statement(self, legacy=True, name=None):
+        if not legacy:
+            if not name:
+                raise SchemaException(('The name of the {} on {}.{} is needed'
+                    ' to drop it').format(self.kind, self.label,
+                        self.property))
+
+            kind = 'CONSTRAINT' if self.kind == CONSTRAINT else 'INDEX'
+
+            return 'DROP {} {} IF EXISTS'.format(kind, quote(name))
+
+        if self.kind == CONSTRAINT:
+            return 'DROP CONSTRAINT ON (n:{}) ASSERT n.{} IS UNIQUE'.format(
+                quote(self.label), quote(self.property))
+
+        return 'DROP INDEX ON :{}({})'.format(quote(self.label),
+            quote(self.property))
+
+
+class SchemaDiff(object):
+
+    def __init__(self, missing=None, extra=None, legacy=True, names=None):
+        self.missing = sorted(missing or [])
+        self.extra = sorted(extra or [])
+        self.legacy = legacy
+        self.names = names or {}
+
+    def __repr__(self):
+        return '<moesha.schema.SchemaDiff: missing={} extra={}>'.format(
+            len(self.missing), len(self.extra))
+
+    def __bool__(self):
+        return bool(self.missing or self.extra)
+
+    @property
+    def replaced(self):
+        """the extra indexes on the label and property of a missing
+        constraint. The constraint cannot be created while the index
+        exists"""
+        constraints = {(item.label, item.property) for item in self.missing
+            if item.kind == CONSTRAINT}
+
+        return [item for item in self.extra if item.kind == INDEX
+            and (item.label, item.property) in constraints]
+
+    def statements(self, drop=False):
+        """the statements that bring the graph in line with the mappers. The
+        drops come first so that an index can be replaced by a constraint
+        on the same property, those indexes are dropped even without
+        drop"""
+        extra = self.extra if drop else self.replaced
+        statements = [item.drop_statement(legacy=self.legacy,
+            name=self.names.get(item)) for item in extra]
+
+        return statements + [item.create_statement(legacy=self.legacy)
+            for item in self.missing]
+
+
+def _node_entities(entities=None):
+    for name, mapper_class in list(ENTITY_MAPPER_MAP.items()):
+        entity = mapper_class.entity
+
+        if name == GENERIC_MAPPER or entity is None\
+            or not issubclass(entity, Node):
+            continue
+
+        if entities is not None and entity not in entities:
+            continue
+
+        yield entity
+
+
+def declared_schema(mapper=None, entities=None):
+    """walks the registered EntityMappers and returns a set of SchemaItem
+    objects for their node entities. Properties with ensure_unique=True get
+    a uniqueness constraint, which is backed by an index, and properties
+    with indexed=True get an index. An entity with more than one label gets
+    the constraint or index on each of its labels"""
+    items = set()
+
+    for entity in _node_entities(entities=entities):
+        properties = get_mapper(entity=entity, mapper=mapper).properties
+        unique = properties.unique_properties
+        indexed = properties.indexed_properties
+
+        for label in entity.lbl():
+            for field in unique:
+                items.add(SchemaItem(CONSTRAINT, label, field))
+
+            for field in indexed:
+                if field not in unique:
+                    items.add(SchemaItem(INDEX, label, field))
+
+    return items
+
+
+def managed_labels(entities=None):
+    """the labels of the registered node entities. Only the indexes and
+    constraints on these labels are managed, the others belong to labels
+    that moesha does not map"""
+    labels = set()
+
+    for entity in _node_entities(entities=entities):
+        labels.update(entity.lbl())
+
+    return labels
+
+
+class Schema(object):
+    """Creates the constraints and indexes that are declared on the
+    mappers. This is usually run once when an application is deployed:
+
+        schema = Schema(mapper)
+        diff = schema.diff()
+
+        print(diff.statements())
+
+        schema.apply()
+
+    Only the constraints and indexes on a single property of a node label
+    that has a registered mapper are managed. The server's version is read
+    first: Neo4j 3.x gets the legacy schema syntax and 4.4 or newer gets the
+    SHOW and FOR ... REQUIRE syntax. Other versions raise a SchemaException"""
+
+    def __init__(self, mapper, entities=None):
+        self.mapper = mapper
+        self.entities = entities
+        self._version = None
+        self._names = {}
+
+    @property
+    def connection(self):
+        return self.mapper.connection
+
+    @property
+    def version(self):
+        if self._version is None:
+            response = self.connection.query('CALL dbms.components() YIELD'
+                ' name, versions RETURN name, versions')
+            versions = [row.get('versions') or [] for row in
+                response.result_data if row.get('name') == 'Neo4j Kernel']
+
+            if not versions or not versions[0]:
+                raise SchemaException('The Neo4j server version is unknown')
+
+            self._version = parse_version(versions[0][0])
+
+        return self._version
+
+    @property
+    def legacy(self):
+        version = self.version
+
+        if version < LEGACY_VERSION:
+            return True
+
+        if version >= SHOW_VERSION:
+            return False
+
+        raise SchemaException(('The schema cannot be managed on Neo4j {},'
+            ' only 3.x and 4.4 or newer are supported').format(
+                '.'.join(str(v) for v in version)))
+
+    def declared(self):
+        return declared_schema(mapper=self.mapper, entities=self.entities)
+
+    def existing(self):
+        if self.legacy:
+            return self._existing_legacy()
+
+        return self._existing()
+
+    def _existing_legacy(self):
+        items = set()
+        constraints = self.connection.query('CALL db.constraints()')
+
+        for row in constraints.result_data:
+            match = CONSTRAINT_RE.search(row.get('description', ''))
+
+            if match:
+                items.add(SchemaItem(CONSTRAINT, match.group('label'),
+                    match.group('property')))
+
+        indexes = self.connection.query('CALL db.indexes()')
+
+        for row in indexes.result_data:
+            # unique constraints are listed with their backing index
+            if 'unique' in (row.get('type') or ''):
+                continue
+
+            match = INDEX_RE.search(row.get('description', ''))
+
+            if match:
+                items.add(SchemaItem(INDEX, match.group('label'),
+                    match.group('property')))
+
+        return items
+
+    def _existing(self):
+        items = set()
+        self._names = {}
+
+        def add(kind, row):
+            labels = row.get('labelsOrTypes') or []
+            properties = row.get('properties') or []
+
+            if row.get('entityType') != 'NODE' or len(labels) != 1\
+                or len(properties) != 1:
+                return
+
+            item = SchemaItem(kind, labels[0], properties[0])
+            self._names[item] = row.get('name')
+            items.add(item)
+
+        constraints = self.connection.query('SHOW CONSTRAINTS YIELD name,'
+            ' type, entityType, labelsOrTypes, properties')
+
+        for row in constraints.result_data:
+            if 'UNIQUENESS' in (row.get('type') or ''):
+                add(CONSTRAINT, row)
+
+        # owningConstraint is only listed from 5.0 on and uniqueness only
+        # before it
+        indexes = self.connection.query('SHOW INDEXES YIELD *')
+
+        for row in indexes.result_data:
+            # unique constraints are listed with their backing index
+            if row.get('owningConstraint')\
+                or row.get('uniqueness') == 'UNIQUE':
+                continue
+
+            if row.get('type') in RANGE_INDEX_TYPES:
+                add(INDEX, row)
+
+        return items
+
+    def diff(self):
+        declared = self.declared()
+        existing = self.existing()
+        labels = managed_labels(entities=self.entities)
+        existing = {item for item in existing if item.label in labels}
+
+        return SchemaDiff(missing=declared - existing,
+            extra=existing - declared, legacy=self.legacy,
+            names=self._names)
+
+    def apply(self, drop=False):
+        """creates the missing constraints and indexes. When drop is set,
+        the ones that exist in the graph but are not declared are dropped.
+        An index that a missing constraint replaces is always dropped.
+        Each statement is run on its own because schema changes cannot
+        share a transaction. Returns the statements that were run"""
+        statements = self.diff().statements(drop=drop)
+
+        for statement in statements:
+            self.connection.query(statement)
+
+        return statements
+
+
+class SchemaException(Exception):
+
+    def __init__(self, message):
+        super(SchemaException, self).__init__(message)
+
+        self.message = message
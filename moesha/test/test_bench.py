@@ -0,0 +1,63 @@
+import unittest
+
+from moesha.bench import (FakeConnection, SaveResponder, BENCHMARKS, node,
+    measure, run, report)
+from moesha.entity import Node, Relationship
+from moesha.mapper import Mapper
+
+
+class FakeConnectionTests(unittest.TestCase):
+
+    def test_can_replay_canned_records(self):
+        records = [{'n': node(i, ['User'], {'name': 'user'})}
+            for i in range(3)]
+        connection = FakeConnection(records=records)
+        mapper = Mapper(connection)
+        response = mapper.query(query='MATCH (n) RETURN n')
+
+        self.assertEqual(3, len(response))
+        self.assertEqual([0, 1, 2], [e.id for e in response])
+        self.assertEqual(1, connection.query_count)
+
+    def test_save_responder_will_assign_ids(self):
+        mapper = Mapper(FakeConnection(responder=SaveResponder()))
+        start = Node()
+        end = Node()
+        rel = Relationship(start=start, end=end, labels='Knows')
+        mapper.save(rel).send()
+
+        self.assertIsNotNone(start.id)
+        self.assertIsNotNone(end.id)
+        self.assertIsNotNone(rel.id)
+
+    def test_save_responder_will_answer_each_unwind_row(self):
+        mapper = Mapper(FakeConnection(responder=SaveResponder()))
+        nodes = [Node() for _ in range(3)]
+        mapper.save(*nodes).send(bulk=True)
+
+        self.assertEqual(3, len(set(n.id for n in nodes)))
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_can_measure_callable(self):
+        calls = []
+        result = measure('append', lambda: calls.append(1), iterations=5)
+
+        self.assertEqual('append', result.name)
+        self.assertEqual(5, result.iterations)
+        self.assertGreater(result.ops_per_sec, 0)
+        self.assertGreaterEqual(result.peak_bytes, 0)
+
+    def test_can_run_every_benchmark(self):
+        results = run(iterations=1)
+
+        self.assertEqual(list(BENCHMARKS), [r.name for r in results])
+        self.assertIn('save.node', report(results))
+
+    def test_cannot_run_unknown_benchmark(self):
+        self.assertRaises(KeyError, run, names=['unknown'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,287 @@
+import time
+import unittest
+
+from moesha.cache import (QueryCache, is_read_query, query_labels, freeze,
+    entity_key, EntityCache, LRUEntityCache, SharedMemoryEntityCache,
+    PendingEntityCache)
+
+
+class Result(object):
+
+    def __init__(self, rows=1):
+        self.result_data = [{'n': i} for i in range(rows)]
+
+
+class QueryHelperTests(unittest.TestCase):
+
+    def test_can_detect_write_queries(self):
+        self.assertTrue(is_read_query('MATCH (n:`User`) RETURN n'))
+        self.assertTrue(is_read_query('MATCH (n:User) RETURN n SKIP 1'
+            ' LIMIT 2'))
+        self.assertFalse(is_read_query('CREATE (n:User) RETURN n'))
+        self.assertFalse(is_read_query('MATCH (n) DETACH DELETE n'))
+        self.assertFalse(is_read_query('MATCH (n) set n.a = 1'))
+
+    def test_can_get_query_labels(self):
+        labels = query_labels('MATCH (n_0:`User`)-[:`FOLLOWS`|LIKES]->'
+            '(n_1:Account) WHERE id(n_0) = $id RETURN n_1')
+
+        self.assertEqual({'User', 'FOLLOWS', 'LIKES', 'Account'}, labels)
+
+    def test_unlabeled_node_matches_any_label(self):
+        self.assertIsNone(query_labels('MATCH (n) WHERE id(n) = $id'
+            ' RETURN n'))
+        self.assertIsNone(query_labels('MATCH (n:User)-[:FOLLOWS]->(m)'
+            ' RETURN m'))
+
+    def test_can_freeze_params(self):
+        a = freeze({'ids': [1, 2], 'b': {'c': {1}}})
+        b = freeze({'b': {'c': {1}}, 'ids': [1, 2]})
+
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+
+
+class QueryCacheTests(unittest.TestCase):
+
+    def test_can_cache_read_queries(self):
+        cache = QueryCache()
+        result = Result()
+
+        self.assertIsNone(cache.get('MATCH (n:User) RETURN n', {'a': 1}))
+
+        cache.set('MATCH (n:User) RETURN n', {'a': 1}, result)
+
+        self.assertIs(result, cache.get('MATCH (n:User) RETURN n', {'a': 1}))
+        self.assertIsNone(cache.get('MATCH (n:User) RETURN n', {'a': 2}))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+    def test_will_not_cache_write_queries(self):
+        cache = QueryCache()
+        cache.set('CREATE (n:User) RETURN n', {}, Result())
+
+        self.assertEqual(0, len(cache))
+        self.assertIsNone(cache.get('CREATE (n:User) RETURN n', {}))
+        self.assertEqual(0, cache.misses)
+
+    def test_will_evict_least_recently_used(self):
+        cache = QueryCache(max_entries=2)
+        cache.set('MATCH (a:A) RETURN a', {}, Result())
+        cache.set('MATCH (b:B) RETURN b', {}, Result())
+        cache.get('MATCH (a:A) RETURN a', {})
+        cache.set('MATCH (c:C) RETURN c', {}, Result())
+
+        self.assertIsNotNone(cache.get('MATCH (a:A) RETURN a', {}))
+        self.assertIsNone(cache.get('MATCH (b:B) RETURN b', {}))
+        self.assertEqual(1, cache.evictions)
+
+    def test_will_evict_by_bytes(self):
+        cache = QueryCache(max_bytes=1)
+        cache.set('MATCH (a:A) RETURN a', {}, Result(rows=100))
+
+        self.assertEqual(0, len(cache))
+
+        small = Result(rows=1)
+        cache = QueryCache(max_bytes=cache_size(small) * 2)
+        cache.set('MATCH (a:A) RETURN a', {}, small)
+        cache.set('MATCH (b:B) RETURN b', {}, small)
+        cache.set('MATCH (c:C) RETURN c', {}, small)
+
+        self.assertEqual(2, len(cache))
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+
+    def test_entries_will_expire(self):
+        cache = QueryCache(ttl=0.01)
+        cache.set('MATCH (a:A) RETURN a', {}, Result())
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get('MATCH (a:A) RETURN a', {}))
+        self.assertEqual(1, cache.expirations)
+        self.assertEqual(0, len(cache))
+
+    def test_can_invalidate_by_label(self):
+        cache = QueryCache()
+        cache.set('MATCH (a:A) RETURN a', {}, Result())
+        cache.set('MATCH (b:B) RETURN b', {}, Result())
+        cache.set('MATCH (n) RETURN n', {}, Result())
+        cache.invalidate('A')
+
+        self.assertIsNone(cache.get('MATCH (a:A) RETURN a', {}))
+        self.assertIsNone(cache.get('MATCH (n) RETURN n', {}))
+        self.assertIsNotNone(cache.get('MATCH (b:B) RETURN b', {}))
+        self.assertEqual(2, cache.invalidations)
+
+    def test_write_query_will_invalidate_its_labels(self):
+        cache = QueryCache()
+        cache.set('MATCH (a:A) RETURN a', {}, Result())
+        cache.set('MATCH (b:B) RETURN b', {}, Result())
+        cache.invalidate_query('CREATE (a:A) RETURN a')
+
+        self.assertEqual(1, len(cache))
+
+
+class EntityCacheTests(unittest.TestCase):
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class GetOnlyEntityCache(EntityCache):
+
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnlyEntityCache()
+
+
+class LRUEntityCacheTests(unittest.TestCase):
+
+    def test_can_get_and_delete_entities(self):
+        cache = LRUEntityCache()
+        key = entity_key(['User'], 1)
+        cache.set(key, {'id': 1})
+
+        self.assertEqual({'id': 1}, cache.get(key))
+        self.assertEqual({key: {'id': 1}},
+            cache.get_many([key, entity_key(['User'], 2)]))
+
+        cache.delete(key)
+
+        self.assertIsNone(cache.get(key))
+
+    def test_will_evict_least_recently_used(self):
+        cache = LRUEntityCache(max_entries=2)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+
+        self.assertIsNone(cache.get(2))
+        self.assertEqual('a', cache.get(1))
+        self.assertEqual(1, cache.evictions)
+
+    def test_entities_will_expire(self):
+        cache = LRUEntityCache(ttl=0.01)
+        cache.set(1, 'a')
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get(1))
+
+    def test_can_invalidate_labels(self):
+        cache = LRUEntityCache()
+        cache.set(entity_key(['User'], 1), {'id': 1})
+        cache.set(entity_key(['Follows'], 2), {'id': 2})
+        cache.invalidate('Follows')
+
+        self.assertIsNotNone(cache.get(entity_key(['User'], 1)))
+        self.assertIsNone(cache.get(entity_key(['Follows'], 2)))
+
+    def test_can_delete_attached_relationships(self):
+        cache = LRUEntityCache()
+        cache.set(entity_key(['Follows'], 2), {'id': 2, 'start': 1, 'end': 3})
+        cache.set(entity_key(['Follows'], 4), {'id': 4, 'start': 5, 'end': 3})
+        cache.delete_attached(1)
+
+        self.assertIsNone(cache.get(entity_key(['Follows'], 2)))
+        self.assertIsNotNone(cache.get(entity_key(['Follows'], 4)))
+
+
+class PendingEntityCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LRUEntityCache()
+        self.pending = PendingEntityCache(self.cache)
+        self.key = entity_key(['User'], 1)
+
+    def test_will_store_snapshots_on_commit(self):
+        self.pending.set(self.key, {'id': 1})
+
+        self.assertEqual({'id': 1}, self.pending.get(self.key))
+        self.assertIsNone(self.cache.get(self.key))
+
+        self.pending.commit()
+
+        self.assertEqual({'id': 1}, self.cache.get(self.key))
+
+    def test_will_drop_snapshots_on_rollback(self):
+        self.cache.set(self.key, {'id': 1, 'name': 'old'})
+        self.pending.set(self.key, {'id': 1, 'name': 'new'})
+        self.pending.rollback()
+
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_will_evict_right_away_and_after_commit(self):
+        self.cache.set(self.key, {'id': 1})
+        self.pending.delete(self.key)
+
+        self.assertIsNone(self.cache.get(self.key))
+
+        # a read from another worker before the commit
+        self.cache.set(self.key, {'id': 1})
+        self.pending.commit()
+
+        self.assertIsNone(self.cache.get(self.key))
+
+
+class SharedMemoryEntityCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = SharedMemoryEntityCache(slots=64, slot_size=256)
+
+    def tearDown(self):
+        self.cache.unlink()
+
+    def test_can_get_and_delete_entities(self):
+        key = entity_key(['User'], 1)
+        self.cache.set(key, {'id': 1, 'properties': {'name': 'mark'}})
+
+        self.assertEqual({'id': 1, 'properties': {'name': 'mark'}},
+            self.cache.get(key))
+
+        self.cache.delete(key)
+
+        self.assertIsNone(self.cache.get(key))
+
+    def test_will_not_cache_values_larger_than_a_slot(self):
+        key = entity_key(['User'], 1)
+        self.cache.set(key, 'x' * 1000)
+
+        self.assertIsNone(self.cache.get(key))
+
+    def test_can_attach_by_name(self):
+        key = entity_key(['User'], 1)
+        self.cache.set(key, 'shared')
+        other = SharedMemoryEntityCache(slots=64, slot_size=256,
+            name=self.cache.name, lock=self.cache.lock)
+
+        try:
+            self.assertEqual('shared', other.get(key))
+            other.clear()
+            self.assertIsNone(self.cache.get(key))
+        finally:
+            other.close()
+
+    def test_attaching_by_name_requires_the_lock(self):
+        with self.assertRaises(ValueError):
+            SharedMemoryEntityCache(slots=64, slot_size=256,
+                name=self.cache.name)
+
+    def test_can_invalidate_labels(self):
+        user = entity_key(['User'], 1)
+        follows = entity_key(['Follows'], 2)
+        self.cache.set(user, {'id': 1})
+        self.cache.set(follows, {'id': 2, 'start': 1, 'end': 3})
+        self.cache.invalidate('Follows')
+
+        self.assertIsNotNone(self.cache.get(user))
+        self.assertIsNone(self.cache.get(follows))
+
+
+def cache_size(result):
+    cache = QueryCache()
+    cache.set('MATCH (a:A) RETURN a', {}, result)
+
+    return cache.bytes
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+import unittest
+import threading
+
+from moesha.connection import (Connection, SessionPool, Response,
+    RecordResult, driver_version)
+
+
+class FakeRecord(dict):
+
+    def data(self):
+        return dict(self)
+
+
+class FakeSession(object):
+
+    def __init__(self, records=None):
+        self._closed = False
+        self._transaction = False
+        self.records = records or []
+
+    def run(self, query, params=None):
+        for record in self.records:
+            yield FakeRecord(record)
+
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+    def has_transaction(self):
+        return self._transaction
+
+
+class FakeConnection(object):
+
+    def __init__(self, records=None):
+        self.opened = []
+        self.records = records
+        self.session_kwargs = []
+
+    @property
+    def driver(self):
+        return self
+
+    def session(self, **kwargs):
+        session = FakeSession(records=self.records)
+        self.opened.append(session)
+        self.session_kwargs.append(kwargs)
+
+        return session
+
+
+class SessionPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection()
+
+    def test_can_reuse_released_session(self):
+        pool = SessionPool(self.connection)
+        session = pool.acquire()
+        pool.release(session)
+        session2 = pool.acquire()
+
+        self.assertEqual(id(session), id(session2))
+        self.assertEqual(1, pool.hits)
+        self.assertEqual(1, pool.misses)
+        self.assertEqual(1, len(self.connection.opened))
+
+    def test_will_not_reuse_closed_session(self):
+        pool = SessionPool(self.connection)
+        session = pool.acquire()
+        pool.release(session)
+        session.close()
+        session2 = pool.acquire()
+
+        self.assertNotEqual(id(session), id(session2))
+        self.assertEqual(2, pool.misses)
+
+    def test_will_close_sessions_over_max_size(self):
+        pool = SessionPool(self.connection, max_size=1)
+        session = pool.acquire()
+        session2 = pool.acquire()
+        pool.release(session)
+        pool.release(session2)
+
+        self.assertEqual(1, pool.size)
+        self.assertTrue(session2.closed())
+
+    def test_will_not_pool_session_with_open_transaction(self):
+        pool = SessionPool(self.connection)
+        session = pool.acquire()
+        session._transaction = True
+        pool.release(session)
+
+        self.assertEqual(0, pool.size)
+        self.assertTrue(session.closed())
+
+    def test_can_evict_idle_sessions(self):
+        pool = SessionPool(self.connection, idle_timeout=0)
+        session = pool.acquire()
+        pool.release(session)
+        pool._sessions[pool._thread_key()][0] = (session, 0)
+        pool.evict_idle()
+
+        self.assertEqual(0, pool.size)
+        self.assertEqual(1, pool.evictions)
+        self.assertTrue(session.closed())
+
+    def test_will_keep_sessions_per_thread(self):
+        pool = SessionPool(self.connection)
+        session = pool.acquire()
+        pool.release(session)
+        acquired = []
+
+        def run():
+            acquired.append(pool.acquire())
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+        self.assertNotEqual(id(session), id(acquired[0]))
+        self.assertEqual(2, pool.misses)
+
+    def test_will_close_sessions_of_ended_threads(self):
+        pool = SessionPool(self.connection)
+        released = []
+
+        def run():
+            session = pool.acquire()
+            pool.release(session)
+            released.append(session)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        session = pool.acquire()
+
+        self.assertNotEqual(id(released[0]), id(session))
+        self.assertTrue(released[0].closed())
+        self.assertEqual(0, pool.size)
+        self.assertEqual(1, pool.evictions)
+
+    def test_can_clear_pool(self):
+        pool = SessionPool(self.connection)
+        session = pool.acquire()
+        pool.release(session)
+        pool.clear()
+
+        self.assertEqual(0, pool.size)
+        self.assertTrue(session.closed())
+
+    def test_connection_has_configurable_pool(self):
+        connection = Connection(host='127.0.0.1', port=7687,
+            username='neo4j', password='test', session_pool_size=3,
+            session_idle_timeout=5)
+
+        self.assertEqual(3, connection.pool.max_size)
+        self.assertEqual(5, connection.pool.idle_timeout)
+
+
+class StreamTests(unittest.TestCase):
+
+    def setUp(self):
+        records = [{'n': i} for i in range(3)]
+        self.fake = FakeConnection(records=records)
+        self.connection = Connection(host='127.0.0.1', port=7687,
+            username='neo4j', password='test')
+        self.connection._driver = self.fake
+
+    def test_can_stream_records(self):
+        records = self.connection.stream('MATCH (n) RETURN n')
+
+        self.assertEqual(0, len(self.fake.opened))
+        self.assertEqual([{'n': 0}, {'n': 1}, {'n': 2}], list(records))
+        self.assertEqual(1, self.connection.pool.size)
+
+    def test_will_close_session_when_stream_is_not_exhausted(self):
+        records = self.connection.stream('MATCH (n) RETURN n')
+        next(records)
+        records.close()
+
+        self.assertTrue(self.fake.opened[0].closed())
+        self.assertEqual(0, self.connection.pool.size)
+
+    def test_can_pass_fetch_size_to_pooled_session(self):
+        self.connection.FETCH_SIZE_SUPPORTED = True
+        list(self.connection.stream('MATCH (n) RETURN n', fetch_size=100))
+        list(self.connection.stream('MATCH (n) RETURN n', fetch_size=100))
+        list(self.connection.stream('MATCH (n) RETURN n'))
+
+        self.assertEqual([{'fetch_size': 100}, {}],
+            self.fake.session_kwargs)
+        self.assertEqual(1, self.connection.pool.hits)
+        self.assertEqual(2, self.connection.pool.size)
+
+    def test_will_warn_when_driver_cannot_honor_fetch_size(self):
+        self.connection.FETCH_SIZE_SUPPORTED = False
+
+        with self.assertWarns(RuntimeWarning):
+            records = list(self.connection.stream('MATCH (n) RETURN n',
+                fetch_size=100))
+
+        self.assertEqual(3, len(records))
+        self.assertEqual([{}], self.fake.session_kwargs)
+
+    def test_can_parse_driver_version(self):
+        self.assertEqual((1, 7, 6), driver_version('1.7.6'))
+        self.assertEqual((5, 0, 0), driver_version('5.0.0a1'))
+
+
+class ResponseTests(unittest.TestCase):
+
+    def test_can_get_server_time_from_summary(self):
+        class Summary(object):
+            result_available_after = 5
+            result_consumed_after = 10
+
+        class Result(object):
+
+            def data(self):
+                return []
+
+            def summary(self):
+                return Summary()
+
+        response = Response(query='RETURN 1', params={}, result=Result())
+
+        self.assertEqual(0.015, response.server_time)
+
+    def test_server_time_is_none_without_summary(self):
+        response = Response(query='RETURN 1', params={},
+            result=RecordResult())
+
+        self.assertIsNone(response.server_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
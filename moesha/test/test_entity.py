@@ -1,4 +1,5 @@
 import unittest
+import copy
 import json
 import time
 
@@ -20,6 +21,10 @@ class Test_Unlabeled_Node(Node):
     pass
 
 
+class CompactTestNode(Node):
+    __slots__ = ()
+
+
 class EntityTests(unittest.TestCase):
 
     def test_can_create_entity(self):
@@ -286,5 +291,75 @@ class EntityTests(unittest.TestCase):
         self.assertEqual(new_p['name'], n['name'])
 
 
+class CompactEntityTests(unittest.TestCase):
+
+    def test_base_entities_do_not_have_dict(self):
+        self.assertFalse(hasattr(Node(), '__dict__'))
+        self.assertFalse(hasattr(Relationship(labels='knows'), '__dict__'))
+        self.assertFalse(hasattr(CompactTestNode(), '__dict__'))
+
+    def test_subclasses_without_slots_can_have_attributes(self):
+        n = TestNode()
+        n.something = 'value'
+
+        self.assertEqual('value', n.something)
+
+    def test_initial_values_are_shared_until_written(self):
+        n = Node(id=1, properties={'name': 'mark'})
+
+        self.assertIs(n._data, n._initial)
+
+        n['name'] = 'jones'
+
+        self.assertIsNot(n._data, n._initial)
+        self.assertEqual({'name': {'from': 'mark', 'to': 'jones'}},
+            n.changes)
+
+    def test_changes_and_deleted_are_allocated_on_first_mutation(self):
+        n = Node(id=1, properties={'name': 'mark', 'age': 1})
+
+        self.assertIsNone(n._changes)
+        self.assertIsNone(n._deleted)
+        self.assertEqual({}, n.changes)
+        self.assertEqual({}, n.deleted)
+
+        del n['age']
+
+        self.assertEqual({'age': 1}, n.deleted)
+        self.assertIsNone(n._changes)
+
+    def test_modifying_data_does_not_change_initial_values(self):
+        n = Node(id=1, properties={'name': 'mark'})
+        n.data['name'] = 'jones'
+        n['name'] = 'mark'
+
+        self.assertEqual({}, n.changes)
+
+    def test_can_tell_when_properties_were_written(self):
+        n = Node(id=1, properties={'name': 'mark'})
+        n.data
+
+        self.assertFalse(n.dirty)
+
+        n['age'] = 1
+
+        self.assertTrue(n.dirty)
+
+        del n['age']
+
+        self.assertFalse(n.dirty)
+
+    def test_data_is_a_dict(self):
+        n = Node(id=1, properties={'name': 'mark'})
+        data = n.data
+        copied = copy.copy(data)
+        data.update({'age': 1})
+
+        self.assertIsInstance(data, dict)
+        self.assertEqual('mark', json.loads(json.dumps(data))['name'])
+        self.assertEqual(1, n['age'])
+        self.assertNotIn('age', copied)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from moesha.bench import FakeConnection, SaveResponder
+from moesha.entity import Node
+from moesha.instrument import QueryStats, UnitTiming, query_hash
+from moesha.mapper import Mapper
+
+
+class InstrumentTests(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection(responder=SaveResponder())
+        self.mapper = Mapper(self.connection)
+        self.timings = []
+        self.mapper.add_listener(self.timings.append)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_listener_will_get_timing_for_each_unit(self):
+        self.mapper.save(Node(), Node()).send()
+
+        self.assertEqual(2, len(self.timings))
+
+        for timing in self.timings:
+            self.assertIsInstance(timing, UnitTiming)
+            self.assertEqual(1, timing.rows)
+            self.assertEqual(query_hash(timing.query), timing.query_hash)
+            self.assertGreaterEqual(timing.prepare_time, 0)
+            self.assertGreaterEqual(timing.query_time, 0)
+            self.assertGreaterEqual(timing.hydration_time, 0)
+            self.assertIsNone(timing.server_time)
+
+    def test_can_remove_listener(self):
+        self.mapper.remove_listener(self.timings.append)
+        self.mapper.save(Node()).send()
+
+        self.assertEqual(0, len(self.timings))
+
+    def test_bulk_unit_is_timed_once(self):
+        self.mapper.save(Node(), Node(), Node()).send(bulk=True)
+
+        self.assertEqual(1, len(self.timings))
+        self.assertEqual(3, self.timings[0].rows)
+
+
+class QueryStatsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection(responder=SaveResponder())
+        self.mapper = Mapper(self.connection)
+        self.stats = QueryStats()
+        self.mapper.add_listener(self.stats)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_will_aggregate_by_query_shape(self):
+        for _ in range(3):
+            self.mapper.save(Node()).send()
+
+        self.mapper.save(Node(), Node()).send(bulk=True)
+
+        self.assertEqual(2, len(self.stats))
+
+        counts = sorted(s.count for s in self.stats.top())
+
+        self.assertEqual([1, 3], counts)
+
+    def test_can_get_top_shapes(self):
+        for _ in range(3):
+            self.mapper.save(Node()).send()
+
+        self.mapper.save(Node(), Node()).send(bulk=True)
+        top = self.stats.top(n=1, key='count')
+
+        self.assertEqual(1, len(top))
+        self.assertEqual(3, top[0].count)
+        self.assertIn(top[0].query, self.stats.report())
+
+    def test_can_reset(self):
+        self.mapper.save(Node()).send()
+        self.stats.reset()
+
+        self.assertEqual(0, len(self.stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 import json
 import time
@@ -7,8 +8,11 @@ from random import random, randint
 from moesha.entity import (Node, Relationship)
 from moesha.property import (String, Integer, TimeStamp,
     RelatedEntity)
-from moesha.mapper import (Mapper, EntityMapper, get_mapper,
-    EntityRelationshipMapper)
+from moesha.mapper import (Mapper, AsyncMapper, AsyncWork, EntityMapper,
+    get_mapper, EntityRelationshipMapper, IdentityMap)
+from moesha.query import Builder, decode_cursor
+from moesha.cache import entity_key
+from moesha.util import MOESHA_ENTITY_TYPE
 
 
 class TestConnection(object):
@@ -57,6 +61,93 @@ class TestConnection(object):
 TC = TestConnection()
 
 
+class AsyncTestConnection(object):
+    """stands in for an AsyncConnection. The driver that it hands to
+    AsyncConnectionTransaction answers like the neo4j>=5 async driver:
+    iterating a result gives records with the driver's nodes and
+    relationships while result.data() turns them into plain dicts"""
+
+    def __init__(self, responder=None):
+        self.queries = []
+        self.committed = 0
+        self.rolled_back = 0
+        self.responder = responder
+
+    def records(self, query, params=None):
+        self.queries.append((query, params))
+
+        if self.responder:
+            return self.responder(query, params) or []
+
+        return []
+
+    async def query(self, query, params=None):
+        from moesha.connection import Response, RecordResult
+
+        return Response(query=query, params=params,
+            result=RecordResult(records=self.records(query, params)))
+
+    @property
+    def driver(self):
+        connection = self
+
+        class Record(dict):
+
+            def data(self):
+                return {k: dict(v) if hasattr(v, 'labels')
+                    or hasattr(v, 'type') else v for k, v in self.items()}
+
+        class Result:
+
+            def __init__(self, records):
+                self.records = [Record(r) for r in records]
+
+            def __aiter__(self):
+                return self._iterate()
+
+            async def _iterate(self):
+                for record in self.records:
+                    yield record
+
+            async def data(self):
+                return [r.data() for r in self.records]
+
+        class Transaction:
+
+            async def run(self, query, params=None):
+                return Result(connection.records(query, params))
+
+            async def commit(self):
+                connection.committed += 1
+
+            async def rollback(self):
+                connection.rolled_back += 1
+
+        class Session:
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return
+
+            async def run(self, query, params=None):
+                return Result(connection.records(query, params))
+
+            async def begin_transaction(self):
+                return Transaction()
+
+            async def close(self):
+                return
+
+        class Driver:
+
+            def session(self):
+                return Session()
+
+        return Driver()
+
+
 class TestNode(Node):
     pass
 
@@ -1002,6 +1093,1481 @@ class MapperDeleteTests(unittest.TestCase):
         for q in query:
             self.assertTrue('DELETE' in q[0])
 
+
+class BulkNode(Node):
+    pass
+
+
+class BulkNodeMapper(EntityMapper):
+    entity = BulkNode
+    __PROPERTIES__ = {
+        'name': String(),
+    }
+
+
+class MapperBulkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mapper = Mapper(TC)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_can_bulk_create_multiple_nodes(self):
+        nodes = [BulkNode(properties={'name': 'name{}'.format(i)})
+            for i in range(5)]
+        work = self.mapper.save(*nodes)
+        queries = work.queries(bulk=True)
+        query, params = queries[0]
+
+        self.assertEqual(1, len(queries))
+        self.assertTrue(query.startswith('UNWIND $rows'))
+        self.assertIn('CREATE', query)
+        self.assertEqual(5, len(params['rows']))
+        self.assertEqual('name3', params['rows'][3]['properties']['name'])
+
+    def test_can_bulk_update_multiple_nodes(self):
+        nodes = [BulkNode(id=i + 100, properties={'name': 'name'})
+            for i in range(3)]
+        work = self.mapper.save(*nodes)
+        queries = work.queries(bulk=True)
+        query, params = queries[0]
+
+        self.assertEqual(1, len(queries))
+        self.assertIn('SET n += row.`properties`', query)
+        self.assertEqual([100, 101, 102], [r['id'] for r in params['rows']])
+
+    def test_will_only_bulk_consecutive_units_of_the_same_shape(self):
+        new = [BulkNode(properties={'name': 'new'}) for i in range(2)]
+        existing = [BulkNode(id=i + 100) for i in range(2)]
+        single = Node(properties={'name': 'single'})
+        work = self.mapper.save(*new)
+        self.mapper.save(single, work=work)
+        self.mapper.save(*existing, work=work)
+        queries = work.queries(bulk=True)
+
+        self.assertEqual(3, len(queries))
+        self.assertIn('CREATE', queries[0][0])
+        self.assertTrue(queries[1][0].startswith('CREATE'))
+        self.assertIn('MATCH', queries[2][0])
+
+    def test_can_bulk_create_with_before_and_after_events(self):
+        events = {'before': [], 'after': []}
+
+        class BulkEventNode(Node):
+            pass
+
+        class BulkEventNodeMapper(EntityMapper):
+            entity = BulkEventNode
+
+            def on_before_create(self, entity):
+                events['before'].append(entity)
+
+            def on_after_create(self, entity, response=None, **kwargs):
+                events['after'].append(entity)
+
+        nodes = [BulkEventNode() for i in range(3)]
+        self.mapper.save(*nodes).send(bulk=True)
+
+        self.assertEqual(nodes, events['before'])
+        self.assertEqual(nodes, events['after'])
+
+class StreamTestConnection(object):
+
+    def __init__(self, records):
+        self.records = records
+        self.pulled = 0
+
+    def stream(self, query, params=None, fetch_size=None):
+        for record in self.records:
+            self.pulled += 1
+
+            yield record
+
+
+class MapperStreamTests(unittest.TestCase):
+
+    def setUp(self):
+        records = [{'n': i} for i in range(3)] + [{'a': 1, 'b': 2}]
+        self.connection = StreamTestConnection(records)
+        self.mapper = Mapper(self.connection)
+
+    def test_can_stream_query_results_lazily(self):
+        response = self.mapper.query(query='RETURN 1', stream=True)
+
+        self.assertEqual(0, self.connection.pulled)
+
+        entities = iter(response)
+        first = next(entities)
+
+        self.assertEqual(1, self.connection.pulled)
+        self.assertEqual(0, first['result'])
+
+    def test_can_stream_multiple_field_records(self):
+        response = self.mapper.query(query='RETURN 1', stream=True)
+        entities = list(response)
+
+        self.assertEqual(4, len(entities))
+        self.assertEqual(1, entities[3]['a'])
+        self.assertEqual(2, entities[3]['b'])
+
+    def test_can_get_first_streamed_entity(self):
+        response = self.mapper.query(query='RETURN 1', stream=True)
+
+        self.assertEqual(0, response.first()['result'])
+        self.assertEqual(1, self.connection.pulled)
+
+    def test_streamed_response_does_not_have_length(self):
+        response = self.mapper.query(query='RETURN 1', stream=True)
+
+        self.assertRaises(TypeError, len, response)
+
+
+class MapperIdentityMapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.mapper = Mapper(TC)
+
+    def test_will_create_distinct_entities_without_session(self):
+        a = self.mapper.create(id=1, entity=BulkNode)
+        b = self.mapper.create(id=1, entity=BulkNode)
+
+        self.assertIsNot(a, b)
+
+    def test_will_resolve_same_id_to_same_entity_in_session(self):
+        with self.mapper.session() as identity_map:
+            a = self.mapper.create(id=1, entity=BulkNode,
+                properties={'name': 'a'})
+            b = self.mapper.create(id=1, entity=BulkNode,
+                properties={'name': 'b'})
+
+        self.assertIs(a, b)
+        self.assertEqual('a', b['name'])
+        self.assertIn(a, identity_map)
+        self.assertEqual(1, len(identity_map))
+
+    def test_will_not_store_entities_without_id(self):
+        with self.mapper.session() as identity_map:
+            a = self.mapper.create(entity=BulkNode)
+            b = self.mapper.create(entity=BulkNode)
+
+        self.assertIsNot(a, b)
+        self.assertEqual(0, len(identity_map))
+
+    def test_will_key_nodes_and_relationships_separately(self):
+        with self.mapper.session() as identity_map:
+            node = self.mapper.create(id=1)
+            rel = self.mapper.create(id=1, entity=Relationship,
+                labels=['Knows'])
+
+        self.assertIsNot(node, rel)
+        self.assertIs(rel, identity_map.get('relationship', 1))
+
+    def test_can_nest_sessions(self):
+        with self.mapper.session() as outer:
+            with self.mapper.session() as inner:
+                self.assertIs(inner, self.mapper.identity_map)
+
+            self.assertIs(outer, self.mapper.identity_map)
+
+        self.assertIsNone(self.mapper.identity_map)
+
+    def test_session_is_not_shared_with_other_threads(self):
+        import threading
+
+
+        seen = []
+
+        def run():
+            seen.append(self.mapper.identity_map)
+
+        with self.mapper.session():
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+
+        self.assertEqual([None], seen)
+
+    def test_work_created_directly_will_use_active_session(self):
+        from moesha.mapper import Work
+
+
+        with self.mapper.session() as identity_map:
+            work = Work(mapper=self.mapper)
+
+        self.assertIs(identity_map, work.identity_map)
+
+    def test_work_will_use_active_session_identity_map(self):
+        with self.mapper.session() as identity_map:
+            work = self.mapper.get_work()
+
+        self.assertIs(identity_map, work.identity_map)
+        self.assertIsInstance(Mapper(TC).get_work().identity_map,
+            IdentityMap)
+
+    def test_will_resolve_hydrated_records_to_same_entity(self):
+        record = {
+            MOESHA_ENTITY_TYPE: 'node',
+            'id': 9,
+            'labels': ['BulkNode'],
+            'name': 'mark',
+        }
+        connection = StreamTestConnection([{'n': dict(record)},
+            {'n': dict(record)}])
+        mapper = Mapper(connection)
+
+        with mapper.session():
+            entities = list(mapper.query(query='MATCH (n) RETURN n',
+                stream=True))
+
+        self.assertIs(entities[0], entities[1])
+
+
+class PrefetchTestConnection(object):
+
+    def __init__(self, records):
+        self.records = records
+        self.queries = []
+
+    def query(self, query, params=None):
+        from moesha.connection import Response, RecordResult
+
+        self.queries.append((query, params))
+
+        return Response(query=query, params=params,
+            result=RecordResult(self.records))
+
+
+class PrefetchUser(Node):
+    pass
+
+
+class PrefetchUserMapper(EntityMapper):
+    entity = PrefetchUser
+    __RELATIONSHIPS__ = {
+        'Follows': RelatedEntity(relationship_type='Follows'),
+    }
+
+
+class MapperPrefetchTests(unittest.TestCase):
+
+    def setUp(self):
+        def user(id):
+            return {
+                MOESHA_ENTITY_TYPE: 'node',
+                'id': id,
+                'labels': ['PrefetchUser'],
+            }
+
+        records = [
+            {'start_id': 1, 'end_node': user(3)},
+            {'start_id': 1, 'end_node': user(4)},
+            {'start_id': 2, 'end_node': user(3)},
+        ]
+        self.connection = PrefetchTestConnection(records)
+        self.mapper = Mapper(self.connection)
+        self.users = [PrefetchUser(id=i) for i in (1, 2, 5)]
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_can_prefetch_relationship_with_one_query(self):
+        self.mapper.prefetch(self.users, 'Follows')
+
+        self.assertEqual(1, len(self.connection.queries))
+
+        query, params = self.connection.queries[0]
+
+        self.assertIn('WHERE id(start_node) IN $ids', query)
+        self.assertEqual([1, 2, 5], params['ids'])
+
+    def test_will_use_prefetched_results(self):
+        self.mapper.prefetch(self.users, 'Follows')
+        results = {}
+
+        for user in self.users:
+            follows = self.mapper(user)['Follows']()
+            results[user.id] = [f.id for f in follows]
+
+        self.assertEqual(1, len(self.connection.queries))
+        self.assertEqual({1: [3, 4], 2: [3], 5: []}, results)
+
+    def test_prefetched_results_share_identity_map(self):
+        with self.mapper.session():
+            self.mapper.prefetch(self.users, 'Follows')
+
+        first = self.mapper(self.users[0])['Follows']()
+        second = self.mapper(self.users[1])['Follows']()
+
+        self.assertIs(first[0], second[0])
+
+    def test_prefetched_results_are_kept_per_return_type(self):
+        self.mapper.prefetch(self.users, 'Follows')
+        related = self.mapper(self.users[0])['Follows']
+
+        self.assertIsNotNone(related.get_prefetched(self.users[0]))
+        self.assertIsNone(related.get_prefetched(self.users[0],
+            return_relationship=True))
+
+    def test_will_forget_prefetched_results_when_relationship_added(self):
+        self.mapper.prefetch(self.users, 'Follows')
+        related = self.mapper(self.users[0])['Follows']
+        related.add(PrefetchUser(id=9))
+
+        self.assertIsNone(related.get_prefetched(self.users[0]))
+        self.assertIsNotNone(related.get_prefetched(self.users[1]))
+
+    def test_cannot_prefetch_undefined_relationship(self):
+        from moesha.mapper import MapperException
+
+        self.assertRaises(MapperException, self.mapper.prefetch, self.users,
+            'Unknown')
+
+
+class MapperGetByIdsTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, node
+
+
+        def responder(query, params):
+            # answer in reverse to show that the results are reordered
+            return [{'node': node(i, ['BulkNode'], {'name': str(i)})}
+                for i in reversed(params['ids'])]
+
+        self.connection = FakeConnection(responder=responder)
+        self.mapper = Mapper(self.connection)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_will_return_entities_in_id_order(self):
+        ids = [5, 3, 9, 1]
+        result = self.mapper.get_by_ids(ids, entity=BulkNode)
+
+        self.assertEqual(ids, [e.id for e in result])
+        self.assertEqual(1, self.connection.query_count)
+
+    def test_will_chunk_large_id_sets(self):
+        ids = list(range(10, 0, -1))
+        result = self.mapper.get_by_ids(ids, entity=BulkNode, chunk_size=3)
+
+        self.assertEqual(4, self.connection.query_count)
+        self.assertEqual(ids, [e.id for e in result])
+        self.assertEqual([1], self.connection.last_query[1]['ids'])
+
+
+class HydrateNode(Node):
+    pass
+
+
+class HydrateNodeMapper(EntityMapper):
+    entity = HydrateNode
+    __PROPERTIES__ = {
+        'name': String(),
+        'age': Integer(),
+    }
+
+
+class MapperHydrateTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, node, relationship
+
+
+        records = [{'n': node(i, ['HydrateNode'], {'name': i, 'age': '3'})}
+            for i in range(3)]
+        records.append({'n': relationship(10, 1, 2, 'LINKS', {'w': 1})})
+        records.append({'n': 5})
+        self.mapper = Mapper(FakeConnection(records=records))
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_can_hydrate_all_entities_at_once(self):
+        response = self.mapper.query(query='MATCH (n) RETURN n')
+        response.hydrate()
+        entities = list(response)
+
+        self.assertEqual(5, len(entities))
+        self.assertIsInstance(entities[0], HydrateNode)
+        self.assertEqual('2', entities[2]['name'])
+        self.assertEqual(3, entities[2]['age'])
+        self.assertIsInstance(entities[3], Relationship)
+        self.assertEqual(1, entities[3].start)
+        self.assertEqual(5, entities[4]['result'])
+
+    def test_hydrated_entities_match_lazy_entities(self):
+        hydrated = self.mapper.query(query='MATCH (n) RETURN n').hydrate()
+        self.mapper.reset()
+        lazy = self.mapper.query(query='MATCH (n) RETURN n')
+
+        self.assertEqual([e.data for e in lazy], [e.data for e in hydrated])
+
+
+class MapperColumnsTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection
+
+
+        self.connection = FakeConnection()
+        self.mapper = Mapper(self.connection)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def query(self, records):
+        self.connection.records = records
+
+        return self.mapper.query(query='MATCH (n) RETURN n')
+
+    def test_can_get_typed_columns_without_hydrating(self):
+        from moesha.bench import node
+
+
+        response = self.query([{'n': node(i, ['HydrateNode'],
+            {'name': 'u{}'.format(i), 'age': str(i * 10)})}
+            for i in range(3)])
+        columns = response.to_columns(use_numpy=False)
+
+        self.assertEqual(['id', 'age', 'name'], list(columns.keys()))
+        self.assertEqual([0, 1, 2], columns['id'])
+        self.assertEqual([0, 10, 20], columns['age'])
+        self.assertEqual(['u0', 'u1', 'u2'], columns['name'])
+        self.assertEqual([], response.entities)
+
+    def test_can_get_relationship_columns(self):
+        from moesha.bench import relationship
+
+
+        response = self.query([{'r': relationship(7, 1, 2, 'LINKS',
+            {'w': 1})}])
+        columns = response.to_columns(use_numpy=False)
+
+        self.assertEqual([7], columns['id'])
+        self.assertEqual([1], columns['start'])
+        self.assertEqual([2], columns['end'])
+
+    def test_can_get_columns_for_field_records(self):
+        response = self.query([{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}])
+        columns = response.to_columns(use_numpy=False)
+
+        self.assertEqual({'a': [1, 2], 'b': ['x', 'y']}, dict(columns))
+
+
+class MapperQueryCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, SaveResponder, node
+        from moesha.cache import QueryCache
+
+
+        save = SaveResponder()
+
+        def responder(query, params):
+            if query.startswith('MATCH (n_0:`BulkNode`)'):
+                return [{'n': node(1, ['BulkNode'], {'name': 'cached'})}]
+
+            return save(query, params)
+
+        self.connection = FakeConnection(responder=responder)
+        self.cache = QueryCache()
+        self.mapper = Mapper(self.connection, cache=self.cache)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_will_answer_repeated_reads_from_cache(self):
+        a = self.mapper.get_by_id(BulkNode, id_val=1)
+        b = self.mapper.get_by_id(BulkNode, id_val=1)
+
+        self.assertEqual(1, self.connection.query_count)
+        self.assertEqual('cached', b['name'])
+        self.assertIsNot(a, b)
+        self.assertEqual(1, self.cache.hits)
+
+    def test_can_skip_cache_for_a_query(self):
+        query = 'MATCH (n_0:`BulkNode`) RETURN n_0'
+        self.mapper.query(query=query)
+        self.mapper.query(query=query, cache=False)
+
+        self.assertEqual(2, self.connection.query_count)
+
+    def test_save_will_invalidate_labels(self):
+        node = self.mapper.get_by_id(BulkNode, id_val=1)
+        node['name'] = 'changed'
+        self.mapper.save(node).send()
+        self.mapper.get_by_id(BulkNode, id_val=1)
+
+        self.assertEqual(3, self.connection.query_count)
+        self.assertEqual(0, self.cache.hits)
+
+    def test_save_will_not_invalidate_other_labels(self):
+        self.mapper.query(query='MATCH (n_0:`BulkNode`) RETURN n_0')
+        self.mapper.save(TestNode()).send()
+        self.mapper.query(query='MATCH (n_0:`BulkNode`) RETURN n_0')
+
+        self.assertEqual(1, self.cache.hits)
+
+    def test_saving_a_relationship_will_invalidate_its_type(self):
+        query = ('MATCH (a:`Other`)-[:`BulkFollows`]->(b:`Other`)'
+            ' RETURN b')
+        self.mapper.query(query=query)
+        rel = BulkFollows(start=BulkNode(), end=BulkNode())
+        self.mapper.save(rel).send()
+        self.mapper.query(query=query)
+
+        self.assertEqual(0, self.cache.hits)
+
+    def test_changing_a_hit_will_not_change_the_cache(self):
+        query = 'MATCH (n_0:`BulkNode`) RETURN n_0'
+        first = self.mapper.query(query=query)
+        first.data.append(first.data[0])
+        hit = self.mapper.query(query=query)
+        hit[0]['name'] = 'changed'
+        hit.data.append(hit.data[0])
+        hit.data.reverse()
+        second = self.mapper.query(query=query)
+
+        self.assertEqual(2, self.cache.hits)
+        self.assertEqual(1, len(second))
+        self.assertEqual('cached', second[0]['name'])
+
+
+class MapperEntityCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, SaveResponder, node
+        from moesha.cache import LRUEntityCache
+
+
+        save = SaveResponder(start_id=100)
+
+        def responder(query, params):
+            if 'RETURN' in query and 'SET' not in query\
+                and 'CREATE' not in query and 'DELETE' not in query:
+                ids = params.get('ids') or list(params.values())
+
+                return [{'n': node(i, ['BulkNode'], {'name': str(i)})}
+                    for i in ids]
+
+            return save(query, params)
+
+        self.connection = FakeConnection(responder=responder)
+        self.cache = LRUEntityCache()
+        self.mapper = Mapper(self.connection, entity_cache=self.cache)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_will_get_entity_by_id_from_cache(self):
+        a = self.mapper.get_by_id(BulkNode, id_val=1)
+        b = self.mapper.get_by_id(BulkNode, id_val=1)
+
+        self.assertEqual(1, self.connection.query_count)
+        self.assertIsInstance(b, BulkNode)
+        self.assertEqual(1, b.id)
+        self.assertEqual('1', b['name'])
+
+    def test_will_only_query_missing_ids(self):
+        list(self.mapper.get_by_ids([1, 2], entity=BulkNode))
+        result = self.mapper.get_by_ids([3, 2, 1], entity=BulkNode)
+
+        self.assertEqual(2, self.connection.query_count)
+        self.assertEqual([3], self.connection.last_query[1]['ids'])
+        self.assertEqual([3, 2, 1], [e.id for e in result])
+
+    def test_will_not_query_when_all_ids_are_cached(self):
+        list(self.mapper.get_by_ids([1, 2], entity=BulkNode))
+        result = self.mapper.get_by_ids([2, 1], entity=BulkNode)
+
+        self.assertEqual(1, self.connection.query_count)
+        self.assertEqual([2, 1], [e.id for e in result])
+
+    def test_delete_will_evict_entity(self):
+        node = self.mapper.get_by_id(BulkNode, id_val=1)
+        self.mapper.delete(node).send()
+        self.mapper.get_by_id(BulkNode, id_val=1)
+
+        self.assertEqual(3, self.connection.query_count)
+
+    def test_save_will_refresh_entity(self):
+        node = BulkNode(properties={'name': 'new'})
+        self.mapper.save(node).send()
+        cached = self.mapper.get_by_id(BulkNode, id_val=node.id)
+
+        self.assertEqual(1, self.connection.query_count)
+        self.assertEqual(node.id, cached.id)
+
+    def test_will_not_cache_entities_from_a_failed_send(self):
+        class CacheFailNode(Node):
+            pass
+
+        class CacheFailNodeMapper(EntityMapper):
+            entity = CacheFailNode
+
+            def on_after_create(self, entity, response=None, **kwargs):
+                raise Exception('failed')
+
+        node = CacheFailNode()
+
+        with self.assertRaises(Exception):
+            self.mapper.save(node).send()
+
+        self.assertIsNotNone(node.id)
+        self.assertEqual(0, len(self.cache))
+
+    def test_will_not_cache_entities_from_a_failed_pipelined_send(self):
+        failing = []
+
+        class CachePipelineFailNode(Node):
+            pass
+
+        class CachePipelineFailNodeMapper(EntityMapper):
+            entity = CachePipelineFailNode
+
+            def on_after_create(self, entity, response=None, **kwargs):
+                if entity in failing:
+                    raise Exception('failed')
+
+        saved = CachePipelineFailNode()
+        failed = CachePipelineFailNode()
+        failing.append(failed)
+
+        with self.assertRaises(Exception):
+            self.mapper.save(saved, failed).send(pipeline=True)
+
+        self.assertIsNotNone(saved.id)
+        self.assertEqual(0, len(self.cache))
+
+    def test_will_only_cache_entities_once_committed(self):
+        sizes = []
+
+        class CacheCommitNode(Node):
+            pass
+
+        class CacheCommitNodeMapper(EntityMapper):
+            entity = CacheCommitNode
+
+            def on_after_create(s, entity, response=None, **kwargs):
+                sizes.append(len(self.cache))
+
+        self.mapper.save(CacheCommitNode()).send()
+
+        self.assertEqual({0}, set(sizes))
+        self.assertEqual(1, len(self.cache))
+
+    def test_query_statements_will_evict_relationships(self):
+        user = PageUser(id=1)
+        key = entity_key(['Follows'], 50)
+        self.cache.set(key, {'id': 50, 'start': 1, 'end': 2})
+        relationship = Relationship(start=user, end=PageUser(id=2),
+            labels='Follows')
+
+        self.mapper(user)['Follows'].delete(relationship).send()
+
+        self.assertIsNone(self.cache.get(key))
+
+    def test_detach_delete_will_evict_attached_relationships(self):
+        node = self.mapper.get_by_id(BulkNode, id_val=1)
+        attached = entity_key(['Follows'], 50)
+        other = entity_key(['Follows'], 51)
+        self.cache.set(attached, {'id': 50, 'start': 2, 'end': 1})
+        self.cache.set(other, {'id': 51, 'start': 2, 'end': 3})
+
+        self.mapper.delete(node).send()
+
+        self.assertIsNone(self.cache.get(attached))
+        self.assertIsNotNone(self.cache.get(other))
+
+    def test_async_rollback_will_not_cache_entities(self):
+        from moesha.bench import node
+
+
+        class AsyncCacheFailNode(Node):
+            pass
+
+        class AsyncCacheFailNodeMapper(EntityMapper):
+            entity = AsyncCacheFailNode
+
+            async def on_after_create(self, entity, response=None,
+                                      **kwargs):
+                raise Exception('failed')
+
+        connection = AsyncTestConnection(responder=lambda q, p: [
+            {'n_0': node(7, ['AsyncCacheFailNode'], {})}])
+        mapper = AsyncMapper(connection, entity_cache=self.cache)
+        entity = AsyncCacheFailNode()
+
+        with self.assertRaises(Exception):
+            asyncio.run(mapper.save(entity).send())
+
+        self.assertEqual(7, entity.id)
+        self.assertEqual(1, connection.rolled_back)
+        self.assertEqual(0, len(self.cache))
+
+
+class MapperPipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, SaveResponder
+
+
+        self.connection = FakeConnection(responder=SaveResponder())
+        self.mapper = Mapper(self.connection)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def events(self):
+        return [e for e, _ in self.connection.events]
+
+    def test_will_run_independent_units_before_pulling(self):
+        nodes = [BulkNode(properties={'name': str(i)}) for i in range(3)]
+        self.mapper.save(*nodes).send(pipeline=True)
+
+        self.assertEqual(['run'] * 3 + ['pull'] * 3 + ['commit'],
+            self.events())
+        self.assertTrue(all(n.id for n in nodes))
+
+    def test_relationship_waits_for_its_nodes(self):
+        start = BulkNode(properties={'name': 'start'})
+        end = BulkNode(properties={'name': 'end'})
+        other = BulkNode(properties={'name': 'other'})
+        rel = TestRelationship(start=start, end=end)
+        work = self.mapper.save(start, end, rel, other)
+        batches = work.pipeline_batches(work.units)
+
+        self.assertEqual([2, 2], [len(b) for b in batches])
+
+        work.send(pipeline=True)
+
+        self.assertEqual(['run', 'run', 'pull', 'pull', 'run', 'run', 'pull',
+            'pull', 'commit'], self.events())
+        self.assertIsNotNone(rel.id)
+        self.assertIsNotNone(start.id)
+
+    def test_pipelined_work_notifies_listeners(self):
+        timings = []
+        self.mapper.add_listener(timings.append)
+        self.mapper.save(BulkNode(), BulkNode()).send(pipeline=True)
+
+        self.assertEqual(2, len(timings))
+        self.assertEqual(1, timings[0].rows)
+
+
+class MapperChunkedCommitTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, SaveResponder
+
+
+        self.connection = FakeConnection(responder=SaveResponder())
+        self.mapper = Mapper(self.connection)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def events(self):
+        return [e for e, _ in self.connection.events if e != 'pull']
+
+    def test_can_commit_every_n_units(self):
+        nodes = [BulkNode(properties={'name': str(i)}) for i in range(5)]
+        self.mapper.save(*nodes).send(commit_every=2)
+
+        self.assertEqual(['run', 'run', 'commit', 'run', 'run', 'commit',
+            'run', 'commit'], self.events())
+
+    def test_can_commit_by_param_size(self):
+        nodes = [BulkNode(properties={'name': 'x' * 100}) for i in range(3)]
+        self.mapper.save(*nodes).send(commit_bytes=1)
+
+        self.assertEqual(['run', 'commit'] * 3, self.events())
+
+    def test_can_stream_responses_to_callback(self):
+        responses = []
+        nodes = [BulkNode(properties={'name': str(i)}) for i in range(3)]
+        response = self.mapper.save(*nodes).send(commit_every=2,
+            callback=responses.append)
+
+        self.assertEqual(3, len(responses))
+        self.assertEqual(0, len(response))
+        self.assertTrue(all(n.id for n in nodes))
+
+    def test_pipelined_work_commits_between_batches(self):
+        nodes = [BulkNode(properties={'name': str(i)}) for i in range(3)]
+        self.mapper.save(*nodes).send(pipeline=True, commit_every=2)
+
+        self.assertEqual(['run', 'run', 'commit', 'run', 'commit'],
+            self.events())
+
+
+class BulkFollows(Relationship):
+    pass
+
+
+class BulkFollowsMapper(EntityRelationshipMapper):
+    entity = BulkFollows
+    __PROPERTIES__ = {
+        'since': Integer(),
+    }
+
+
+class BulkFollower(Node):
+    pass
+
+
+class BulkFollowerMapper(EntityMapper):
+    entity = BulkFollower
+    __PROPERTIES__ = {
+        'name': String(),
+    }
+    __RELATIONSHIPS__ = {
+        'Follows': RelatedEntity(relationship_entity=BulkFollows),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(BulkFollowerMapper, self).__init__(*args, **kwargs)
+
+        self.added = []
+        self.updated = []
+
+    def on_after_update(self, entity, response=None, **kwargs):
+        self.updated.append(entity)
+
+    def on_relationship_follows_added(self, entity, response=None,
+                                      relationship_entity=None,
+                                      relationship_end=None, **kwargs):
+        self.added.append((entity, relationship_entity, relationship_end))
+
+
+class MapperBulkRelationshipTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, SaveResponder, relationship
+
+
+        save = SaveResponder(start_id=100)
+
+        def responder(query, params):
+            # the existing relationships for replace
+            if query.endswith('RETURN relt'):
+                return [{'relt': relationship(50 + i, 1, 2, 'BulkFollows')}
+                    for i in range(2)]
+
+            return save(query, params)
+
+        self.connection = FakeConnection(responder=responder)
+        self.mapper = Mapper(self.connection)
+        self.user = BulkFollower(id=1)
+        self.followers = [BulkFollower(id=i) for i in range(2, 5)]
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def queries(self):
+        return [q for e, q in self.connection.events if e == 'run']
+
+    def test_can_add_many_relationships_in_one_statement(self):
+        related = self.mapper(self.user)['Follows']
+        relationships, work = related.add_many(self.followers,
+            properties=[{'since': i} for i in range(3)])
+        work.send()
+        query, params = self.connection.last_query
+
+        self.assertEqual(1, len(self.queries()))
+        self.assertTrue(query.startswith('UNWIND $rows AS row MATCH'))
+        self.assertIn('CREATE (start_node)-[r:`BulkFollows`]->(end_node)',
+            query)
+        self.assertEqual([2, 3, 4], [r['end'] for r in params['rows']])
+        self.assertEqual([0, 1, 2],
+            [r['properties']['since'] for r in params['rows']])
+        self.assertTrue(all(r.id for r in relationships))
+        self.assertEqual(3, len(set(r.id for r in relationships)))
+
+    def test_add_many_fires_relationship_added_events(self):
+        related = self.mapper(self.user)['Follows']
+        relationships, work = related.add_many(self.followers)
+        work.send()
+        added = self.mapper.get_mapper(BulkFollower).added
+
+        self.assertEqual(6, len(added))
+        self.assertEqual(relationships, [a[1] for a in added
+            if a[2] == 'start'])
+        self.assertEqual(self.followers, [a[0] for a in added
+            if a[2] == 'end'])
+
+    def test_add_many_will_save_changed_nodes(self):
+        updated = self.mapper.get_mapper(BulkFollower).updated
+
+        def updates(entity):
+            return len([e for e in updated if e is entity])
+
+        # the update events that saving the node on its own runs
+        other = BulkFollower(id=9)
+        other['name'] = 'changed'
+        self.mapper.save(other).send()
+        self.user['name'] = 'changed'
+        related = self.mapper(self.user)['Follows']
+        _, work = related.add_many(self.followers)
+        work.send()
+        queries = self.queries()[1:]
+
+        self.assertEqual(2, len(queries))
+        self.assertIn('SET n_0.`name` = $n_0_name_0', queries[0])
+        self.assertTrue(queries[1].startswith('UNWIND'))
+        self.assertEqual(updates(other), updates(self.user))
+        self.assertFalse(self.user.dirty)
+
+    def test_can_merge_unique_relationships(self):
+        related = self.mapper(self.user)['Follows']
+        related.ensure_unique = True
+        _, work = related.add_many(self.followers,
+            properties=[{'since': 1}] * 3)
+        work.send()
+        query, _ = self.connection.last_query
+
+        self.assertIn('MERGE (start_node)-[r:`BulkFollows` {`since`:'
+            ' row.`properties`.`since`}]->(end_node)', query)
+
+    def test_will_save_unsaved_entities_on_their_own(self):
+        related = self.mapper(self.user)['Follows']
+        new = BulkFollower()
+        relationships, work = related.add_many(self.followers + [new])
+        work.send()
+
+        self.assertEqual(2, len(self.queries()))
+        self.assertIsNotNone(new.id)
+        self.assertTrue(all(r.id for r in relationships))
+
+    def test_can_replace_relationships_in_bulk(self):
+        related = self.mapper(self.user)['Follows']
+        work = related.replace(self.followers)
+        work.send()
+        queries = self.queries()
+
+        self.assertEqual(3, len(queries))
+        self.assertTrue(queries[1].endswith('DELETE r'))
+        self.assertTrue(queries[2].startswith('UNWIND'))
+
+
+class FuseEventNode(Node):
+    pass
+
+
+class FuseEventNodeMapper(EntityMapper):
+    entity = FuseEventNode
+
+    def __init__(self, *args, **kwargs):
+        super(FuseEventNodeMapper, self).__init__(*args, **kwargs)
+
+        self.created = []
+
+    def on_after_create(self, entity, response=None, **kwargs):
+        self.created.append(entity)
+
+
+class MapperFuseTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, SaveResponder
+
+
+        self.connection = FakeConnection(responder=SaveResponder())
+        self.mapper = Mapper(self.connection)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def runs(self):
+        return [q for e, q in self.connection.events if e == 'run']
+
+    def test_can_fuse_nodes_and_relationship(self):
+        start = BulkNode(properties={'name': 'start'})
+        end = BulkNode(properties={'name': 'end'})
+        rel = BulkFollows(start=start, end=end)
+        self.mapper.save(start, end, rel).send(fuse=True)
+        runs = self.runs()
+
+        self.assertEqual(1, len(runs))
+        self.assertIn('CREATE (n_0:`BulkNode` {`name`: $n_0_name_0}), (n_1:'
+            '`BulkNode` {`name`: $n_1_name_0}), (n_0)-[r_0:'
+            '`BulkFollows` {`since`: $r_0_since_0}]->(n_1)', runs[0])
+        self.assertEqual(3, len({start.id, end.id, rel.id}))
+        self.assertEqual(start.id, rel.start.id)
+
+    def test_will_fuse_nodes_saved_after_their_relationship(self):
+        start = BulkNode(properties={'name': 'start'})
+        end = BulkNode(properties={'name': 'end'})
+        rel = BulkFollows(start=start, end=end)
+        work = self.mapper.save(rel, start, end)
+        query, params = work.queries(fuse=True)[0]
+
+        self.assertEqual('CREATE (n_0:`BulkNode` {`name`: $n_0_name_0}),'
+            ' (n_1:`BulkNode` {`name`: $n_1_name_0}), (n_0)-[r_0:'
+            '`BulkFollows` {`since`: $r_0_since_0}]->(n_1) RETURN n_0, n_1,'
+            ' r_0', query)
+
+    def test_relationships_share_nodes_in_fused_statement(self):
+        start = BulkNode()
+        existing = BulkNode(id=50)
+        rels = [BulkFollows(start=start, end=BulkNode()),
+            BulkFollows(start=start, end=existing)]
+        work = self.mapper.save(start, *rels)
+        query, params = work.queries(fuse=True)[0]
+
+        self.assertEqual(1, len(work.fuse_units()))
+        self.assertEqual(1, query.count('(n_0:`BulkNode`'))
+        self.assertIn('MATCH (n_', query)
+        self.assertIn(50, params.values())
+
+    def test_will_not_fuse_unconnected_units(self):
+        nodes = [BulkNode(), BulkNode()]
+        start = BulkNode()
+        rel = BulkFollows(start=start, end=BulkNode())
+        work = self.mapper.save(nodes[0], start, rel, nodes[1])
+        units = work.fuse_units()
+
+        self.assertEqual(3, len(units))
+        self.assertIs(nodes[0], units[0].entity)
+        self.assertEqual([start, rel], units[1].entities)
+        self.assertIs(nodes[1], units[2].entity)
+
+    def test_fused_node_events_run_once(self):
+        start = FuseEventNode()
+        end = FuseEventNode()
+        rel = BulkFollows(start=start, end=end)
+        self.mapper.save(start, end, rel).send(fuse=True)
+        created = self.mapper.get_mapper(FuseEventNode).created
+
+        self.assertEqual([start, end], created)
+
+    def test_will_split_fused_units(self):
+        start = BulkNode()
+        rels = [BulkFollows(start=start, end=BulkNode())
+            for i in range(3)]
+        work = self.mapper.save(start, *rels)
+        units = work.fuse_units(size=2)
+
+        self.assertEqual([2, 2], [len(u.units) for u in units])
+
+        work.send(fuse=True, pipeline=True)
+
+        self.assertTrue(all(r.id for r in rels))
+        self.assertEqual(1, len({r.start.id for r in rels}))
+
+
+class UpsertUser(Node):
+    pass
+
+
+class UpsertUserMapper(EntityMapper):
+    entity = UpsertUser
+    __PROPERTIES__ = {
+        'email': String(ensure_unique=True),
+        'name': String(),
+    }
+
+
+class MapperUpsertTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, SaveResponder
+
+
+        self.connection = FakeConnection(responder=SaveResponder())
+        self.mapper = Mapper(self.connection)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def rows(self, count):
+        return [{'email': 'user{}@example.com'.format(i),
+            'name': 'user {}'.format(i)} for i in range(count)]
+
+    def test_can_upsert_many_in_one_statement(self):
+        users = self.mapper.upsert_many(UpsertUser, self.rows(3))
+        query, params = self.connection.last_query
+
+        self.assertEqual(1, self.connection.query_count)
+        self.assertIn('MERGE (n:`UpsertUser` {`email`:'
+            ' row.`properties`.`email`}) SET n += row.`properties`', query)
+        self.assertEqual('user 2', params['rows'][2]['properties']['name'])
+        self.assertEqual(3, len(users))
+        self.assertTrue(all(isinstance(u, UpsertUser) for u in users))
+        self.assertEqual(3, len(set(u.id for u in users)))
+
+    def test_can_upsert_in_chunks(self):
+        users = self.mapper.upsert_many(UpsertUser, self.rows(5),
+            chunk_size=2, commit_every=2)
+        events = [e for e, _ in self.connection.events if e != 'pull']
+
+        self.assertEqual(['run', 'run', 'commit', 'run', 'commit'], events)
+        self.assertTrue(all(u.id for u in users))
+
+    def test_can_upsert_entities(self):
+        user = UpsertUser(properties=self.rows(1)[0])
+        users = self.mapper.upsert_many(UpsertUser, [user])
+
+        self.assertIs(user, users[0])
+        self.assertIsNotNone(user.id)
+
+    def test_bulk_send_will_merge_unique_nodes(self):
+        users = [UpsertUser(properties=r) for r in self.rows(2)]
+        queries = self.mapper.save(*users).queries(bulk=True)
+
+        self.assertEqual(1, len(queries))
+        self.assertTrue(queries[0][0].startswith('UNWIND $rows AS row MERGE'))
+
+
+class PageUser(Node):
+    pass
+
+
+class PageUserMapper(EntityMapper):
+    entity = PageUser
+    __PROPERTIES__ = {
+        'name': String(),
+    }
+    __RELATIONSHIPS__ = {
+        'Follows': RelatedEntity(relationship_type='Follows'),
+    }
+
+
+class MapperPageTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.bench import FakeConnection, node
+
+
+        self.users = {i: node(i, ['PageUser'], {'name': 'user {}'.format(i)})
+            for i in range(2, 7)}
+
+        def responder(query, params):
+            # answer like the graph would for the keyset predicate
+            after = params.get('page_id', 0)
+            limit = int(query.rsplit('LIMIT ', 1)[1])
+
+            return [{'end_node': self.users[i]} for i in sorted(self.users)
+                if i > after][:limit]
+
+        self.connection = FakeConnection(responder=responder)
+        self.mapper = Mapper(self.connection)
+        self.user = PageUser(id=1)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def test_can_page_related_entities(self):
+        related = self.mapper(self.user)['Follows']
+        page = related.page(size=2, order_by='name')
+
+        self.assertEqual([2, 3], [u.id for u in page])
+        self.assertTrue(page.has_more)
+        self.assertEqual(('user 3', 3), decode_cursor(page.cursor))
+
+    def test_can_page_to_the_end(self):
+        ids = []
+        cursor = None
+
+        while True:
+            page = self.mapper(self.user)['Follows'].page(after=cursor,
+                size=2)
+            ids += [u.id for u in page]
+            cursor = page.cursor
+
+            if not page.has_more:
+                break
+
+        query, _ = self.connection.last_query
+
+        self.assertEqual([2, 3, 4, 5, 6], ids)
+        self.assertIsNone(page.cursor)
+        self.assertIn('id(n_0_end) > $page_id', query)
+        self.assertNotIn('SKIP', query)
+
+    def test_can_build_page_from_builder_results(self):
+        from moesha.mapper import Page
+
+
+        builder = Builder(PageUser()).page(size=3, order_by='name')
+        page = Page.from_results(self.mapper.query(pypher=builder), size=3,
+            order_by='name')
+
+        self.assertEqual(3, len(page))
+        self.assertEqual(('user 4', 4), decode_cursor(page.cursor))
+
+    def test_can_page_through_null_values(self):
+        from moesha.bench import node
+
+
+        names = {2: 'a', 3: 'b', 4: None, 5: None, 6: None, 7: None}
+        users = {i: node(i, ['PageUser'],
+            {'name': name} if name is not None else {})
+            for i, name in names.items()}
+
+        def responder(query, params):
+            # nulls sort last, like ORDER BY n.name, id(n)
+            ordered = sorted(users, key=lambda i: (names[i] is None,
+                names[i] or '', i))
+            limit = int(query.rsplit('LIMIT ', 1)[1])
+
+            if 'page_value' in params:
+                value, after = params['page_value'], params['page_id']
+                ordered = [i for i in ordered if names[i] is None
+                    or (names[i], i) > (value, after)]
+            elif 'page_id' in params:
+                after = params['page_id']
+                ordered = [i for i in ordered if names[i] is None
+                    and i > after]
+
+            return [{'end_node': users[i]} for i in ordered][:limit]
+
+        self.connection.responder = responder
+        ids = []
+        cursors = []
+        cursor = None
+
+        while True:
+            page = self.mapper(self.user)['Follows'].page(after=cursor,
+                size=2, order_by='name')
+            ids += [u.id for u in page]
+            cursor = page.cursor
+
+            if not page.has_more:
+                break
+
+            cursors.append(decode_cursor(cursor))
+
+        query, _ = self.connection.last_query
+
+        self.assertEqual([2, 3, 4, 5, 6, 7], ids)
+        self.assertEqual([('b', 3), (None, 5)], cursors)
+        self.assertIn('IS NULL AND id(n_0_end) > $page_id', query)
+
+
+class MapperRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        from moesha.mapper import MAPPER_REGISTRY
+
+
+        self.registry = MAPPER_REGISTRY
+        self.registry.per_thread = True
+
+    def tearDown(self):
+        self.registry.per_thread = False
+
+    def in_thread(self, target):
+        import threading
+
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(target()))
+        thread.start()
+        thread.join()
+
+        return results[0]
+
+    def test_will_share_instances_within_a_thread(self):
+        self.assertIs(get_mapper(BulkNode, None), get_mapper(BulkNode, None))
+
+    def test_will_create_instances_per_thread(self):
+        mapper = get_mapper(BulkNode, None)
+        other = self.in_thread(lambda: get_mapper(BulkNode, None))
+
+        self.assertIsNot(mapper, other)
+        self.assertIsInstance(other, BulkNodeMapper)
+
+    def test_will_share_instances_across_threads_by_default(self):
+        self.registry.per_thread = False
+        mapper = get_mapper(BulkNode, None)
+        other = self.in_thread(lambda: get_mapper(BulkNode, None))
+
+        self.assertIs(mapper, other)
+
+    def test_instances_do_not_share_properties_or_relationships(self):
+        main = Mapper(TC)
+        mapper = get_mapper(PrefetchUser, main)
+        other = self.in_thread(lambda: get_mapper(PrefetchUser, main))
+
+        self.assertIsNot(mapper.properties.properties,
+            other.properties.properties)
+        self.assertIsNot(mapper['Follows'], other['Follows'])
+        self.assertIs(mapper, mapper['Follows'].mapper)
+        self.assertIs(other, other['Follows'].mapper)
+
+    def test_can_save_same_entity_class_from_thread_pool(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from moesha.bench import FakeConnection, SaveResponder
+
+
+        mapper = Mapper(FakeConnection(responder=SaveResponder()))
+        names = ['name {}'.format(i) for i in range(50)]
+
+        def save(name):
+            node = BulkNode(properties={'name': name})
+            query, params = mapper.save(node).queries()[0]
+
+            return params
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(save, names))
+
+        self.assertEqual(names, [list(p.values())[0] for p in results])
+
+
+class AsyncMapperTests(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = AsyncTestConnection()
+        self.mapper = AsyncMapper(self.connection)
+
+    def tearDown(self):
+        self.mapper.reset()
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_save_returns_async_work(self):
+        work = self.mapper.save(BulkNode(properties={'name': 'name'}))
+
+        self.assertIsInstance(work, AsyncWork)
+
+    def test_can_send_async_work(self):
+        nodes = [BulkNode(properties={'name': 'name'}) for i in range(2)]
+        work = self.mapper.save(*nodes)
+
+        self.run_async(work.send())
+
+        self.assertEqual(2, len(self.connection.queries))
+        self.assertEqual(1, self.connection.committed)
+
+    def test_can_commit_async_work_in_chunks(self):
+        nodes = [BulkNode(properties={'name': 'name'}) for i in range(3)]
+        responses = []
+
+        async def callback(response):
+            responses.append(response)
+
+        response = self.run_async(self.mapper.save(*nodes).send(
+            commit_every=2, callback=callback))
+
+        self.assertEqual(3, len(responses))
+        self.assertEqual(0, len(response))
+        self.assertEqual(2, self.connection.committed)
+
+    def test_will_not_pipeline_async_work(self):
+        work = self.mapper.save(BulkNode())
+
+        with self.assertRaises(TypeError):
+            self.run_async(work.send(pipeline=True))
+
+    def test_can_await_coroutine_events(self):
+        events = []
+
+        class AsyncEventNode(Node):
+            pass
+
+        class AsyncEventNodeMapper(EntityMapper):
+            entity = AsyncEventNode
+
+            async def on_before_create(self, entity):
+                events.append('before')
+
+            async def on_after_create(self, entity, response=None,
+                                      **kwargs):
+                await asyncio.sleep(0)
+                events.append('after')
+
+        work = self.mapper.save(AsyncEventNode())
+
+        self.run_async(work.send())
+
+        self.assertIn('before', events)
+        self.assertIn('after', events)
+
+    def test_will_rollback_when_event_fails(self):
+        class AsyncFailNode(Node):
+            pass
+
+        class AsyncFailNodeMapper(EntityMapper):
+            entity = AsyncFailNode
+
+            async def on_after_create(self, entity, response=None,
+                                      **kwargs):
+                raise Exception('failed')
+
+        work = self.mapper.save(AsyncFailNode())
+
+        with self.assertRaises(Exception):
+            self.run_async(work.send())
+
+        self.assertEqual(1, self.connection.rolled_back)
+        self.assertEqual(0, self.connection.committed)
+
+    def test_can_get_by_id(self):
+        result = self.run_async(self.mapper.get_by_id(BulkNode, id_val=1))
+        query, params = self.connection.queries[0]
+
+        self.assertIsNone(result)
+        self.assertIn('id(n_0)', query)
+        self.assertIn(1, params.values())
+
+    def test_can_query(self):
+        response = self.run_async(self.mapper.query(query='RETURN 1'))
+
+        self.assertEqual(0, len(response))
+        self.assertEqual('RETURN 1', self.connection.queries[0][0])
+
+    def test_can_hydrate_entities_from_async_connection(self):
+        from moesha.bench import node
+        from moesha.connection import AsyncConnection
+
+
+        connection = AsyncConnection('localhost', 7687, 'neo4j', 'neo4j')
+        connection._driver = AsyncTestConnection(responder=lambda q, p: [
+            {'n': node(5, ['BulkNode'], {'name': 'mark'})}]).driver
+        mapper = AsyncMapper(connection)
+        response = self.run_async(mapper.query(query='MATCH (n) RETURN n'))
+        entity = response[0]
+
+        self.assertIsInstance(entity, BulkNode)
+        self.assertEqual(5, entity.id)
+        self.assertEqual(['BulkNode'], entity.labels)
+        self.assertEqual('mark', entity['name'])
+
+    def test_will_refresh_saved_entity_ids(self):
+        from moesha.bench import node
+
+
+        self.connection.responder = lambda q, p: [
+            {'n_0': node(9, ['BulkNode'], {'name': 'name'})}]
+        entity = BulkNode(properties={'name': 'name'})
+
+        self.run_async(self.mapper.save(entity).send())
+
+        self.assertEqual(9, entity.id)
+
+    def test_can_get_by_id_from_entity_cache(self):
+        from moesha.cache import LRUEntityCache
+        from moesha.bench import node
+
+
+        self.connection.responder = lambda q, p: [
+            {'n_0': node(3, ['BulkNode'], {'name': 'cached'})}]
+        mapper = AsyncMapper(self.connection, entity_cache=LRUEntityCache())
+        first = self.run_async(mapper.get_by_id(BulkNode, id_val=3))
+        mapper.reset()
+        second = self.run_async(mapper.get_by_id(BulkNode, id_val=3))
+        entities = self.run_async(mapper.get_by_ids([3], entity=BulkNode))
+
+        self.assertEqual(1, len(self.connection.queries))
+        self.assertEqual('cached', second['name'])
+        self.assertEqual([3], [e.id for e in entities])
+        self.assertEqual(first.id, second.id)
+
 # TODO move to integration testing
 # class MapperBuilderTests(unittest.TestCase):
 #
@@ -8,6 +8,11 @@ from pprint import pprint
 
 from moesha.property import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class PropertyTests(unittest.TestCase):
 
@@ -470,5 +475,100 @@ class PropertyManagerTests(unittest.TestCase):
         self.assertEqual(v2, f[k2])
 
 
+class CompiledPropertyManagerTests(unittest.TestCase):
+
+    def test_can_convert_data_with_defaults(self):
+        f = PropertyManager({'name': String(), 'age': Integer(),
+            'score': Float(default=1.5)})
+        convert = f.compile()
+        data = convert({'name': 'mark', 'age': '33'})
+
+        self.assertEqual({'name': 'mark', 'age': 33, 'score': 1.5}, data)
+
+    def test_will_not_change_property_values(self):
+        name = String(value='initial')
+        f = PropertyManager({'name': name})
+        convert = f.compile()
+        convert({'name': 'changed'})
+
+        self.assertEqual('initial', name.value)
+        self.assertEqual({'name': 'initial'}, convert())
+
+    def test_will_respect_immutable_and_options(self):
+        f = PropertyManager({'fixed': String(value='a', immutable=True),
+            'choice': String(value='x', options=['x', 'y'])})
+        convert = f.compile()
+
+        self.assertEqual({'fixed': 'a', 'choice': 'y'},
+            convert({'fixed': 'b', 'choice': 'y'}))
+        self.assertEqual({'fixed': 'a', 'choice': 'x'},
+            convert({'choice': 'z'}))
+
+    def test_will_increment_for_graph_without_changing_property(self):
+        inc = Increment(value=9)
+        f = PropertyManager({'count': inc})
+        convert = f.compile(data_type='graph')
+
+        self.assertEqual({'count': 10}, convert())
+        self.assertEqual({'count': 10}, convert())
+        self.assertEqual({'count': 4}, convert({'count': 3}))
+        self.assertEqual(9, inc.value)
+
+    def test_will_only_add_undefined_properties_when_allowed(self):
+        f = PropertyManager({'name': String()})
+        convert = f.compile()
+
+        self.assertEqual({'name': ''}, convert({'other': 1}))
+
+        f.allow_undefined = True
+        convert = f.compile()
+        data = convert({'other': '1', 'flag': True})
+
+        self.assertEqual({'name': '', 'other': '1', 'flag': True}, data)
+        self.assertEqual(1, len(f.properties))
+
+
+class ColumnConversionTests(unittest.TestCase):
+
+    def test_can_convert_columns(self):
+        self.assertEqual([1, 2, 0], Integer().convert_column(['1', 2.5, 'x']))
+        self.assertEqual([1.0, 0.0], Float().convert_column([1, None]))
+        self.assertEqual([True, False, True],
+            Boolean().convert_column([True, 'false', 1]))
+        self.assertEqual([{'a': 1}, {}, [1]],
+            JsonProperty().convert_column(['{"a": 1}', '', [1]]))
+        self.assertEqual([1.5, 0.0], DateTime().convert_column([1.5, None]))
+
+    def test_will_use_graph_converter_for_graph_columns(self):
+        self.assertEqual([4, 1],
+            Increment().convert_column([3, None], data_type='graph'))
+        self.assertEqual(['{"a": 1}'],
+            JsonProperty().convert_column([{'a': 1}], data_type='graph'))
+
+    def test_can_convert_rows_a_column_at_a_time(self):
+        f = PropertyManager({'name': String(), 'age': Integer(value=1)},
+            allow_undefined=True)
+        rows = [{'name': 'a', 'age': '2'}, {'name': 'b', 'other': 1.5}]
+        convert = f.compile()
+
+        self.assertEqual([convert(r) for r in rows], f.compile_rows()(rows))
+
+    def test_can_get_columns(self):
+        f = PropertyManager({'age': Integer()}, allow_undefined=True)
+        columns = f.compile_columns()([{'age': 1}, {'age': 2, 'x': 'y'}])
+
+        self.assertEqual([1, 2], columns['age'])
+        self.assertEqual([None, 'y'], columns['x'])
+
+    @unittest.skipUnless(numpy, 'NumPy is not installed')
+    def test_can_convert_numeric_columns_with_numpy(self):
+        ints = Integer().convert_column(['1', 2.5, 3], use_numpy=True)
+        floats = Float().convert_column([1, None], use_numpy=True)
+
+        self.assertEqual(numpy.int64, ints.dtype)
+        self.assertEqual([1, 2, 3], ints.tolist())
+        self.assertEqual([1.0, 0.0], floats.tolist())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,9 +3,10 @@ import unittest
 from random import random, randint
 
 from moesha.entity import (Node, Relationship)
-from moesha.query import (Query, RelatedEntityQuery, QueryException,
-    RelatedQueryException)
-from moesha.mapper import (Mapper, EntityMapper)
+from moesha.query import (Query, BulkQuery, RelatedEntityQuery,
+    StatementCache, Helpers, Builder, QueryException, RelatedQueryException,
+    naming_state, naming_context, encode_cursor, decode_cursor)
+from moesha.mapper import (Mapper, EntityMapper, EQV)
 from moesha.property import String
 from moesha.util import _query_debug
 
@@ -722,6 +723,303 @@ class RelatedEntityQueryTests(unittest.TestCase):
         self.assertEqual(2, len(params))
 
 
+class BulkQueryTests(unittest.TestCase):
+
+    def test_can_build_bulk_node_create_query(self):
+        names = ['mark {}'.format(random()) for i in range(3)]
+        nodes = [UniquePropertiesNode(properties={'name': n}) for n in names]
+        q = BulkQuery(nodes)
+        query, params = q.create_nodes()
+        exp = ('UNWIND $rows AS row CREATE (n:`UniquePropertiesNode`)'
+            ' SET n = row.`properties` RETURN n ORDER BY row.`index`')
+
+        self.assertEqual(exp, query)
+        self.assertEqual(1, len(params))
+        self.assertEqual([0, 1, 2], [r['index'] for r in params['rows']])
+        self.assertEqual(names,
+            [r['properties']['name'] for r in params['rows']])
+
+    def test_can_build_bulk_node_update_query(self):
+        nodes = [OpenNode(id=i) for i in range(3)]
+        q = BulkQuery(nodes)
+        query, params = q.update_nodes()
+        exp = ('UNWIND $rows AS row MATCH (n) WHERE id(n) = row.`id`'
+            ' SET n += row.`properties` RETURN n ORDER BY row.`index`')
+
+        self.assertEqual(exp, query)
+        self.assertEqual([0, 1, 2], [r['id'] for r in params['rows']])
+
+    def test_cannot_build_bulk_query_without_entities(self):
+        q = BulkQuery([])
+
+        self.assertRaises(QueryException, q.create_nodes)
+
+
+class IdListQueryTests(unittest.TestCase):
+
+    def test_can_build_get_by_ids_query_with_single_list_param(self):
+        ids = list(range(500))
+        query, params = Helpers().get_by_ids(OpenNode(), ids)
+        exp = 'MATCH (node:`OpenNode`) WHERE id(node) IN $ids RETURN node'
+
+        self.assertEqual(exp, query)
+        self.assertEqual({'ids': ids}, dict(params))
+
+    def test_can_build_get_by_ids_query_for_relationships(self):
+        query, params = Helpers().get_by_ids(OpenRelationship(), [1, 2])
+        exp = ('MATCH ()-[rel:`OpenRelationship`]->() WHERE id(rel) IN $ids'
+            ' RETURN rel')
+
+        self.assertEqual(exp, query)
+        self.assertEqual([1, 2], params['ids'])
+
+    def test_can_build_delete_by_entity_id_with_single_list_param(self):
+        start = OpenNode(id=99)
+        rq = RelatedEntityQuery(relationship_type='Knows')
+        rq.start_entity = start
+        query, params = rq.delete_by_entity_id(1, 2, 3)
+
+        self.assertIn('id(end_node) IN $end_ids', query)
+        self.assertIn('[relt:`Knows`]', query)
+        self.assertTrue(query.endswith('DELETE relt'))
+        self.assertEqual([1, 2, 3], params['end_ids'])
+        self.assertIn(99, params.values())
+
+
+class KeysetQueryTests(unittest.TestCase):
+
+    def setUp(self):
+        EQV.reset()
+
+    def tearDown(self):
+        EQV.reset()
+
+    def test_can_round_trip_cursor(self):
+        cursor = encode_cursor('mark', 12)
+
+        self.assertEqual(('mark', 12), decode_cursor(cursor))
+        self.assertRaises(QueryException, decode_cursor, 'not a cursor')
+
+    def test_can_build_first_page_query(self):
+        query = str(Builder(OpenNode()).page(size=10, order_by='name'))
+
+        self.assertNotIn('WHERE', query)
+        self.assertNotIn('SKIP', query)
+        self.assertTrue(query.endswith('RETURN n_0 ORDER BY n_0.`name`,'
+            ' id(n_0) LIMIT 11'))
+
+    def test_can_build_page_query_after_cursor(self):
+        builder = Builder(OpenNode()).page(after=encode_cursor('mark', 5),
+            size=10, order_by='name')
+        exp = ('MATCH (n_0:`OpenNode`) WHERE (n_0.`name` > $page_value OR'
+            ' (n_0.`name` = $page_value AND id(n_0) > $page_id) OR'
+            ' n_0.`name` IS NULL) RETURN n_0 ORDER BY n_0.`name`, id(n_0)'
+            ' LIMIT 11')
+
+        self.assertEqual(exp, str(builder))
+        self.assertEqual({'page_value': 'mark', 'page_id': 5},
+            dict(builder.bound_params))
+
+    def test_can_build_descending_page_query_by_id(self):
+        builder = Builder(OpenNode()).page(after=encode_cursor(None, 5),
+            size=10, descending=True)
+
+        self.assertIn('WHERE id(n_0) < $page_id', str(builder))
+        self.assertIn('ORDER BY id(n_0) DESC', str(builder))
+
+    def test_can_page_after_null_sort_key(self):
+        builder = Builder(OpenNode()).page(after=encode_cursor(None, 5),
+            size=10, order_by='name')
+
+        self.assertIn('WHERE (n_0.`name` IS NULL AND id(n_0) > $page_id)',
+            str(builder))
+
+    def test_will_add_page_predicate_to_existing_where(self):
+        builder = Builder(OpenNode())
+        builder.WHERE(builder.entity.property('age') > 1).OR(
+            builder.entity.property('name') == 'mark')
+        builder.page(after=encode_cursor(None, 5), size=10, descending=True)
+        exp = ('MATCH (n_0:`OpenNode`) WHERE (n_0.`age` > $n_0_0 OR'
+            ' n_0.`name` = $n_0_1) AND id(n_0) < $page_id RETURN n_0'
+            ' ORDER BY id(n_0) DESC LIMIT 11')
+
+        self.assertEqual(exp, str(builder))
+        self.assertEqual({'n_0_0': 1, 'n_0_1': 'mark', 'page_id': 5},
+            dict(builder.bound_params))
+
+    def test_can_build_related_page_query(self):
+        rq = RelatedEntityQuery(relationship_type='Knows')
+        rq.start_entity = OpenNode(id=99)
+        query, params = rq.page(after=encode_cursor('mark', 5), size=20,
+            order_by='name')
+
+        self.assertIn('end_node.`name` > $page_value', query)
+        self.assertIn('ORDER BY end_node.`name`, id(end_node) LIMIT 21', query)
+        self.assertNotIn('SKIP', query)
+        self.assertEqual('mark', params['page_value'])
+
+
+class NamingStateTests(unittest.TestCase):
+
+    def setUp(self):
+        EQV.reset()
+
+    def tearDown(self):
+        EQV.reset()
+
+    def test_each_thread_has_its_own_naming_state(self):
+        import threading
+
+
+        EQV.define(Node())
+        names = []
+
+        def run():
+            names.append(EQV.define(Node()))
+
+        threads = [threading.Thread(target=run) for _ in range(3)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(['n_0', 'n_0', 'n_0'], names)
+        self.assertEqual('n_1', EQV.define(Node()))
+
+    def test_copied_context_will_not_share_state_across_threads(self):
+        import contextvars
+        import threading
+
+
+        EQV.define(Node())
+        context = contextvars.copy_context()
+        names = []
+
+        def run():
+            names.append(context.run(EQV.define, Node()))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(['n_1'], names)
+        self.assertEqual('n_1', EQV.define(Node()))
+
+    def test_naming_context_will_continue_and_restore_state(self):
+        EQV.define(Node())
+        state = naming_state()
+
+        with naming_context() as inner:
+            self.assertIsNot(state, inner)
+            self.assertEqual('n_1', EQV.define(Node()))
+            self.assertEqual('n_2', EQV.define(Node()))
+
+        self.assertIs(state, naming_state())
+        self.assertEqual('n_1', EQV.define(Node()))
+
+    def test_tasks_can_build_queries_concurrently(self):
+        import asyncio
+
+
+        async def build(i):
+            with naming_context():
+                EQV.reset()
+                node = OpenNode(properties={'name': 'name'})
+                await asyncio.sleep(0)
+                query, _ = Query(node).save()
+                await asyncio.sleep(0)
+
+                return node.query_variable, query
+
+        async def main():
+            return await asyncio.gather(*[build(i) for i in range(3)])
+
+        results = asyncio.run(main())
+
+        self.assertEqual(['n_0'] * 3, [r[0] for r in results])
+        self.assertEqual(1, len(set(r[1] for r in results)))
+
+
+class StatementCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = StatementCache()
+
+    def save(self, entity, query_variable='n_0', enabled=True):
+        entity.query_variable = query_variable
+        self.cache.enabled = enabled
+
+        return Query(entity, statement_cache=self.cache).save()
+
+    def test_can_reuse_statement_for_nodes_with_the_same_shape(self):
+        n = UniquePropertiesNode(properties={'name': 'a', 'location': 'b'})
+        n2 = UniquePropertiesNode(properties={'name': 'c', 'location': 'd'})
+        query, params = self.save(n)
+        query2, params2 = self.save(n2)
+
+        self.assertEqual(query, query2)
+        self.assertEqual(['b', 'a'], list(params.values()))
+        self.assertEqual(['d', 'c'], list(params2.values()))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_cached_statement_matches_built_statement(self):
+        n = OpenNode(id=999, properties={'name': 'a'})
+        self.save(n)
+        cached = self.save(n)
+        built = self.save(n, enabled=False)
+
+        self.assertEqual(built, cached)
+        self.assertEqual(1, self.cache.hits)
+
+    def test_will_not_reuse_statement_for_different_shapes(self):
+        n = OpenNode(properties={'name': 'a'})
+        n2 = OpenNode(properties={'name': 'a', 'age': 1})
+        n3 = OpenNode(id=1, properties={'name': 'a'})
+        self.save(n)
+        self.save(n2)
+        self.save(n3)
+        self.save(n, query_variable='n_1')
+
+        self.assertEqual(0, self.cache.hits)
+        self.assertEqual(4, len(self.cache))
+
+    def test_will_not_cache_statement_with_shared_params(self):
+        n = UniquePropertiesNode(properties={'name': 'a', 'location': 'a'})
+        query, params = self.save(n)
+
+        self.assertEqual(1, len(params))
+        self.assertEqual(0, len(self.cache))
+
+    def test_can_reuse_statement_for_relationships_with_the_same_shape(self):
+        for i in range(2):
+            start = OpenNode(id=i + 100, properties={'name': 'start'})
+            end = UniquePropertiesNode(properties={'name': 'end{}'.format(i)})
+            rel = OpenRelationship(start=start, end=end,
+                properties={'since': i})
+            start.query_variable = 'n_1'
+            end.query_variable = 'n_2'
+            cached = self.save(rel, query_variable='r_0')
+            built = self.save(rel, query_variable='r_0', enabled=False)
+
+            self.assertEqual(built, cached)
+
+        self.assertEqual(1, self.cache.hits)
+
+    def test_will_evict_least_recently_used_statement(self):
+        self.cache.max_size = 1
+        n = OpenNode(properties={'name': 'a'})
+        n2 = OpenNode(properties={'age': 1})
+        self.save(n)
+        self.save(n2)
+        self.save(n)
+
+        self.assertEqual(0, self.cache.hits)
+        self.assertEqual(1, len(self.cache))
+
+
 class RelationshipOutQueryTests(unittest.TestCase):
     direction = 'out'
     relationship_template = '-[{var}:`{label}`]->'
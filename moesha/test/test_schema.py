@@ -0,0 +1,243 @@
+import unittest
+
+from moesha.entity import Node
+from moesha.mapper import Mapper, EntityMapper
+from moesha.property import String, Integer, TimeStamp
+from moesha.schema import (Schema, SchemaItem, SchemaDiff, SchemaException,
+    declared_schema, CONSTRAINT, INDEX)
+from moesha.bench import FakeConnection
+
+
+class SchemaUser(Node):
+    pass
+
+
+class SchemaUserMapper(EntityMapper):
+    entity = SchemaUser
+    __PROPERTIES__ = {
+        'email': String(ensure_unique=True),
+        'name': String(indexed=True),
+        'age': Integer(),
+        'joined': TimeStamp(indexed=True),
+    }
+
+
+class SchemaAccount(Node):
+    pass
+
+
+class SchemaAccountMapper(EntityMapper):
+    entity = SchemaAccount
+    __PROPERTIES__ = {
+        'number': String(ensure_unique=True, indexed=True),
+    }
+
+
+class SchemaItemTests(unittest.TestCase):
+
+    def test_can_build_constraint_statements(self):
+        item = SchemaItem(CONSTRAINT, 'User', 'email')
+
+        self.assertEqual('CREATE CONSTRAINT ON (n:`User`) ASSERT n.`email`'
+            ' IS UNIQUE', item.create_statement())
+        self.assertEqual('DROP CONSTRAINT ON (n:`User`) ASSERT n.`email`'
+            ' IS UNIQUE', item.drop_statement())
+
+    def test_can_build_index_statements(self):
+        item = SchemaItem(INDEX, 'User', 'name')
+
+        self.assertEqual('CREATE INDEX ON :`User`(`name`)',
+            item.create_statement())
+        self.assertEqual('DROP INDEX ON :`User`(`name`)',
+            item.drop_statement())
+
+    def test_can_build_statements_for_newer_servers(self):
+        constraint = SchemaItem(CONSTRAINT, 'User', 'email')
+        index = SchemaItem(INDEX, 'User', 'name')
+
+        self.assertEqual('CREATE CONSTRAINT IF NOT EXISTS FOR (n:`User`)'
+            ' REQUIRE n.`email` IS UNIQUE',
+            constraint.create_statement(legacy=False))
+        self.assertEqual('CREATE INDEX IF NOT EXISTS FOR (n:`User`)'
+            ' ON (n.`name`)', index.create_statement(legacy=False))
+        self.assertEqual('DROP INDEX `user_name` IF EXISTS',
+            index.drop_statement(legacy=False, name='user_name'))
+
+        with self.assertRaises(SchemaException):
+            index.drop_statement(legacy=False)
+
+    def test_drops_come_before_creates(self):
+        diff = SchemaDiff(missing=[SchemaItem(CONSTRAINT, 'User', 'name')],
+            extra=[SchemaItem(INDEX, 'User', 'name')])
+
+        self.assertEqual(['DROP INDEX ON :`User`(`name`)',
+            'CREATE CONSTRAINT ON (n:`User`) ASSERT n.`name` IS UNIQUE'],
+            diff.statements())
+        self.assertTrue(diff.statements(drop=True)[0].startswith('DROP'))
+
+    def test_will_only_drop_replaced_indexes_without_drop(self):
+        diff = SchemaDiff(missing=[SchemaItem(CONSTRAINT, 'User', 'name')],
+            extra=[SchemaItem(INDEX, 'User', 'name'),
+                SchemaItem(INDEX, 'User', 'age')])
+
+        self.assertEqual([SchemaItem(INDEX, 'User', 'name')], diff.replaced)
+        self.assertEqual(2, len(diff.statements()))
+        self.assertEqual(3, len(diff.statements(drop=True)))
+
+
+class DeclaredSchemaTests(unittest.TestCase):
+
+    def test_can_collect_declared_properties(self):
+        items = declared_schema(entities=[SchemaUser, SchemaAccount])
+
+        self.assertEqual({
+            SchemaItem(CONSTRAINT, 'SchemaUser', 'email'),
+            SchemaItem(INDEX, 'SchemaUser', 'name'),
+            SchemaItem(INDEX, 'SchemaUser', 'joined'),
+            SchemaItem(CONSTRAINT, 'SchemaAccount', 'number'),
+        }, items)
+
+
+class SchemaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.statements = []
+
+        def responder(query, params):
+            self.statements.append(query)
+
+            if query.startswith('CALL dbms.components()'):
+                return [{'name': 'Neo4j Kernel', 'versions': ['3.5.14']}]
+
+            if query == 'CALL db.constraints()':
+                return [{'description': 'CONSTRAINT ON ( schemauser:'
+                    'SchemaUser ) ASSERT schemauser.email IS UNIQUE'}]
+
+            if query == 'CALL db.indexes()':
+                return [
+                    {'description': 'INDEX ON :SchemaUser(email)',
+                        'type': 'node_unique_property'},
+                    {'description': 'INDEX ON :SchemaUser(age)',
+                        'type': 'node_label_property'},
+                    {'description': 'INDEX ON :Other(name)',
+                        'type': 'node_label_property'},
+                ]
+
+            return []
+
+        self.mapper = Mapper(FakeConnection(responder=responder))
+        self.schema = Schema(self.mapper,
+            entities=[SchemaUser, SchemaAccount])
+
+    def test_can_read_existing_schema(self):
+        self.assertEqual({
+            SchemaItem(CONSTRAINT, 'SchemaUser', 'email'),
+            SchemaItem(INDEX, 'SchemaUser', 'age'),
+            SchemaItem(INDEX, 'Other', 'name'),
+        }, self.schema.existing())
+
+    def test_can_diff_schema(self):
+        diff = self.schema.diff()
+
+        self.assertEqual([
+            SchemaItem(CONSTRAINT, 'SchemaAccount', 'number'),
+            SchemaItem(INDEX, 'SchemaUser', 'joined'),
+            SchemaItem(INDEX, 'SchemaUser', 'name'),
+        ], diff.missing)
+        self.assertEqual([SchemaItem(INDEX, 'SchemaUser', 'age')],
+            diff.extra)
+
+    def test_can_apply_schema(self):
+        statements = self.schema.apply(drop=True)
+
+        self.assertEqual(4, len(statements))
+        self.assertEqual('DROP INDEX ON :`SchemaUser`(`age`)', statements[0])
+        self.assertEqual(statements, self.statements[3:])
+
+    def test_will_not_drop_labels_without_a_mapper(self):
+        schema = Schema(self.mapper)
+        diff = schema.diff()
+
+        self.assertEqual([SchemaItem(INDEX, 'SchemaUser', 'age')],
+            diff.extra)
+        self.assertNotIn('DROP INDEX ON :`Other`(`name`)',
+            diff.statements(drop=True))
+
+
+    def test_will_replace_an_index_with_a_constraint(self):
+        def responder(query, params):
+            if query.startswith('CALL dbms.components()'):
+                return [{'name': 'Neo4j Kernel', 'versions': ['3.5.14']}]
+
+            if query == 'CALL db.indexes()':
+                return [{'description': 'INDEX ON :SchemaAccount(number)',
+                    'type': 'node_label_property'}]
+
+            return []
+
+        schema = Schema(Mapper(FakeConnection(responder=responder)),
+            entities=[SchemaAccount])
+
+        self.assertEqual(['DROP INDEX ON :`SchemaAccount`(`number`)',
+            'CREATE CONSTRAINT ON (n:`SchemaAccount`) ASSERT n.`number`'
+            ' IS UNIQUE'], schema.apply())
+
+
+class ShowSchemaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.version = '5.13.0'
+
+        def responder(query, params):
+            if query.startswith('CALL dbms.components()'):
+                return [{'name': 'Neo4j Kernel', 'versions': [self.version]}]
+
+            if query.startswith('SHOW CONSTRAINTS'):
+                return [{'name': 'user_email', 'type': 'UNIQUENESS',
+                    'entityType': 'NODE', 'labelsOrTypes': ['SchemaUser'],
+                    'properties': ['email']}]
+
+            if query.startswith('SHOW INDEXES'):
+                return [
+                    {'name': 'user_email', 'type': 'RANGE',
+                        'entityType': 'NODE',
+                        'labelsOrTypes': ['SchemaUser'],
+                        'properties': ['email'],
+                        'owningConstraint': 'user_email'},
+                    {'name': 'user_age', 'type': 'RANGE',
+                        'entityType': 'NODE',
+                        'labelsOrTypes': ['SchemaUser'],
+                        'properties': ['age'], 'owningConstraint': None},
+                    {'name': 'labels', 'type': 'LOOKUP',
+                        'entityType': 'NODE', 'labelsOrTypes': None,
+                        'properties': None, 'owningConstraint': None},
+                ]
+
+            return []
+
+        self.mapper = Mapper(FakeConnection(responder=responder))
+        self.schema = Schema(self.mapper,
+            entities=[SchemaUser, SchemaAccount])
+
+    def test_can_read_existing_schema(self):
+        self.assertEqual({
+            SchemaItem(CONSTRAINT, 'SchemaUser', 'email'),
+            SchemaItem(INDEX, 'SchemaUser', 'age'),
+        }, self.schema.existing())
+
+    def test_can_drop_by_name(self):
+        statements = self.schema.diff().statements(drop=True)
+
+        self.assertEqual('DROP INDEX `user_age` IF EXISTS', statements[0])
+        self.assertIn('CREATE CONSTRAINT IF NOT EXISTS FOR'
+            ' (n:`SchemaAccount`) REQUIRE n.`number` IS UNIQUE', statements)
+
+    def test_will_reject_unsupported_servers(self):
+        self.version = '4.1.3'
+
+        with self.assertRaises(SchemaException):
+            self.schema.diff()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import inspect
 import re
 import time
 
@@ -62,6 +63,22 @@ def _query_debug(query, params):
         return '{} -- {}'.format(query, params)
 
 
+def await_all(results):
+    """returns a single awaitable that will await every awaitable in results
+    in order, or None if there are none. This allows event methods that call
+    other, possibly coroutine, events to be awaited by an AsyncWork"""
+    pending = [r for r in results if inspect.isawaitable(r)]
+
+    if not pending:
+        return None
+
+    async def wait():
+        for awaitable in pending:
+            await awaitable
+
+    return wait()
+
+
 def timeit(method):
     def timed(*args, **kw):
         ts = time.time()
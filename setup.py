@@ -10,6 +10,11 @@ from setuptools import setup, find_packages
 install_requires = [
 ]
 
+# AsyncConnection and AsyncMapper need a driver with asyncio support
+extras_require = {
+    'async': ['neo4j>=5'],
+}
+
 # get the version information
 exec(open('moesha/version.py').read())
 
@@ -23,6 +28,7 @@ setup(
     author_email = 'emehrkay@gmail.com',
     long_description = __doc__,
     install_requires = install_requires,
+    extras_require = extras_require,
     classifiers = [
     ],
     test_suite = 'moesha.test',